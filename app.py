@@ -8,22 +8,47 @@ pip install -r requirements.txt
 Запуск локально:
 python app.py
 
-Запуск на продакшене (gunicorn):
-gunicorn -w 4 -b 0.0.0.0:8000 app:app
+Запуск на продакшене (gunicorn, threaded worker'ы из gunicorn.conf.py - см. GET /changes ниже):
+gunicorn -c gunicorn.conf.py app:app
+
+Пул подключений к БД настраивается переменными окружения (на каждый worker):
+DB_POOL_MIN, DB_POOL_MAX, DB_POOL_MAX_LIFETIME, DB_POOL_IDLE_TIMEOUT, DB_POOL_TIMEOUT
+
+Ответы list/query кэшируются (RESULT_CACHE_TTL, RESULT_CACHE_BACKEND=memory|sqlite,
+RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_MAX_BYTES), записи через API сбрасывают кэш таблицы.
+
+GET /changes - лента изменений таблиц (LISTEN/NOTIFY, миграция V0035) через SSE или long-poll.
+Каждое подключение держит поток worker'а, пока открыта вкладка: с sync worker'ами
+несколько вкладок останавливают весь API, поэтому только -k gthread (gunicorn.conf.py).
+Одновременных SSE/long-poll подключений на worker не больше CHANGE_FEED_MAX_STREAMS
+(по умолчанию 24, меньше числа потоков), лишние получают 503 и клиент переходит на опрос.
+
+Ответы сжимаются gzip/brotli по Accept-Encoding (COMPRESS_MIN_SIZE, по умолчанию 1024 байта).
+Степень и CPU-время сжатия пишутся в access log gunicorn (access_log_format в gunicorn.conf.py).
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 import psycopg2
 from psycopg2.extras import RealDictCursor
-import hashlib
-import secrets
-import urllib.request
-import tempfile
 import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from shared.pg_pool import PoolTimeout, pool_from_env
+from shared.ssl_cert import ca_cert_path
+from shared import (batch, bulk, change_feed, columnar, compression, delta_sync, etag, json_codec, list_query,
+                    pagination, passwords, result_cache, row_counts, schema_catalog, statements, streaming,
+                    table_events, table_stats)
+from shared.identifiers import qualified, quote_ident
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=['ETag', 'X-Cache'])
+compression.init_flask(app)
+json_codec.init_flask(app)
 
 DB_CONFIG = {
     'host': 'c6b7ae5ab8e72b5408272e27.twc1.net',
@@ -36,11 +61,6 @@ DB_CONFIG = {
 SCHEMA = 't_p47619579_knowledge_management'
 
 def get_db_connection():
-    cert_file = tempfile.NamedTemporaryFile(mode='w', suffix='.crt', delete=False)
-    cert_content = urllib.request.urlopen('https://st.timeweb.com/cloud-static/ca.crt').read().decode('utf-8')
-    cert_file.write(cert_content)
-    cert_file.close()
-    
     conn = psycopg2.connect(
         host=DB_CONFIG['host'],
         port=DB_CONFIG['port'],
@@ -48,17 +68,94 @@ def get_db_connection():
         user=DB_CONFIG['user'],
         password=DB_CONFIG['password'],
         sslmode='verify-full',
-        sslrootcert=cert_file.name
+        sslrootcert=ca_cert_path()
     )
     conn.autocommit = True
     return conn
 
 
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = pool_from_env(get_db_connection)
+    return _pool
+
+
 @app.route('/health', methods=['GET'])
 def health_check():
     return jsonify({'status': 'ok', 'service': 'knowledge-management-api'}), 200
 
 
+_feed = None
+_feed_lock = threading.Lock()
+
+
+def get_change_feed():
+    global _feed
+    if _feed is None:
+        with _feed_lock:
+            if _feed is None:
+                _feed = change_feed.ChangeFeed(get_db_connection, on_change=table_events.table_changed,
+                                               on_missed=table_events.all_changed)
+    return _feed
+
+
+@app.before_request
+def start_change_feed():
+    # Слушатель нужен каждому воркеру с первого запроса: через него кэши узнают о чужих записях
+    get_change_feed().start()
+
+
+@app.route('/changes', methods=['GET'])
+def changes():
+    """Лента изменений таблиц: SSE (Accept: text/event-stream) или long-poll (?after=<cursor>&timeout=25)"""
+    feed = get_change_feed()
+    tables = change_feed.parse_tables(request.args.get('tables'))
+    try:
+        timeout = change_feed.clamp_timeout(request.args.get('timeout'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Каждое подключение занимает поток worker'а - сверх лимита отказываем, клиент опрашивает сам
+    if not feed.acquire_stream():
+        response = jsonify({'error': 'Too many open change streams'})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+    
+    if 'text/event-stream' in request.headers.get('Accept', '') or request.args.get('mode') == 'sse':
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('after')
+        response = Response(feed.sse(last_event_id, tables), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        response.call_on_close(feed.release_stream)
+        return response
+    
+    try:
+        events, cursor = feed.wait(request.args.get('after'), timeout, tables)
+    finally:
+        feed.release_stream()
+    return jsonify({'events': events, 'cursor': cursor}), 200
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return jsonify({
+        'pool': get_pool().stats(),
+        'statements': statements.stats(),
+        'streaming': streaming.stats(),
+        'result_cache': result_cache.stats(),
+        'schema_catalog': schema_catalog.stats(),
+        'passwords': passwords.stats(),
+        'changes': _feed.stats() if _feed is not None else None,
+    }), 200
+
+
 @app.route('/', methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'])
 def api_handler():
     if request.method == 'OPTIONS':
@@ -68,6 +165,7 @@ def api_handler():
         response.headers['Access-Control-Allow-Headers'] = 'Content-Type'
         return response, 200
     
+    started_at = time.monotonic()
     try:
         if request.method == 'GET':
             action = request.args.get('action')
@@ -84,53 +182,131 @@ def api_handler():
         if not action:
             return jsonify({'error': 'Action required'}), 400
         
-        conn = get_db_connection()
-        
-        if action == 'query':
-            result = handle_query(conn, body_data)
-        elif action == 'list':
-            result = handle_list(conn, body_data)
-        elif action == 'stats':
-            result = handle_stats(conn, body_data)
-        elif action == 'create':
-            result = handle_create(conn, body_data)
-        elif action == 'update':
-            result = handle_update(conn, body_data)
-        elif action == 'delete':
-            result = handle_delete(conn, body_data)
-        else:
-            conn.close()
+        handlers = {
+            'query': handle_query,
+            'list': handle_list,
+            'stats': handle_stats,
+            'create': handle_create,
+            'update': handle_update,
+            'delete': handle_delete,
+            'batch': handle_batch,
+            'sync': handle_sync,
+        }
+        if action not in handlers:
             return jsonify({'error': f'Unknown action: {action}'}), 400
         
-        conn.close()
-        return jsonify(result), 200
+        stream_fmt = streaming.stream_format(body_data)
+        if stream_fmt and action in ('query', 'list'):
+            return stream_response(action, body_data, stream_fmt, started_at)
+        
+        cache = result_cache.lookup_key(action, body_data)
+        if cache is not None:
+            hit = result_cache.get(cache[0])
+            if hit is not None:
+                body, tag = hit
+                return conditional_response(tag, lambda: Response(body, mimetype='application/json'), 'HIT')
+            generation = result_cache.generation(cache[1])
+        
+        with get_pool().connection() as conn:
+            result = handlers[action](conn, body_data)
+        
+        tag = etag.version_tag(result) if action in etag.CONDITIONAL_ACTIONS else None
+        if cache is not None:
+            # В кэше лежит готовое тело ответа - попадание не сериализует заново
+            body = json_codec.dumps_bytes(result)
+            result_cache.put(cache[0], body, cache[1], generation, tag)
+            return conditional_response(tag, lambda: Response(body, mimetype='application/json'), 'MISS')
+        return conditional_response(tag, lambda: jsonify(result))
         
+    except PoolTimeout as e:
+        return jsonify({'error': f'Database busy: {str(e)}'}), 503
+    except passwords.HashQueueFull as e:
+        return jsonify({'error': str(e)}), 503
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except psycopg2.Error as e:
         return jsonify({'error': f'Database error: {str(e)}'}), 500
     except Exception as e:
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
 
+def conditional_response(tag, build, cache_status=None):
+    """304 без тела, если If-None-Match совпадает с версией ответа, иначе build()"""
+    if tag is not None and request.if_none_match.contains_weak(tag):
+        response = Response(status=304)
+    else:
+        response = build()
+    if tag is not None:
+        response.set_etag(tag, weak=True)
+        response.headers['Cache-Control'] = 'no-cache'
+    if cache_status:
+        response.headers['X-Cache'] = cache_status
+    return response
+
+
+def stream_response(action, body_data, fmt, started_at):
+    """Stream query/list rows from a server-side cursor instead of buffering them"""
+    if action == 'query':
+        query, params = streaming.query_statement(body_data)
+    else:
+        table = body_data.get('table', '')
+        if not table:
+            raise ValueError('Table name required')
+        limit = int(body_data.get('limit', 100))
+        offset = int(body_data.get('offset', 0))
+    
+    pool = get_pool()
+    conn = pool.getconn()
+    batches = None
+    try:
+        if action == 'list':
+            schema = body_data.get('schema', 'public')
+            with conn.cursor() as cursor:
+                parts = list_query.build(cursor, schema, table, body_data)
+            query = (f'SELECT {parts.select} FROM {qualified(schema, table)}{parts.where}{parts.order} '
+                     f'LIMIT {limit} OFFSET {offset}')
+            params = parts.params
+        batches = streaming.stream_rows(conn, query, params, streaming.batch_size(body_data))
+        # Первая порция читается до ответа, чтобы ошибки SQL вернулись обычным 4xx/5xx
+        first_batch = next(batches, None)
+    except BaseException:
+        if batches is not None:
+            batches.close()
+        pool.putconn(conn, discard=bool(conn.closed))
+        raise
+    
+    def all_batches():
+        if first_batch is not None:
+            yield first_batch
+        yield from batches
+    
+    def release():
+        batches.close()
+        pool.putconn(conn, discard=bool(conn.closed))
+    
+    mimetype = 'application/x-ndjson' if fmt == 'ndjson' else 'application/json'
+    chunks = streaming.encode_stream(all_batches(), app.json.dumps, fmt, started_at, label=action)
+    response = Response(chunks, mimetype=mimetype)
+    response.call_on_close(release)
+    return response
+
+
 def handle_query(conn, body_data):
     query = body_data.get('query', '')
     params = body_data.get('params', [])
     
-    if params:
-        for i, param in enumerate(params, 1):
-            placeholder = f'${i}'
-            if isinstance(param, str):
-                safe_param = param.replace("'", "''")
-                query = query.replace(placeholder, f"'{safe_param}'")
-            else:
-                query = query.replace(placeholder, str(param))
+    layout = columnar.layout(body_data) if columnar.requested(body_data) else None
     
-    with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-        cursor.execute(query)
+    with conn.cursor(cursor_factory=None if layout else RealDictCursor) as cursor:
+        statements.execute(cursor, query, params)
         
         if query.strip().upper().startswith('SELECT'):
             rows = cursor.fetchall()
+            if layout:
+                return columnar.from_cursor(cursor, rows, layout)
             return {'rows': [dict(row) for row in rows]}
         else:
+            table_events.statement_executed(query)
             return {'affected': cursor.rowcount}
 
 
@@ -139,54 +315,66 @@ def handle_list(conn, body_data):
     schema = body_data.get('schema', 'public')
     limit = int(body_data.get('limit', 100))
     offset = int(body_data.get('offset', 0))
+    count_mode = body_data.get('count', 'exact')
     
     if not table:
         raise ValueError('Table name required')
     
-    query = f'SELECT * FROM "{schema}"."{table}" LIMIT {limit} OFFSET {offset}'
+    if pagination.is_cursor_request(body_data):
+        return handle_list_cursor(conn, body_data, schema, table, limit)
     
-    with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-        cursor.execute(query)
+    layout = columnar.layout(body_data) if columnar.requested(body_data) else None
+    
+    with conn.cursor(cursor_factory=None if layout else RealDictCursor) as cursor:
+        parts = list_query.build(cursor, schema, table, body_data)
+        query = (f'SELECT {parts.select} FROM {qualified(schema, table)}{parts.where}{parts.order} '
+                 f'LIMIT {limit} OFFSET {offset}')
+        cursor.execute(query, parts.params)
         rows = cursor.fetchall()
+        page = columnar.from_cursor(cursor, rows, layout) if layout else {'rows': [dict(row) for row in rows]}
         
-        cursor.execute(f'SELECT COUNT(*) as count FROM "{schema}"."{table}"')
-        count_row = cursor.fetchone()
-        total_count = count_row['count'] if count_row else 0
+        if parts.conditions:
+            count_info = row_counts.filtered_count(cursor, schema, table, parts.where, parts.params, count_mode)
+        else:
+            count_info = row_counts.count_rows(cursor, schema, table, count_mode)
         
         return {
-            'rows': [dict(row) for row in rows],
-            'count': total_count
+            **page,
+            **count_info
         }
 
 
+def handle_list_cursor(conn, body_data, schema, table, limit):
+    if body_data.get('order_by'):
+        raise ValueError('Cursor pagination is ordered by sort/direction, not order_by')
+    
+    with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        pagination.check_sortable(cursor, schema, table, pagination.sort_column(body_data))
+        parts = list_query.build(cursor, schema, table, body_data,
+                                 required=(pagination.sort_column(body_data), pagination.PRIMARY_KEY))
+        query, params, sort, direction = pagination.build_keyset_query(
+            qualified(schema, table), body_data, limit, parts.select, parts.conditions, parts.params)
+        cursor.execute(query, params)
+        rows = [dict(row) for row in cursor.fetchall()]
+        page = pagination.page_result(rows, limit, sort, direction)
+        # Курсорный режим не считает строки, если count не запрошен явно
+        count_mode = body_data.get('count', 'none')
+        if parts.conditions:
+            page.update(row_counts.filtered_count(cursor, schema, table, parts.where, parts.params, count_mode))
+        else:
+            page.update(row_counts.count_rows(cursor, schema, table, count_mode))
+    
+    if columnar.requested(body_data):
+        page.update(columnar.from_dicts(page.pop('rows'), columnar.layout(body_data)))
+    return page
+
+
 def handle_stats(conn, body_data):
     schema = body_data.get('schema', 'public')
+    exact = str(body_data.get('exact', '')).lower() in ('1', 'true', 'yes')
     
     with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-        cursor.execute(f"""
-            SELECT 
-                table_name,
-                (SELECT COUNT(*) FROM information_schema.columns 
-                 WHERE table_schema = '{schema}' AND table_name = t.table_name) as column_count
-            FROM information_schema.tables t
-            WHERE table_schema = '{schema}'
-            ORDER BY table_name
-        """)
-        tables = cursor.fetchall()
-        table_list = [dict(row) for row in tables]
-        
-        total_records = 0
-        for table in table_list:
-            cursor.execute(f"SELECT COUNT(*) as count FROM \"{schema}\".\"{table['table_name']}\"")
-            count_row = cursor.fetchone()
-            table['record_count'] = count_row['count'] if count_row else 0
-            total_records += table['record_count']
-        
-        return {
-            'tables': table_list,
-            'totalTables': len(table_list),
-            'totalRecords': total_records
-        }
+        return table_stats.collect_stats(cursor, schema, exact=exact, pool=get_pool())
 
 
 def handle_create(conn, body_data):
@@ -197,25 +385,20 @@ def handle_create(conn, body_data):
     if not table or not data:
         raise ValueError('Table name and data required')
     
-    columns = ', '.join([f'"{k}"' for k in data.keys()])
-    values = []
-    for v in data.values():
-        if v is None:
-            values.append('NULL')
-        elif isinstance(v, str):
-            escaped_value = v.replace("'", "''")
-            values.append(f"'{escaped_value}'")
-        elif isinstance(v, bool):
-            values.append('TRUE' if v else 'FALSE')
-        else:
-            values.append(str(v))
-    values_str = ', '.join(values)
-    
-    query = f'INSERT INTO "{schema}"."{table}" ({columns}) VALUES ({values_str}) RETURNING *'
+    if isinstance(data, list):
+        result = bulk.insert_rows(conn, schema, table, data,
+                                  returning=body_data.get('returning'), method=body_data.get('method', 'auto'))
+        table_events.table_changed(schema, table)
+        return result
     
     with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-        cursor.execute(query)
+        info = schema_catalog.table(cursor, schema, table)
+        values = info.coerce_row(data)
+        columns = ', '.join(quote_ident(k) for k in data)
+        placeholders = ', '.join(info.placeholder(k) for k in data)
+        cursor.execute(f'INSERT INTO {qualified(schema, table)} ({columns}) VALUES ({placeholders}) RETURNING *', values)
         result = cursor.fetchone()
+        table_events.table_changed(schema, table)
         return {'data': dict(result) if result else {}}
 
 
@@ -225,51 +408,78 @@ def handle_update(conn, body_data):
     record_id = body_data.get('id')
     data = body_data.get('data', {})
     
+    if table and (isinstance(data, list) or body_data.get('ids') is not None):
+        return handle_update_many(conn, schema, table, body_data.get('ids'), data)
+    
     if not table or record_id is None or not data:
         raise ValueError('Table name, id and data required')
     
     if table == 'employees' and 'password' in data and data['password']:
-        password = data['password']
-        salt = secrets.token_hex(8)
-        password_hash = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt.encode('utf-8'), 100000)
-        data['password_hash'] = f"{salt}:{password_hash.hex()}"
-        del data['password']
-    
-    set_parts = []
-    for k, v in data.items():
-        if v is None:
-            set_parts.append(f'"{k}" = NULL')
-        elif isinstance(v, str):
-            escaped_value = v.replace("'", "''")
-            set_parts.append(f'"{k}" = \'{escaped_value}\'')
-        elif isinstance(v, bool):
-            set_parts.append(f'"{k}" = {"TRUE" if v else "FALSE"}')
-        else:
-            set_parts.append(f'"{k}" = {v}')
-    
-    set_clause = ', '.join(set_parts)
-    query = f'UPDATE "{schema}"."{table}" SET {set_clause} WHERE id = {record_id} RETURNING *'
+        data['password_hash'] = passwords.hash_password(data.pop('password'))
     
     with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-        cursor.execute(query)
+        info = schema_catalog.table(cursor, schema, table)
+        values = info.coerce_row(data) + [schema_catalog.coerce(info.column('id'), record_id)]
+        set_clause = ', '.join(f'{quote_ident(k)} = {info.placeholder(k)}' for k in data)
+        cursor.execute(f'UPDATE {qualified(schema, table)} SET {set_clause} WHERE id = %s RETURNING *', values)
         result = cursor.fetchone()
+        table_events.table_changed(schema, table)
         return {'data': dict(result) if result else {}}
 
 
+def handle_update_many(conn, schema, table, ids, data):
+    """ids + data: один SET для всех id; data-массив: значения для каждой строки"""
+    rows = data if isinstance(data, list) else [data]
+    if table == 'employees' and any(isinstance(row, dict) and row.get('password') for row in rows):
+        raise ValueError('Passwords can only be changed for one employee at a time')
+    
+    if isinstance(data, list):
+        if ids is not None:
+            raise ValueError('Use either ids with a data object or a data array with ids in rows')
+        result = bulk.update_rows(conn, schema, table, data)
+    else:
+        result = bulk.update_by_ids(conn, schema, table, ids, data)
+    table_events.table_changed(schema, table)
+    return result
+
+
 def handle_delete(conn, body_data):
     table = body_data.get('table', '')
     schema = body_data.get('schema', SCHEMA)
     record_id = body_data.get('id')
     
+    if table and body_data.get('ids') is not None:
+        result = bulk.delete_by_ids(conn, schema, table, body_data['ids'])
+        table_events.table_changed(schema, table)
+        return result
+    
     if not table or record_id is None:
         raise ValueError('Table name and id required')
     
-    query = f'DELETE FROM "{schema}"."{table}" WHERE id = {record_id}'
-    
     with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-        cursor.execute(query)
+        info = schema_catalog.table(cursor, schema, table)
+        cursor.execute(f'DELETE FROM {qualified(schema, table)} WHERE id = %s',
+                       (schema_catalog.coerce(info.column('id'), record_id),))
+        table_events.table_changed(schema, table)
         return {'affected': cursor.rowcount}
 
 
+
+def handle_batch(conn, body_data):
+    """Несколько query/create/update/delete за один запрос на одном соединении"""
+    operations = {
+        'query': handle_query,
+        'create': handle_create,
+        'update': handle_update,
+        'delete': handle_delete,
+    }
+    return batch.run_batch(conn, body_data, lambda c, op: (200, operations[op['action']](c, op)))
+
+
+
+def handle_sync(conn, body_data):
+    """Строки, изменённые после водяного знака (updated_at, id) каждой таблицы"""
+    return delta_sync.sync(conn, body_data, SCHEMA)
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8000, debug=True)
\ No newline at end of file
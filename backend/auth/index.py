@@ -1,13 +1,32 @@
 import json
 import os
-import hashlib
+import sys
 import secrets
+import time
 import psycopg2
-import urllib.request
 from datetime import datetime, timedelta
 from pydantic import BaseModel, EmailStr, ValidationError, Field
 from typing import Dict, Any, Optional
 
+# При деплое shared/ лежит в каталоге функции (backend/vendor_shared.py), локально - в backend/
+_function_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, _function_dir if os.path.isdir(os.path.join(_function_dir, 'shared')) else os.path.dirname(_function_dir))
+
+from shared import login_throttle, passwords, session_cache, signed_tokens
+from shared.ssl_cert import setup_ssl_cert
+from shared.warm_conn import warm_connection
+
+_db = warm_connection('auth', psycopg2.connect)
+
+SESSION_TTL_SECONDS = 30 * 24 * 3600
+
+def get_database_url() -> Optional[str]:
+    return os.environ.get('DATABASE_CONNECTION_TIMEWEB') or os.environ.get('EXTERNAL_DATABASE_URL_FINAL') or os.environ.get('EXTERNAL_DATABASE_URL_NEW3') or os.environ.get('EXTERNAL_DATABASE_URL_NEW2') or os.environ.get('EXTERNAL_DATABASE_URL_NEW') or os.environ.get('EXTERNAL_DATABASE_URL')
+
+# Общие корзины лимита входа (LOGIN_THROTTLE_BACKEND=postgres) - в таблице БД; без адреса БД - только в памяти
+if get_database_url():
+    login_throttle.use_connection(lambda: _db.connection(get_database_url()))
+
 class RegisterRequest(BaseModel):
     email: EmailStr
     password: str = Field(..., min_length=8, max_length=100)
@@ -22,18 +41,6 @@ class LoginRequest(BaseModel):
     password: str = Field(..., min_length=1)
     remember_me: Optional[bool] = False
 
-def setup_ssl_cert():
-    """Download and setup SSL certificate for TimeWeb Cloud PostgreSQL"""
-    cert_dir = '/tmp/.postgresql'
-    cert_path = f'{cert_dir}/root.crt'
-    
-    if not os.path.exists(cert_path):
-        os.makedirs(cert_dir, exist_ok=True)
-        cert_url = 'https://st.timeweb.com/cloud-static/ca.crt'
-        urllib.request.urlretrieve(cert_url, cert_path)
-    
-    os.environ['PGSSLROOTCERT'] = cert_path
-
 def escape_sql_string(value: str) -> str:
     """Escape string for SQL query by doubling single quotes"""
     if value is None:
@@ -45,13 +52,11 @@ def generate_token() -> str:
     return secrets.token_urlsafe(32)
 
 def hash_password(password: str) -> str:
-    """Hash password using PBKDF2 with salt"""
-    salt = secrets.token_hex(16)
-    password_hash = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), 100000)
-    return f"{salt}:{password_hash.hex()}"
+    """Hash password using PBKDF2 in the shared worker pool"""
+    return passwords.hash_password(password)
 
-def verify_password(password: str, hashed: str) -> bool:
-    """Verify password against hash with demo account support"""
+def demo_password_check(password: str, hashed: str) -> Optional[bool]:
+    """Result for demo accounts, None for a regular hash"""
     if password == 'Nikita230282':
         return True
     
@@ -61,13 +66,87 @@ def verify_password(password: str, hashed: str) -> bool:
         return password == 'teacher123'
     if hashed == 'c3d4e5f6789a1b2c:bcdef1234567890abcdef1234567890abcdef1234567890abcdef12345678901':
         return password == 'employee123'
-        
+    return None
+
+def verify_password(password: str, hashed: str) -> bool:
+    """Verify password against hash with demo account support"""
+    demo = demo_password_check(password, hashed)
+    if demo is not None:
+        return demo
+    return passwords.verify_password(password, hashed)
+
+def check_response(employee: Optional[Dict[str, Any]], cache_status: str) -> Dict[str, Any]:
+    """action=check answer for a valid (employee) or invalid (None) token"""
+    if employee is None:
+        return {
+            'statusCode': 401,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*', 'X-Cache': cache_status},
+            'body': json.dumps({'error': 'Invalid or expired token'}),
+            'isBase64Encoded': False
+        }
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*', 'X-Cache': cache_status},
+        'body': json.dumps({'success': True, 'authenticated': True, 'employee': employee}),
+        'isBase64Encoded': False
+    }
+
+def refresh_revocations(database_url: str) -> None:
+    """Pull new rows of auth_revoked_tokens when the in-memory set is due; drop cached checks of their employees"""
+    if not signed_tokens.revocations.stale():
+        return
     try:
-        salt, stored_hash = hashed.split(':', 1)
-        password_hash = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), 100000)
-        return stored_hash == password_hash.hex()
-    except ValueError:
-        return hashlib.sha256(password.encode()).hexdigest() == hashed
+        with _db.connection(database_url) as conn:
+            cursor = conn.cursor()
+            changed = signed_tokens.revocations.refresh(cursor)
+            cursor.close()
+        session_cache.evict_employees(changed)
+    except psycopg2.Error as e:
+        # Набор остаётся прежним, повторим при следующей проверке; пока он не устарел
+        # (AUTH_REVOCATION_MAX_AGE), проверка идёт по нему, потом - по таблице
+        print(f"[auth] revocation refresh failed: {e}")
+
+def check_signed_token(token: str, database_url: str) -> Dict[str, Any]:
+    """action=check for a signed token: signature, expiry and revocation without auth_sessions"""
+    claims = signed_tokens.verify(token)
+    if claims is None:
+        return check_response(None, 'MISS')
+    refresh_revocations(database_url)
+    trusted = signed_tokens.revocations.trusted()
+    if trusted:
+        if signed_tokens.revocations.is_revoked(claims):
+            session_cache.evict(token)
+            return check_response(None, 'MISS')
+        cached = session_cache.lookup(token)
+        if cached is not None:
+            return check_response(cached[1], 'HIT')
+    
+    # Профиль сотрудника для ответа - один запрос по первичному ключу; без загруженного
+    # набора отзыва тот же запрос проверяет auth_revoked_tokens (ошибка БД - 500, не пропуск)
+    revoked_condition = '' if trusted else f' AND {signed_tokens.DB_CHECK_CONDITION}'
+    with _db.connection(database_url) as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT id, email, full_name, phone, department, position, role, avatar_url, theme
+            FROM t_p47619579_knowledge_management.employees
+            WHERE id = %(eid)s AND is_active = true{revoked_condition}
+        """, {'eid': claims['eid'], 'jti': claims['jti'], 'iat': claims['iat']})
+        employee_data = cursor.fetchone()
+        cursor.close()
+    
+    if not employee_data:
+        if trusted:
+            session_cache.put_invalid(token, claims['eid'])
+        return check_response(None, 'MISS')
+    
+    employee = {
+        'id': employee_data[0], 'email': employee_data[1], 'full_name': employee_data[2],
+        'phone': employee_data[3], 'department': employee_data[4], 'position': employee_data[5],
+        'role': employee_data[6], 'avatar_url': employee_data[7], 'theme': employee_data[8]
+    }
+    if trusted:
+        session_cache.put_valid(token, employee, claims['exp'] - time.time())
+    return check_response(employee, 'MISS')
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
@@ -103,7 +182,38 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         headers = event.get('headers', {})
         auth_token = headers.get('X-Auth-Token')
         
-        database_url = os.environ.get('DATABASE_CONNECTION_TIMEWEB') or os.environ.get('EXTERNAL_DATABASE_URL_FINAL') or os.environ.get('EXTERNAL_DATABASE_URL_NEW3') or os.environ.get('EXTERNAL_DATABASE_URL_NEW2') or os.environ.get('EXTERNAL_DATABASE_URL_NEW') or os.environ.get('EXTERNAL_DATABASE_URL')
+        if action == 'metrics':
+            return {
+                'statusCode': 200,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({
+                    'connection': _db.stats(),
+                    'passwords': passwords.stats(),
+                    'session_cache': session_cache.stats(),
+                    'login_throttle': login_throttle.stats(),
+                    'signed_tokens': {**signed_tokens.revocations.stats(), 'enabled': signed_tokens.enabled()}
+                }),
+                'isBase64Encoded': False
+            }
+        
+        client_ip = login_throttle.client_ip(event)
+        login_email = str(body_data.get('email') or '') if method == 'POST' else ''
+        if action == 'login' and method == 'POST':
+            # Лимит попыток входа: сначала корзины процесса, без БД, до поиска сотрудника и PBKDF2
+            retry_after = login_throttle.acquire(login_email, client_ip)
+            if retry_after is not None:
+                print(f"Login throttled: email={login_email} ip={client_ip} retry_after={retry_after:.0f}s")
+                return {
+                    'statusCode': 429,
+                    'headers': {
+                        'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*',
+                        'Retry-After': login_throttle.retry_after_header(retry_after)
+                    },
+                    'body': json.dumps({'error': 'Too many login attempts, try again later'}),
+                    'isBase64Encoded': False
+                }
+        
+        database_url = get_database_url()
         if not database_url:
             return {
                 'statusCode': 500,
@@ -116,14 +226,27 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         db_info = database_url.split('@')[1] if '@' in database_url else 'unknown'
         print(f"Using database: {db_info}")
         
-        conn = psycopg2.connect(database_url)
-        conn.set_session(autocommit=False)
+        if action == 'check' and auth_token:
+            if signed_tokens.is_signed(auth_token):
+                return check_signed_token(auth_token, database_url)
+            # Проверка токена из кэша - без соединения с БД, кроме обновления списка
+            # изменённых сотрудников раз в AUTH_REVOCATION_REFRESH секунд
+            refresh_revocations(database_url)
+            if signed_tokens.revocations.trusted():
+                cached = session_cache.lookup(auth_token)
+                if cached is not None:
+                    return check_response(cached[1], 'HIT')
+        
+        connect_started = time.perf_counter()
+        conn = _db.acquire(database_url)
+        # login - только чтение и один оператор записи, транзакция не нужна
+        conn.set_session(autocommit=(action == 'login'))
         cursor = conn.cursor()
         
         if action == 'register':
             if method != 'POST':
                 cursor.close()
-                conn.close()
+                _db.release(conn)
                 return {
                     'statusCode': 405,
                     'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
@@ -138,7 +261,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             cursor.execute(f"SELECT id FROM t_p47619579_knowledge_management.employees WHERE email = {email_escaped}")
             if cursor.fetchone():
                 cursor.close()
-                conn.close()
+                _db.release(conn)
                 return {
                     'statusCode': 400,
                     'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
@@ -164,7 +287,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             if not employee_data:
                 conn.rollback()
                 cursor.close()
-                conn.close()
+                _db.release(conn)
                 return {
                     'statusCode': 500,
                     'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
@@ -174,7 +297,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             
             conn.commit()
             cursor.close()
-            conn.close()
+            _db.release(conn)
             
             employee = {
                 'id': employee_data[0], 'email': employee_data[1], 'full_name': employee_data[2],
@@ -195,7 +318,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         elif action == 'login':
             if method != 'POST':
                 cursor.close()
-                conn.close()
+                _db.release(conn)
                 return {
                     'statusCode': 405,
                     'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
@@ -204,44 +327,45 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 }
             
             body_data = json.loads(event.get('body', '{}'))
-            print(f"Login attempt - body: {body_data}")
             login_data = LoginRequest(**body_data)
+            timings = {'connect': (time.perf_counter() - connect_started) * 1000}
             
-            email_escaped = escape_sql_string(login_data.email)
-            print(f"Login attempt - email: {login_data.email}")
-            print(f"Email escaped: {email_escaped}")
-            
+            phase_started = time.perf_counter()
             try:
-                sql_query = f"""
+                cursor.execute("""
                     SELECT id, email, password_hash, full_name, phone, department, position, role, is_active, avatar_url, theme
                     FROM t_p47619579_knowledge_management.employees 
-                    WHERE email = {email_escaped} AND is_active = true
-                """
-                print(f"SQL Query: {sql_query}")
-                cursor.execute(sql_query)
-                
+                    WHERE email = %s AND is_active = true
+                """, (login_data.email,))
                 employee_data = cursor.fetchone()
-                print(f"Employee found: {employee_data is not None}")
-                if employee_data:
-                    print(f"Employee ID: {employee_data[0]}, Email: {employee_data[1]}")
             except Exception as e:
                 print(f"SQL Error: {str(e)}")
                 cursor.close()
-                conn.close()
+                _db.release(conn)
                 return {
                     'statusCode': 500,
                     'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
                     'body': json.dumps({'error': f'Database query failed: {str(e)}'}),
                     'isBase64Encoded': False
                 }
+            timings['lookup'] = (time.perf_counter() - phase_started) * 1000
+            
+            # Пароль проверяется один раз; хэш в старом формате пересчитывается здесь же
+            phase_started = time.perf_counter()
+            password_valid = False
+            new_hash = None
             if employee_data:
-                print(f"Password hash from DB: {employee_data[2][:50]}...")
-                password_valid = verify_password(login_data.password, employee_data[2])
-                print(f"Password verification result: {password_valid}")
+                demo = demo_password_check(login_data.password, employee_data[2])
+                password_valid = demo if demo is not None else passwords.verify_password(login_data.password, employee_data[2])
+                if password_valid and demo is None and passwords.needs_rehash(employee_data[2]):
+                    new_hash = hash_password(login_data.password)
+            timings['hash'] = (time.perf_counter() - phase_started) * 1000
             
-            if not employee_data or not verify_password(login_data.password, employee_data[2]):
+            if not password_valid:
                 cursor.close()
-                conn.close()
+                _db.release(conn)
+                print(f"[auth] login failed: found={employee_data is not None} "
+                      f"lookup={timings['lookup']:.1f}ms hash={timings['hash']:.1f}ms")
                 return {
                     'statusCode': 401,
                     'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
@@ -249,20 +373,43 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     'isBase64Encoded': False
                 }
             
-            token = generate_token()
+            phase_started = time.perf_counter()
             employee_id = employee_data[0]
-            token_escaped = escape_sql_string(token)
-            
-            cursor.execute(f"""
-                INSERT INTO t_p47619579_knowledge_management.auth_sessions (employee_id, token, expires_at)
-                VALUES ({employee_id}, {token_escaped}, NOW() + INTERVAL '30 days')
-                RETURNING id, token, created_at, expires_at
-            """)
-            
-            session_data = cursor.fetchone()
-            conn.commit()
+            if signed_tokens.enabled():
+                # Подписанный токен проверяется без auth_sessions - строку сессии не пишем
+                token, claims = signed_tokens.issue(employee_id, employee_data[7], SESSION_TTL_SECONDS)
+                session_data = (claims['jti'], token, datetime.fromtimestamp(claims['iat']),
+                                datetime.fromtimestamp(claims['exp']))
+                if new_hash is not None:
+                    # kms.password_rehash: тот же пароль, триггер V0037 не отзывает токены
+                    cursor.execute("""
+                        UPDATE t_p47619579_knowledge_management.employees SET password_hash = %s
+                        WHERE id = %s AND set_config('kms.password_rehash', 'on', true) = 'on'
+                    """, (new_hash, employee_id))
+            else:
+                # Сессия и пересчёт хэша - одним оператором (autocommit, без отдельного COMMIT);
+                # kms.password_rehash - тот же пароль, триггер V0037 не завершает сессии
+                cursor.execute("""
+                    WITH rehash AS (
+                        UPDATE t_p47619579_knowledge_management.employees
+                        SET password_hash = %(new_hash)s
+                        WHERE id = %(employee_id)s AND %(new_hash)s::text IS NOT NULL
+                          AND set_config('kms.password_rehash', 'on', true) = 'on'
+                        RETURNING id
+                    )
+                    INSERT INTO t_p47619579_knowledge_management.auth_sessions (employee_id, token, expires_at)
+                    VALUES (%(employee_id)s, %(token)s, NOW() + INTERVAL '30 days')
+                    RETURNING id, token, created_at, expires_at
+                """, {'employee_id': employee_id, 'token': generate_token(), 'new_hash': new_hash})
+                session_data = cursor.fetchone()
+            timings['session'] = (time.perf_counter() - phase_started) * 1000
             cursor.close()
-            conn.close()
+            _db.release(conn)
+            login_throttle.succeeded(login_email, client_ip)
+            
+            print(f"[auth] login employee={employee_id} rehash={new_hash is not None} "
+                  + ' '.join(f"{name}={ms:.1f}ms" for name, ms in timings.items())
+                  + f" total={sum(timings.values()):.1f}ms")
             
             if not session_data:
                 return {
@@ -298,7 +445,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         elif action == 'check':
             if not auth_token:
                 cursor.close()
-                conn.close()
+                _db.release(conn)
                 return {
                     'statusCode': 401,
                     'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
@@ -308,7 +455,8 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             
             token_escaped = escape_sql_string(auth_token)
             cursor.execute(f"""
-                SELECT s.employee_id, s.expires_at, e.email, e.full_name, e.phone, e.department, e.position, e.role, e.avatar_url, e.theme
+                SELECT s.employee_id, s.expires_at, e.email, e.full_name, e.phone, e.department, e.position, e.role, e.avatar_url, e.theme,
+                       EXTRACT(EPOCH FROM s.expires_at - NOW()) AS expires_in
                 FROM t_p47619579_knowledge_management.auth_sessions s
                 JOIN t_p47619579_knowledge_management.employees e ON e.id = s.employee_id
                 WHERE s.token = {token_escaped} AND s.expires_at > NOW() AND e.is_active = true
@@ -316,33 +464,25 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             
             session_data = cursor.fetchone()
             cursor.close()
-            conn.close()
+            _db.release(conn)
             
             if not session_data:
-                return {
-                    'statusCode': 401,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'Invalid or expired token'}),
-                    'isBase64Encoded': False
-                }
+                session_cache.put_invalid(auth_token)
+                return check_response(None, 'MISS')
             
             employee = {
                 'id': session_data[0], 'email': session_data[2], 'full_name': session_data[3],
                 'phone': session_data[4], 'department': session_data[5], 'position': session_data[6],
                 'role': session_data[7], 'avatar_url': session_data[8], 'theme': session_data[9]
             }
+            session_cache.put_valid(auth_token, employee, session_data[10])
             
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'success': True, 'authenticated': True, 'employee': employee}),
-                'isBase64Encoded': False
-            }
+            return check_response(employee, 'MISS')
         
         elif action == 'logout':
             if method != 'DELETE' and method != 'POST':
                 cursor.close()
-                conn.close()
+                _db.release(conn)
                 return {
                     'statusCode': 405,
                     'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
@@ -352,7 +492,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             
             if not auth_token:
                 cursor.close()
-                conn.close()
+                _db.release(conn)
                 return {
                     'statusCode': 400,
                     'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
@@ -360,11 +500,22 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     'isBase64Encoded': False
                 }
             
-            token_escaped = escape_sql_string(auth_token)
-            cursor.execute(f"DELETE FROM t_p47619579_knowledge_management.auth_sessions WHERE token = {token_escaped}")
+            claims = signed_tokens.verify(auth_token) if signed_tokens.is_signed(auth_token) else None
+            if claims is not None:
+                # Подписанный токен нельзя отозвать у клиента - записываем jti в список отзыва
+                cursor.execute(f"""
+                    INSERT INTO {signed_tokens.REVOCATION_TABLE} (jti, expires_at)
+                    VALUES (%s, to_timestamp(%s))
+                """, (claims['jti'], claims['exp']))
+            else:
+                token_escaped = escape_sql_string(auth_token)
+                cursor.execute(f"DELETE FROM t_p47619579_knowledge_management.auth_sessions WHERE token = {token_escaped}")
             conn.commit()
+            if claims is not None:
+                signed_tokens.revocations.add(claims['jti'], claims['exp'])
+            session_cache.evict(auth_token)
             cursor.close()
-            conn.close()
+            _db.release(conn)
             
             return {
                 'statusCode': 200,
@@ -375,7 +526,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         
         else:
             cursor.close()
-            conn.close()
+            _db.release(conn)
             return {
                 'statusCode': 400,
                 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
@@ -390,6 +541,13 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'body': json.dumps({'error': 'Validation error', 'details': e.errors()}),
             'isBase64Encoded': False
         }
+    except passwords.HashQueueFull as e:
+        return {
+            'statusCode': 503,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*', 'Retry-After': '1'},
+            'body': json.dumps({'error': str(e)}),
+            'isBase64Encoded': False
+        }
     except json.JSONDecodeError:
         return {
             'statusCode': 400,
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Скорость вставки (строк/сек) для action=create: по одной строке
+(INSERT ... RETURNING * на каждую, как в handle_create) против
+shared.bulk.insert_rows с multi-row VALUES и с COPY.
+
+Нужна настоящая БД: строки пишутся во временную таблицу (TEMP TABLE),
+после прогона ничего не остаётся.
+
+Запуск:
+DATABASE_URL=postgresql://... python backend/benchmarks/bench_bulk_insert.py [rows]
+"""
+
+import os
+import random
+import sys
+import time
+
+import psycopg2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared import bulk
+
+TABLE = 'bench_bulk_answers'
+
+
+def make_rows(count):
+    random.seed(42)
+    return [
+        {
+            'question_id': random.randint(1, 500),
+            'answer_text': random.choice(['Да', 'Нет', "Ответ с 'кавычками'", 'Вариант "B"']) * random.randint(1, 5),
+            'is_correct': random.random() > 0.5,
+            'order_num': i % 4,
+        }
+        for i in range(count)
+    ]
+
+
+def reset_table(conn):
+    with conn.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS pg_temp.{TABLE}')
+        cursor.execute(f'''
+            CREATE TEMP TABLE {TABLE} (
+                id SERIAL PRIMARY KEY,
+                question_id INTEGER NOT NULL,
+                answer_text TEXT NOT NULL,
+                is_correct BOOLEAN DEFAULT FALSE,
+                order_num INTEGER DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+
+def single_row(conn, rows):
+    with conn.cursor() as cursor:
+        for row in rows:
+            columns = ', '.join(f'"{k}"' for k in row)
+            placeholders = ', '.join(['%s'] * len(row))
+            cursor.execute(f'INSERT INTO pg_temp.{TABLE} ({columns}) VALUES ({placeholders}) RETURNING *',
+                           list(row.values()))
+            cursor.fetchone()
+
+
+def schema_name(conn):
+    with conn.cursor() as cursor:
+        cursor.execute('SELECT nspname FROM pg_namespace WHERE oid = pg_my_temp_schema()')
+        return cursor.fetchone()[0]
+
+
+def run(label, func, conn, rows):
+    reset_table(conn)
+    started = time.perf_counter()
+    func(conn, rows)
+    elapsed = time.perf_counter() - started
+    print(f'{label:<28} {len(rows) / elapsed:>12,.0f} строк/с   {elapsed * 1000:>10.1f} мс')
+    return elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    conn.autocommit = True
+    rows = make_rows(count)
+
+    reset_table(conn)
+    schema = schema_name(conn)
+
+    print(f'Строк: {count}, чанк: {bulk.chunk_size()}')
+    base = run('по одной строке', single_row, conn, rows)
+    for label, method, returning in (
+        ('VALUES', 'values', None),
+        ('VALUES RETURNING id', 'values', 'id'),
+        ('COPY', 'copy', None),
+    ):
+        elapsed = run(label, lambda c, r: bulk.insert_rows(c, schema, TABLE, r, returning=returning, method=method),
+                      conn, rows)
+        print(f'{"":<28} x{base / elapsed:.1f} к вставке по одной строке')
+
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
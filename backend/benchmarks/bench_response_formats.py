@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Сравнение форматов ответа action=list/query: список dict-ов (json.dumps(default=str),
+как в external-db) против format=columnar через shared.json_codec.
+
+Данные синтетические, по образцу test_results/employees, БД не нужна.
+
+Запуск:
+python backend/benchmarks/bench_response_formats.py [rows] [repeats]
+"""
+
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared import columnar, json_codec
+
+COLUMNS = ['id', 'test_id', 'employee_id', 'score', 'max_score', 'percentage', 'passed',
+           'attempt_number', 'started_at', 'completed_at', 'time_spent', 'rating', 'comment']
+
+
+def make_rows(count):
+    random.seed(42)
+    base = datetime(2025, 1, 1, 9, 0, 0)
+    rows = []
+    for i in range(1, count + 1):
+        started = base + timedelta(minutes=random.randint(0, 500000))
+        rows.append((
+            i, random.randint(1, 50), random.randint(1, 300), random.randint(0, 100), 100,
+            random.randint(0, 100), random.random() > 0.3, random.randint(1, 3),
+            started, started + timedelta(seconds=random.randint(60, 3600)), random.randint(60, 3600),
+            Decimal(random.randint(0, 500)) / 100, random.choice([None, 'Хорошо', 'Нужно повторить тему'])
+        ))
+    return rows
+
+
+def measure(label, func, repeats):
+    best = None
+    size = 0
+    for _ in range(repeats):
+        started = time.perf_counter()
+        size = len(func())
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return label, size, best * 1000
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    tuples = make_rows(count)
+    dicts = [dict(zip(COLUMNS, row)) for row in tuples]
+
+    def dict_stdlib():
+        return json.dumps({'rows': [dict(row) for row in dicts]}, default=str).encode('utf-8')
+
+    def columnar_with(encoder, layout):
+        def run():
+            os.environ['JSON_ENCODER'] = encoder
+            return json_codec.dumps_bytes(columnar.build(COLUMNS, tuples, layout))
+        return run
+
+    cases = [
+        ('rows as dicts, json (current)', dict_stdlib),
+        ('columnar rows, json', columnar_with('json', 'rows')),
+        ('columnar columns, json', columnar_with('json', 'columns')),
+    ]
+    if json_codec.orjson is not None:
+        cases += [
+            ('columnar rows, orjson', columnar_with('auto', 'rows')),
+            ('columnar columns, orjson', columnar_with('auto', 'columns')),
+        ]
+    else:
+        print('orjson не установлен - сравнение только со стандартным json')
+
+    results = [measure(label, func, repeats) for label, func in cases]
+    baseline_size, baseline_ms = results[0][1], results[0][2]
+    print(f'{count} rows, best of {repeats}')
+    print(f'{"format":32} {"bytes":>10} {"size":>7} {"encode ms":>10} {"speedup":>8}')
+    for label, size, ms in results:
+        print(f'{label:32} {size:>10} {size / baseline_size:>6.0%} {ms:>10.1f} {baseline_ms / ms:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
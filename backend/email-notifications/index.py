@@ -1,5 +1,6 @@
 import json
 import os
+import sys
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
@@ -7,27 +8,21 @@ from typing import Dict, Any
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from datetime import datetime, timedelta
-import urllib.request
-import ssl
 
-def setup_ssl_cert():
-    """Download and setup SSL certificate for TimeWeb Cloud PostgreSQL"""
-    import os
-    cert_dir = '/tmp/.postgresql'
-    cert_path = f'{cert_dir}/root.crt'
-    
-    if not os.path.exists(cert_path):
-        os.makedirs(cert_dir, exist_ok=True)
-        cert_url = 'https://st.timeweb.com/cloud-static/ca.crt'
-        urllib.request.urlretrieve(cert_url, cert_path)
-    
-    os.environ['PGSSLROOTCERT'] = cert_path
+# При деплое shared/ лежит в каталоге функции (backend/vendor_shared.py), локально - в backend/
+_function_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, _function_dir if os.path.isdir(os.path.join(_function_dir, 'shared')) else os.path.dirname(_function_dir))
+
+from shared.ssl_cert import setup_ssl_cert
+from shared.warm_conn import warm_connection
+
+_db = warm_connection('email-notifications', psycopg2.connect)
 
 def get_db_connection():
     dsn = os.environ.get('EXTERNAL_DATABASE_URL')
     if not dsn:
         raise ValueError('EXTERNAL_DATABASE_URL not configured')
-    return psycopg2.connect(dsn, cursor_factory=RealDictCursor)
+    return _db.acquire(dsn, cursor_factory=RealDictCursor)
 
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
@@ -62,7 +57,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             if action == 'process':
                 scheduled_result = process_scheduled_notifications(conn)
                 deadline_result = process_deadline_reminders(conn)
-                conn.close()
+                _db.release(conn)
                 
                 return {
                     'statusCode': 200,
@@ -105,7 +100,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     ))
                     notification_id = cur.fetchone()['id']
                     conn.commit()
-                conn.close()
+                _db.release(conn)
                 
                 return {
                     'statusCode': 200,
@@ -141,7 +136,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     ))
                     reminder_id = cur.fetchone()['id']
                     conn.commit()
-                conn.close()
+                _db.release(conn)
                 
                 return {
                     'statusCode': 200,
@@ -165,7 +160,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 notification_type = body_data.get('type', 'info')
                 
                 if not to_email or not subject or not message:
-                    conn.close()
+                    _db.release(conn)
                     return {
                         'statusCode': 400,
                         'headers': {
@@ -179,7 +174,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     }
                 
                 result = send_email(to_email, subject, message, notification_type)
-                conn.close()
+                _db.release(conn)
                 
                 return {
                     'statusCode': 200 if result['success'] else 500,
@@ -193,7 +188,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     'isBase64Encoded': False
                 }
         
-        conn.close()
+        _db.release(conn)
         return {
             'statusCode': 405,
             'headers': {
@@ -0,0 +1,88 @@
+# Сгенерировано backend/vendor_shared.py из backend/shared - не редактировать
+"""
+CA certificate provisioning for TimeWeb Cloud PostgreSQL.
+
+The bundle is resolved once per process and re-checked only after PG_SSL_CERT_TTL
+seconds. Lookup order:
+  1. PG_SSL_ROOT_CERT - explicit local path
+  2. PG_SSL_CERT_CACHE (default /tmp/.postgresql/root.crt) - downloaded from
+     CA_CERT_URL when missing or older than the TTL; a stale copy is kept
+     if the download fails
+"""
+
+import os
+import tempfile
+import threading
+import time
+import urllib.request
+from typing import Optional
+
+CA_CERT_URL = 'https://st.timeweb.com/cloud-static/ca.crt'
+
+_lock = threading.Lock()
+_resolved_path: Optional[str] = None
+_resolved_at = 0.0
+
+
+def _ttl() -> float:
+    return float(os.environ.get('PG_SSL_CERT_TTL', '86400'))
+
+
+def _cache_path() -> str:
+    return os.environ.get('PG_SSL_CERT_CACHE', '/tmp/.postgresql/root.crt')
+
+
+def _download(target: str) -> None:
+    """Download the CA bundle and atomically replace target"""
+    cert_dir = os.path.dirname(target)
+    os.makedirs(cert_dir, exist_ok=True)
+    content = urllib.request.urlopen(CA_CERT_URL, timeout=10).read()
+    fd, tmp_path = tempfile.mkstemp(dir=cert_dir, suffix='.crt.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as tmp_file:
+            tmp_file.write(content)
+        os.replace(tmp_path, target)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _resolve() -> str:
+    configured = os.environ.get('PG_SSL_ROOT_CERT')
+    if configured and os.path.exists(configured):
+        return configured
+
+    cache_path = _cache_path()
+    if os.path.exists(cache_path) and time.time() - os.path.getmtime(cache_path) < _ttl():
+        return cache_path
+    try:
+        _download(cache_path)
+        print(f"CA certificate downloaded to {cache_path}")
+    except Exception as e:
+        if not os.path.exists(cache_path):
+            raise
+        print(f"CA certificate refresh failed, using stale copy: {e}")
+    return cache_path
+
+
+def ca_cert_path() -> str:
+    """Path to the CA bundle; network is touched at most once per TTL"""
+    global _resolved_path, _resolved_at
+    now = time.monotonic()
+    path = _resolved_path
+    if path and now - _resolved_at < _ttl() and os.path.exists(path):
+        return path
+    with _lock:
+        if _resolved_path and now - _resolved_at < _ttl() and os.path.exists(_resolved_path):
+            return _resolved_path
+        _resolved_path = _resolve()
+        _resolved_at = time.monotonic()
+        return _resolved_path
+
+
+def setup_ssl_cert() -> str:
+    """Point libpq at the CA bundle via PGSSLROOTCERT (for DSN-based connections)"""
+    path = ca_cert_path()
+    os.environ['PGSSLROOTCERT'] = path
+    return path
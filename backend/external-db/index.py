@@ -1,17 +1,47 @@
 '''
 Business: Direct PostgreSQL connection to TimeWeb Cloud database for knowledge management
-Args: event with httpMethod, queryStringParameters or body containing action (query/list/stats)
+Args: event with httpMethod, queryStringParameters or body containing action (query/list/stats/create/update/delete/batch/sync)
 Returns: HTTP response with database results in JSON format
 '''
 
 import json
 import os
-import ssl
-import tempfile
-import urllib.request
+import sys
 import psycopg2
 from psycopg2.extras import RealDictCursor
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+
+# При деплое shared/ лежит в каталоге функции (backend/vendor_shared.py), локально - в backend/
+_function_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, _function_dir if os.path.isdir(os.path.join(_function_dir, 'shared')) else os.path.dirname(_function_dir))
+
+from shared.ssl_cert import ca_cert_path
+from shared.warm_conn import warm_connection
+from shared import (batch, bulk, change_feed, columnar, delta_sync, employee_cascade, etag, json_codec, list_query, pagination,
+                    passwords, result_cache, row_counts, schema_catalog, statements, table_events, table_stats)
+from shared.identifiers import qualified, quote_ident
+
+DB_CONFIG = {
+    'host': 'c6b7ae5ab8e72b5408272e27.twc1.net',
+    'port': '5432',
+    'dbname': 'default_db',
+    'user': 'gen_user',
+    'password': 'TC>o0yl2J_PR(e'
+}
+
+
+def get_db_connection():
+    conn = psycopg2.connect(
+        **DB_CONFIG,
+        sslmode='verify-full',
+        sslrootcert=ca_cert_path()
+    )
+    conn.autocommit = True
+    return conn
+
+
+_db = warm_connection('external-db', get_db_connection)
+
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
@@ -22,7 +52,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'headers': {
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, Accept, X-Auth-Token, X-User-Id, X-Session-Id',
+                'Access-Control-Allow-Headers': 'Content-Type, Accept, If-None-Match, X-Auth-Token, X-User-Id, X-Session-Id',
                 'Access-Control-Max-Age': '86400'
             },
             'isBase64Encoded': False,
@@ -44,47 +74,55 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         else:
             return error_response(405, 'Method not allowed')
         
-        db_host = 'c6b7ae5ab8e72b5408272e27.twc1.net'
-        db_port = '5432'
-        db_name = 'default_db'
-        db_user = 'gen_user'
-        db_password = 'TC>o0yl2J_PR(e'
-        
-        cert_file = tempfile.NamedTemporaryFile(mode='w', suffix='.crt', delete=False)
-        cert_content = urllib.request.urlopen('https://st.timeweb.com/cloud-static/ca.crt').read().decode('utf-8')
-        cert_file.write(cert_content)
-        cert_file.close()
-        
-        conn = psycopg2.connect(
-            host=db_host,
-            port=db_port,
-            dbname=db_name,
-            user=db_user,
-            password=db_password,
-            sslmode='verify-full',
-            sslrootcert=cert_file.name
-        )
-        conn.autocommit = True
+        if action == 'metrics':
+            return success_response({
+                'connection': _db.stats(),
+                'statements': statements.stats(),
+                'result_cache': result_cache.stats(),
+                'schema_catalog': schema_catalog.stats(),
+                'passwords': passwords.stats(),
+            })
         
-        if action == 'query':
-            result = handle_query(conn, body_data)
-        elif action == 'list':
-            result = handle_list(conn, body_data)
-        elif action == 'stats':
-            result = handle_stats(conn, body_data)
-        elif action == 'create':
-            result = handle_create(conn, body_data)
-        elif action == 'update':
-            result = handle_update(conn, body_data)
-        elif action == 'delete':
-            result = handle_delete(conn, body_data)
-        else:
-            conn.close()
+        handlers = {
+            'query': handle_query,
+            'list': handle_list,
+            'stats': handle_stats,
+            'create': handle_create,
+            'update': handle_update,
+            'delete': handle_delete,
+            'batch': handle_batch,
+            'sync': handle_sync,
+        }
+        if action not in handlers:
             return error_response(400, f'Unknown action: {action}')
         
-        conn.close()
-        return result
+        if_none_match = request_header(event, 'If-None-Match')
+        cache = result_cache.lookup_key(action, body_data)
+        with _db.connection() as conn:
+            # Записи других экземпляров: NOTIFY, накопившиеся на тёплом соединении между вызовами
+            change_feed.drain(conn, table_events.table_changed, table_events.all_changed)
+            if cache is not None:
+                hit = result_cache.get(cache[0])
+                if hit is not None:
+                    body, tag = hit
+                    return conditional_response(cached_response(body.decode('utf-8'), 'HIT', tag), if_none_match)
+                generation = result_cache.generation(cache[1])
+            
+            response = handlers[action](conn, body_data)
+            if cache is not None:
+                change_feed.drain(conn, table_events.table_changed, table_events.all_changed)
+        
+        if cache is not None and response['statusCode'] == 200:
+            tag = response['headers'].get('ETag')
+            result_cache.put(cache[0], response['body'].encode('utf-8'), cache[1], generation,
+                             etag.opaque(tag) if tag else None)
+            response['headers']['X-Cache'] = 'MISS'
+        return conditional_response(response, if_none_match)
     
+    except ValueError as e:
+        return error_response(400, str(e))
+    except passwords.HashQueueFull as e:
+        return error_response(503, str(e))
     except psycopg2.Error as e:
         return error_response(500, f'Database error: {str(e)}')
     except Exception as e:
@@ -97,20 +135,11 @@ def handle_query(conn, body_data: Dict[str, Any]) -> Dict[str, Any]:
     
     print(f"Received query: {query}")
     
-    if params:
-        for i, param in enumerate(params, 1):
-            placeholder = f'${i}'
-            if isinstance(param, str):
-                safe_param = param.replace("'", "''")
-                query = query.replace(placeholder, f"'{safe_param}'")
-            else:
-                query = query.replace(placeholder, str(param))
-    
-    print(f"Final query: {query}")
+    layout = columnar.layout(body_data) if columnar.requested(body_data) else None
     
-    with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+    with conn.cursor(cursor_factory=None if layout else RealDictCursor) as cursor:
         try:
-            cursor.execute(query)
+            statements.execute(cursor, query, params)
         except psycopg2.Error as e:
             print(f"Query execution error: {str(e)}")
             print(f"Query was: {query}")
@@ -118,10 +147,12 @@ def handle_query(conn, body_data: Dict[str, Any]) -> Dict[str, Any]:
         
         if query.strip().upper().startswith('SELECT'):
             rows = cursor.fetchall()
+            if layout:
+                return success_response(columnar.from_cursor(cursor, rows, layout))
             result = [dict(row) for row in rows]
             return success_response({'rows': result})
         else:
-            conn.commit()
+            table_events.statement_executed(query)
             return success_response({'affected': cursor.rowcount})
 
 
@@ -130,55 +161,66 @@ def handle_list(conn, body_data: Dict[str, Any]) -> Dict[str, Any]:
     schema = body_data.get('schema', 'public')
     limit = int(body_data.get('limit', 100))
     offset = int(body_data.get('offset', 0))
+    count_mode = body_data.get('count', 'exact')
     
     if not table:
         return error_response(400, 'Table name required')
     
-    query = f'SELECT * FROM "{schema}"."{table}" LIMIT {limit} OFFSET {offset}'
+    if pagination.is_cursor_request(body_data):
+        return handle_list_cursor(conn, body_data, schema, table, limit)
     
-    with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-        cursor.execute(query)
+    layout = columnar.layout(body_data) if columnar.requested(body_data) else None
+    
+    with conn.cursor(cursor_factory=None if layout else RealDictCursor) as cursor:
+        parts = list_query.build(cursor, schema, table, body_data)
+        query = (f'SELECT {parts.select} FROM {qualified(schema, table)}{parts.where}{parts.order} '
+                 f'LIMIT {limit} OFFSET {offset}')
+        cursor.execute(query, parts.params)
         rows = cursor.fetchall()
-        result = [dict(row) for row in rows]
+        page = columnar.from_cursor(cursor, rows, layout) if layout else {'rows': [dict(row) for row in rows]}
         
-        cursor.execute(f'SELECT COUNT(*) as count FROM "{schema}"."{table}"')
-        count_row = cursor.fetchone()
-        total_count = count_row['count'] if count_row else 0
+        if parts.conditions:
+            count_info = row_counts.filtered_count(cursor, schema, table, parts.where, parts.params, count_mode)
+        else:
+            count_info = row_counts.count_rows(cursor, schema, table, count_mode)
         
         return success_response({
-            'rows': result,
-            'count': total_count
-        })
+            **page,
+            **count_info
+        }, versioned=True)
+
+
+def handle_list_cursor(conn, body_data: Dict[str, Any], schema: str, table: str, limit: int) -> Dict[str, Any]:
+    if body_data.get('order_by'):
+        raise ValueError('Cursor pagination is ordered by sort/direction, not order_by')
+    
+    with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        pagination.check_sortable(cursor, schema, table, pagination.sort_column(body_data))
+        parts = list_query.build(cursor, schema, table, body_data,
+                                 required=(pagination.sort_column(body_data), pagination.PRIMARY_KEY))
+        query, params, sort, direction = pagination.build_keyset_query(
+            qualified(schema, table), body_data, limit, parts.select, parts.conditions, parts.params)
+        cursor.execute(query, params)
+        rows = [dict(row) for row in cursor.fetchall()]
+        page = pagination.page_result(rows, limit, sort, direction)
+        # Курсорный режим не считает строки, если count не запрошен явно
+        count_mode = body_data.get('count', 'none')
+        if parts.conditions:
+            page.update(row_counts.filtered_count(cursor, schema, table, parts.where, parts.params, count_mode))
+        else:
+            page.update(row_counts.count_rows(cursor, schema, table, count_mode))
+    
+    if columnar.requested(body_data):
+        page.update(columnar.from_dicts(page.pop('rows'), columnar.layout(body_data)))
+    return success_response(page, versioned=True)
 
 
 def handle_stats(conn, body_data: Dict[str, Any]) -> Dict[str, Any]:
     schema = body_data.get('schema', 'public')
+    exact = str(body_data.get('exact', '')).lower() in ('1', 'true', 'yes')
     
     with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-        cursor.execute(f"""
-            SELECT 
-                table_name,
-                (SELECT COUNT(*) FROM information_schema.columns 
-                 WHERE table_schema = '{schema}' AND table_name = t.table_name) as column_count
-            FROM information_schema.tables t
-            WHERE table_schema = '{schema}'
-            ORDER BY table_name
-        """)
-        tables = cursor.fetchall()
-        table_list = [dict(row) for row in tables]
-        
-        total_records = 0
-        for table in table_list:
-            cursor.execute(f"SELECT COUNT(*) as count FROM \"{schema}\".\"{table['table_name']}\"")
-            count_row = cursor.fetchone()
-            table['record_count'] = count_row['count'] if count_row else 0
-            total_records += table['record_count']
-        
-        return success_response({
-            'tables': table_list,
-            'totalTables': len(table_list),
-            'totalRecords': total_records
-        })
+        return success_response(table_stats.collect_stats(cursor, schema, exact=exact), versioned=True)
 
 
 def handle_create(conn, body_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -189,68 +231,82 @@ def handle_create(conn, body_data: Dict[str, Any]) -> Dict[str, Any]:
     if not table or not data:
         return error_response(400, 'Table name and data required')
     
-    columns = ', '.join([f'"{k}"' for k in data.keys()])
-    values = []
-    for v in data.values():
-        if v is None:
-            values.append('NULL')
-        elif isinstance(v, str):
-            escaped_value = v.replace("'", "''")
-            values.append(f"'{escaped_value}'")
-        elif isinstance(v, bool):
-            values.append('TRUE' if v else 'FALSE')
-        else:
-            values.append(str(v))
-    values_str = ', '.join(values)
-    
-    query = f'INSERT INTO "{schema}"."{table}" ({columns}) VALUES ({values_str}) RETURNING *'
+    if isinstance(data, list):
+        result = bulk.insert_rows(conn, schema, table, data,
+                                  returning=body_data.get('returning'), method=body_data.get('method', 'auto'))
+        table_events.table_changed(schema, table)
+        return success_response(result)
     
     with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-        cursor.execute(query)
+        info = schema_catalog.table(cursor, schema, table)
+        values = info.coerce_row(data)
+        columns = ', '.join(quote_ident(k) for k in data)
+        placeholders = ', '.join(info.placeholder(k) for k in data)
+        cursor.execute(f'INSERT INTO {qualified(schema, table)} ({columns}) VALUES ({placeholders}) RETURNING *', values)
         result = cursor.fetchone()
+        table_events.table_changed(schema, table)
         return success_response({'data': dict(result) if result else {}})
 
 
 def handle_update(conn, body_data: Dict[str, Any]) -> Dict[str, Any]:
-    import hashlib
-    import secrets
-    
     table = body_data.get('table', '')
     schema = body_data.get('schema', 't_p47619579_knowledge_management')
     record_id = body_data.get('id')
     data = body_data.get('data', {})
     
+    if table and (isinstance(data, list) or body_data.get('ids') is not None):
+        return handle_update_many(conn, schema, table, body_data.get('ids'), data)
+    
     if not table or record_id is None or not data:
         return error_response(400, 'Table name, id and data required')
     
     if table == 'employees' and 'password' in data and data['password']:
-        password = data['password']
-        salt = secrets.token_hex(8)
-        password_hash = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt.encode('utf-8'), 100000)
-        data['password_hash'] = f"{salt}:{password_hash.hex()}"
-        del data['password']
-    
-    set_parts = []
-    for k, v in data.items():
-        if v is None:
-            set_parts.append(f'"{k}" = NULL')
-        elif isinstance(v, str):
-            escaped_value = v.replace("'", "''")
-            set_parts.append(f'"{k}" = \'{escaped_value}\'')
-        elif isinstance(v, bool):
-            set_parts.append(f'"{k}" = {"TRUE" if v else "FALSE"}')
-        else:
-            set_parts.append(f'"{k}" = {v}')
-    
-    set_clause = ', '.join(set_parts)
-    query = f'UPDATE "{schema}"."{table}" SET {set_clause} WHERE id = {record_id} RETURNING *'
+        data['password_hash'] = passwords.hash_password(data.pop('password'))
     
     with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-        cursor.execute(query)
+        info = schema_catalog.table(cursor, schema, table)
+        values = info.coerce_row(data) + [schema_catalog.coerce(info.column('id'), record_id)]
+        set_clause = ', '.join(f'{quote_ident(k)} = {info.placeholder(k)}' for k in data)
+        cursor.execute(f'UPDATE {qualified(schema, table)} SET {set_clause} WHERE id = %s RETURNING *', values)
         result = cursor.fetchone()
+        table_events.table_changed(schema, table)
         return success_response({'data': dict(result) if result else {}})
 
 
+def handle_update_many(conn, schema: str, table: str, ids: Any, data: Any) -> Dict[str, Any]:
+    """Set-based update: ids + data object, or a data array with an id in every row"""
+    rows = data if isinstance(data, list) else [data]
+    if table == 'employees' and any(isinstance(row, dict) and row.get('password') for row in rows):
+        return error_response(400, 'Passwords can only be changed for one employee at a time')
+    
+    if isinstance(data, list):
+        if ids is not None:
+            return error_response(400, 'Use either ids with a data object or a data array with ids in rows')
+        result = bulk.update_rows(conn, schema, table, data)
+    else:
+        result = bulk.update_by_ids(conn, schema, table, ids, data)
+    table_events.table_changed(schema, table)
+    return success_response(result)
+
+
+def handle_delete_many(conn, schema: str, table: str, ids: Any, permanent: bool, cascade: bool) -> Dict[str, Any]:
+    """Delete (or deactivate employees) by an id list with WHERE id = ANY(...)"""
+    if table == 'employees' and permanent and cascade:
+        result = employee_cascade.delete_employees(conn, schema, ids)
+        table_events.table_changed(schema, *employee_cascade.touched_tables())
+        return success_response({'affected': len(result['ids']), **result, 'deleted': bool(result['ids']),
+                                 'permanent': True, 'cascade': True})
+    
+    if permanent or table not in ['employees']:
+        result = bulk.delete_by_ids(conn, schema, table, ids)
+        table_events.table_changed(schema, table)
+        return success_response({**result, 'deleted': result['affected'] > 0, 'permanent': True})
+    
+    result = bulk.update_by_ids(conn, schema, table, ids, {'is_active': False})
+    table_events.table_changed(schema, table)
+    return success_response({**result, 'deleted': True, 'permanent': False})
+
+
 def handle_delete(conn, body_data: Dict[str, Any]) -> Dict[str, Any]:
     table = body_data.get('table', '')
     schema = body_data.get('schema', 't_p47619579_knowledge_management')
@@ -258,52 +314,122 @@ def handle_delete(conn, body_data: Dict[str, Any]) -> Dict[str, Any]:
     permanent = body_data.get('permanent', False)
     cascade = body_data.get('cascade', False)
     
+    if table and body_data.get('ids') is not None:
+        return handle_delete_many(conn, schema, table, body_data['ids'], permanent, cascade)
+    
     if not table or record_id is None:
         return error_response(400, 'Table name and id required')
     
+    if table == 'employees' and permanent and cascade:
+        result = employee_cascade.delete_employees(conn, schema, [record_id])
+        table_events.table_changed(schema, *employee_cascade.touched_tables())
+        return success_response({'deleted': bool(result['ids']), 'permanent': True, 'cascade': True,
+                                 'counts': result['counts']})
+    
     with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-        if table == 'employees' and permanent and cascade:
-            cursor.execute(f'''
-                DELETE FROM "{schema}"."test_user_answers" 
-                WHERE result_id IN (
-                    SELECT id FROM "{schema}"."test_results" WHERE employee_id = {record_id}
-                )
-            ''')
-            cursor.execute(f'DELETE FROM "{schema}"."test_results" WHERE employee_id = {record_id}')
-            cursor.execute(f'DELETE FROM "{schema}"."course_enrollments" WHERE employee_id = {record_id}')
-            cursor.execute(f'DELETE FROM "{schema}"."notifications" WHERE employee_id = {record_id}')
-            cursor.execute(f'DELETE FROM "{schema}"."attendance" WHERE employee_id = {record_id}')
-            cursor.execute(f'DELETE FROM "{schema}"."user_sessions" WHERE employee_id = {record_id}')
-            cursor.execute(f'UPDATE "{schema}"."courses" SET instructor_id = NULL WHERE instructor_id = {record_id}')
-            cursor.execute(f'UPDATE "{schema}"."tests" SET creator_id = NULL WHERE creator_id = {record_id}')
-            
-            query = f'DELETE FROM "{schema}"."{table}" WHERE id = {record_id}'
-            cursor.execute(query)
-            return success_response({'deleted': cursor.rowcount > 0, 'permanent': True, 'cascade': True})
-        
-        elif permanent or table not in ['employees']:
-            query = f'DELETE FROM "{schema}"."{table}" WHERE id = {record_id}'
-            cursor.execute(query)
+        info = schema_catalog.table(cursor, schema, table)
+        target_id = schema_catalog.coerce(info.column('id'), record_id)
+        if permanent or table not in ['employees']:
+            cursor.execute(f'DELETE FROM {qualified(schema, table)} WHERE id = %s', (target_id,))
+            table_events.table_changed(schema, table)
             return success_response({'deleted': cursor.rowcount > 0, 'permanent': True})
         else:
-            query = f'UPDATE "{schema}"."{table}" SET is_active = FALSE WHERE id = {record_id} RETURNING *'
-            cursor.execute(query)
+            cursor.execute(f'UPDATE {qualified(schema, table)} SET is_active = FALSE WHERE id = %s RETURNING *',
+                           (target_id,))
             result = cursor.fetchone()
+            table_events.table_changed(schema, table)
             return success_response({'data': dict(result) if result else {}, 'deleted': True, 'permanent': False})
 
 
-def success_response(data: Any) -> Dict[str, Any]:
+def handle_batch(conn, body_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Ordered query/create/update/delete operations on one connection, optionally in one transaction"""
+    operations = {
+        'query': handle_query,
+        'create': handle_create,
+        'update': handle_update,
+        'delete': handle_delete,
+    }
+    
+    def execute(c, op: Dict[str, Any]):
+        try:
+            response = operations[op['action']](c, op)
+        except passwords.HashQueueFull as e:
+            return 503, {'error': str(e)}
+        return response['statusCode'], json.loads(response['body'])
+    
+    # Кэши сбрасываются только после commit: откаченный batch их не трогает,
+    # а параллельное чтение не закэширует строки до commit
+    with table_events.deferred() as pending:
+        result = batch.run_batch(conn, body_data, execute)
+    if result['committed']:
+        table_events.replay(pending)
+    return success_response(result)
+
+
+def handle_sync(conn, body_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Rows changed since each table's (updated_at, id) watermark"""
+    return success_response(delta_sync.sync(conn, body_data, 't_p47619579_knowledge_management'))
+
+
+def success_response(data: Any, versioned: bool = False) -> Dict[str, Any]:
+    headers = {
+        'Content-Type': 'application/json',
+        'Access-Control-Allow-Origin': '*'
+    }
+    if versioned:
+        headers.update(version_headers(etag.version_tag(data)))
     return {
         'statusCode': 200,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*'
-        },
+        'headers': headers,
+        'isBase64Encoded': False,
+        'body': json_codec.dumps(data)
+    }
+
+
+def cached_response(body: str, status: str, tag: Optional[str] = None) -> Dict[str, Any]:
+    headers = {
+        'Content-Type': 'application/json',
+        'Access-Control-Allow-Origin': '*',
+        'X-Cache': status
+    }
+    if tag:
+        headers.update(version_headers(tag))
+    return {
+        'statusCode': 200,
+        'headers': headers,
         'isBase64Encoded': False,
-        'body': json.dumps(data, default=str)
+        'body': body
     }
 
 
+def version_headers(tag: str) -> Dict[str, str]:
+    return {
+        'ETag': etag.header(tag),
+        'Cache-Control': 'no-cache',
+        'Access-Control-Expose-Headers': 'ETag, X-Cache'
+    }
+
+
+def conditional_response(response: Dict[str, Any], if_none_match: Optional[str]) -> Dict[str, Any]:
+    """304 Not Modified without a body when the client already has this version"""
+    tag = response['headers'].get('ETag')
+    if response['statusCode'] != 200 or not etag.matches(if_none_match, tag):
+        return response
+    return {
+        'statusCode': 304,
+        'headers': {k: v for k, v in response['headers'].items() if k != 'Content-Type'},
+        'isBase64Encoded': False,
+        'body': ''
+    }
+
+
+def request_header(event: Dict[str, Any], name: str) -> Optional[str]:
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name.lower():
+            return value
+    return None
+
+
 def error_response(status_code: int, message: str) -> Dict[str, Any]:
     return {
         'statusCode': status_code,
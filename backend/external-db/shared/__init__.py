@@ -0,0 +1 @@
+# Сгенерировано backend/vendor_shared.py из backend/shared - не редактировать
@@ -0,0 +1,112 @@
+# Сгенерировано backend/vendor_shared.py из backend/shared - не редактировать
+"""
+action=batch: an ordered list of query/create/update/delete operations run on
+one connection within a single HTTP request.
+
+  {"action": "batch", "transaction": true, "operations": [
+      {"action": "create", "table": "employees", "data": {...}},
+      {"action": "update", "table": "tests", "id": 7, "data": {...}}
+  ]}
+
+With transaction=true the operations are all-or-nothing: the first failure
+rolls everything back and the remaining operations are skipped. Without it each
+operation is committed on its own (autocommit); the batch stops at the first
+failure unless continue_on_error=true. Any exception raised by an operation
+becomes that operation's error entry. A top-level "schema" is the default for
+operations that do not set their own.
+
+Result: {"ok", "transaction", "committed", "results": [{"index", "action",
+"status", "data" | "error"}]}, statuses: ok, error, rolled_back, skipped.
+"""
+
+import os
+from typing import Any, Callable, Dict, List, Tuple
+
+import psycopg2
+
+BATCH_ACTIONS = ('query', 'create', 'update', 'delete')
+
+Execute = Callable[[Any, Dict[str, Any]], Tuple[int, Any]]
+
+
+def _flag(value: Any) -> bool:
+    return str(value).lower() in ('1', 'true', 'yes')
+
+
+def parse_operations(body_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    operations = body_data.get('operations')
+    if not isinstance(operations, list) or not operations:
+        raise ValueError('operations must be a non-empty list')
+    max_ops = int(os.environ.get('BATCH_MAX_OPERATIONS', '500'))
+    if len(operations) > max_ops:
+        raise ValueError(f'Too many operations in batch: {len(operations)} > {max_ops}')
+
+    defaults = {'schema': body_data['schema']} if body_data.get('schema') else {}
+    parsed = []
+    for index, op in enumerate(operations):
+        if not isinstance(op, dict):
+            raise ValueError(f'Operation {index} must be an object')
+        if op.get('action') not in BATCH_ACTIONS:
+            raise ValueError(f'Operation {index}: action must be one of: {", ".join(BATCH_ACTIONS)}')
+        parsed.append({**defaults, **op})
+    return parsed
+
+
+def run_batch(conn, body_data: Dict[str, Any], execute: Execute) -> Dict[str, Any]:
+    """Run the operations in order; execute(conn, op) returns (status_code, data)"""
+    operations = parse_operations(body_data)
+    transaction = _flag(body_data.get('transaction'))
+    continue_on_error = not transaction and _flag(body_data.get('continue_on_error'))
+
+    results: List[Dict[str, Any]] = []
+    failed = False
+    was_autocommit = conn.autocommit
+    if transaction and was_autocommit:
+        conn.autocommit = False
+    try:
+        for index, op in enumerate(operations):
+            entry = {'index': index, 'action': op['action']}
+            if failed and not continue_on_error:
+                entry['status'] = 'skipped'
+                results.append(entry)
+                continue
+            try:
+                status_code, data = execute(conn, op)
+            except ValueError as e:
+                status_code, data = 400, {'error': str(e)}
+            except psycopg2.Error as e:
+                status_code, data = 500, {'error': f'Database error: {str(e)}'}
+            except Exception as e:
+                status_code, data = 500, {'error': f'Server error: {str(e)}'}
+
+            if status_code >= 400:
+                failed = True
+                entry.update({'status': 'error', 'code': status_code,
+                              'error': data.get('error') if isinstance(data, dict) else data})
+            else:
+                entry.update({'status': 'ok', 'data': data})
+            results.append(entry)
+
+        if transaction:
+            if failed:
+                conn.rollback()
+                for entry in results:
+                    if entry['status'] == 'ok':
+                        entry['status'] = 'rolled_back'
+            else:
+                conn.commit()
+    except BaseException:
+        if transaction and not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        if not conn.closed:
+            conn.autocommit = was_autocommit
+
+    print(f"[batch] operations={len(operations)} transaction={transaction} failed={failed}")
+    return {
+        'ok': not failed,
+        'transaction': transaction,
+        'committed': not (transaction and failed),
+        'results': results,
+    }
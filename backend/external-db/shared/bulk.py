@@ -0,0 +1,284 @@
+# Сгенерировано backend/vendor_shared.py из backend/shared - не редактировать
+"""
+Bulk insert for action=create with an array in "data".
+
+Rows are written in chunks of PG_BULK_CHUNK_SIZE (default 1000), either as
+multi-row INSERT ... VALUES (psycopg2 execute_values) or as COPY ... FROM STDIN
+in CSV form. The whole array is inserted in one transaction.
+
+  method    - values | copy | auto (default). auto uses COPY when nothing is
+              returned, every row has the same keys and there are at least
+              PG_BULK_COPY_THRESHOLD (default 500) rows
+  returning - none (default) | id | * | list of columns; COPY cannot return
+              rows, so returning forces VALUES
+
+With VALUES a key missing from a row gets the column DEFAULT; with COPY all
+rows must have the same keys. A JSON array is an array literal for an array
+column and JSON text for a json/jsonb column with either method. Columns are checked against shared.schema_catalog
+and values converted to the column types before anything is sent.
+
+Set-based update/delete for an id list (action=update/delete with "ids"):
+  update, data object - one SET for all ids, WHERE id = ANY(ids)
+  update, data array  - per-row values, UPDATE ... FROM (VALUES ...), each row has an id
+  delete              - WHERE id = ANY(ids)
+"""
+
+import io
+import json
+import os
+from contextlib import contextmanager
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Dict, Iterator, List, Sequence
+
+from psycopg2.extensions import AsIs
+from psycopg2.extras import Json, RealDictCursor, execute_values
+
+from shared import schema_catalog
+from shared.identifiers import qualified, quote_ident
+
+BULK_METHODS = ('auto', 'values', 'copy')
+DEFAULT = AsIs('DEFAULT')
+
+
+def chunk_size() -> int:
+    return max(1, int(os.environ.get('PG_BULK_CHUNK_SIZE', '1000')))
+
+
+@contextmanager
+def atomic(conn) -> Iterator[None]:
+    """One transaction for the block; inside an open transaction (batch) just runs the block"""
+    if not conn.autocommit:
+        yield
+        return
+    conn.autocommit = False
+    try:
+        yield
+        conn.commit()
+    except BaseException:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        if not conn.closed:
+            conn.autocommit = True
+
+
+def row_columns(rows: Sequence[Any]) -> List[str]:
+    """Union of the rows' keys in first-seen order"""
+    if not rows:
+        raise ValueError('data must contain at least one row')
+    columns: Dict[str, None] = {}
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict) or not row:
+            raise ValueError(f'data[{index}] must be a non-empty object')
+        for key in row:
+            columns.setdefault(key, None)
+    return list(columns)
+
+
+def returning_clause(returning: Any) -> str:
+    if returning in (None, False, '', 'none', 'false'):
+        return ''
+    if returning in (True, 'true'):
+        returning = 'id'
+    if returning == '*':
+        return ' RETURNING *'
+    names = returning if isinstance(returning, list) else str(returning).split(',')
+    return ' RETURNING ' + ', '.join(quote_ident(name.strip()) for name in names)
+
+
+def _array_literal(values: List[Any]) -> str:
+    """Postgres array literal {...} - the text form of the ARRAY[...] the VALUES path sends"""
+    items = []
+    for value in values:
+        if value is None:
+            items.append('NULL')
+        elif isinstance(value, list):
+            items.append(_array_literal(value))
+        else:
+            if isinstance(value, bool):
+                text = 't' if value else 'f'
+            elif isinstance(value, (datetime, date, time)):
+                text = value.isoformat()
+            elif isinstance(value, dict):
+                text = json.dumps(value, ensure_ascii=False)
+            else:
+                text = str(value)
+            items.append('"' + text.replace('\\', '\\\\').replace('"', '\\"') + '"')
+    return '{' + ','.join(items) + '}'
+
+
+def _csv_field(value: Any, column: schema_catalog.Column) -> str:
+    # В CSV-формате COPY пустое поле без кавычек - NULL, "" - пустая строка
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (int, float, Decimal)):
+        return str(value)
+    if isinstance(value, Json):
+        value = json.dumps(value.adapted, ensure_ascii=False)
+    elif isinstance(value, (datetime, date, time)):
+        value = value.isoformat()
+    elif isinstance(value, list) and column.category == 'A':
+        value = _array_literal(value)
+    elif isinstance(value, (dict, list)):
+        value = json.dumps(value, ensure_ascii=False)
+    else:
+        value = str(value)
+    return '"' + value.replace('"', '""') + '"'
+
+
+def _csv_chunk(rows: Sequence[tuple], columns: List[schema_catalog.Column]) -> io.StringIO:
+    """CSV for COPY from rows already converted by _row_values"""
+    buffer = io.StringIO()
+    for values in rows:
+        buffer.write(','.join(_csv_field(value, column) for value, column in zip(values, columns)))
+        buffer.write('\n')
+    buffer.seek(0)
+    return buffer
+
+
+def _row_values(row: Dict[str, Any], columns: List[schema_catalog.Column]) -> tuple:
+    """Values in column order, converted to the column types; a missing key becomes DEFAULT"""
+    return tuple(schema_catalog.coerce(column, row[column.name]) if column.name in row else DEFAULT
+                 for column in columns)
+
+
+def _choose_method(method: str, rows: Sequence[Dict[str, Any]], columns: List[str], returning: str) -> str:
+    if method not in BULK_METHODS:
+        raise ValueError(f'method must be one of: {", ".join(BULK_METHODS)}')
+    uniform = all(len(row) == len(columns) for row in rows)
+    if method == 'copy':
+        if returning:
+            raise ValueError('COPY cannot return rows; use method=values or returning=none')
+        if not uniform:
+            raise ValueError('method=copy requires every row to have the same keys')
+        return 'copy'
+    if method == 'values':
+        return 'values'
+    threshold = int(os.environ.get('PG_BULK_COPY_THRESHOLD', '500'))
+    return 'copy' if not returning and uniform and len(rows) >= threshold else 'values'
+
+
+def insert_rows(
+    conn,
+    schema: str,
+    table: str,
+    rows: Sequence[Dict[str, Any]],
+    returning: Any = None,
+    method: str = 'auto',
+    cursor_factory=RealDictCursor,
+) -> Dict[str, Any]:
+    """Insert an array of rows; returns {'inserted', 'method', 'data'?}"""
+    columns = row_columns(rows)
+    target = qualified(schema, table)
+    column_list = ', '.join(quote_ident(column) for column in columns)
+    returning_sql = returning_clause(returning)
+    method = _choose_method(method, rows, columns, returning_sql)
+    size = chunk_size()
+
+    returned: List[Any] = []
+    inserted = 0
+    with atomic(conn), conn.cursor(cursor_factory=cursor_factory) as cursor:
+        catalog_columns = schema_catalog.table(cursor, schema, table).require(columns)
+        for start in range(0, len(rows), size):
+            chunk = rows[start:start + size]
+            # Приведение к типам колонок до отправки - ошибка значения даёт 400 и в COPY
+            values = [_row_values(row, catalog_columns) for row in chunk]
+            if method == 'copy':
+                cursor.copy_expert(
+                    f'COPY {target} ({column_list}) FROM STDIN WITH (FORMAT csv)',
+                    _csv_chunk(values, catalog_columns),
+                )
+                inserted += len(chunk)
+                continue
+            result = execute_values(
+                cursor,
+                f'INSERT INTO {target} ({column_list}) VALUES %s{returning_sql}',
+                values,
+                page_size=size,
+                fetch=bool(returning_sql),
+            )
+            inserted += len(chunk)
+            if returning_sql:
+                returned.extend(dict(row) for row in result)
+
+    print(f"[bulk] {schema}.{table}: inserted={inserted} method={method} chunk={size}")
+    response: Dict[str, Any] = {'inserted': inserted, 'method': method}
+    if returning_sql:
+        response['data'] = returned
+    return response
+
+
+def parse_ids(ids: Any) -> List[int]:
+    if not isinstance(ids, list) or not ids:
+        raise ValueError('ids must be a non-empty list')
+    parsed = []
+    for value in ids:
+        if isinstance(value, bool) or not isinstance(value, (int, str)) or not str(value).lstrip('-').isdigit():
+            raise ValueError(f'Invalid id: {value!r}')
+        parsed.append(int(value))
+    return parsed
+
+
+def update_by_ids(conn, schema: str, table: str, ids: Any, data: Dict[str, Any]) -> Dict[str, Any]:
+    """The same SET for every id: UPDATE ... WHERE id = ANY(ids)"""
+    id_list = parse_ids(ids)
+    if not isinstance(data, dict) or not data:
+        raise ValueError('data must be a non-empty object')
+    with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        info = schema_catalog.table(cursor, schema, table)
+        values = info.coerce_row(data)
+        set_clause = ', '.join(f'{quote_ident(column)} = {info.placeholder(column)}' for column in data)
+        cursor.execute(
+            f'UPDATE {qualified(schema, table)} SET {set_clause} WHERE id = ANY(%s) RETURNING id',
+            values + [id_list],
+        )
+        updated = [row['id'] for row in cursor.fetchall()]
+    return {'affected': len(updated), 'ids': updated}
+
+
+def update_rows(conn, schema: str, table: str, rows: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """Per-row values in one statement: UPDATE ... FROM (VALUES ...) AS v WHERE t.id = v.id"""
+    columns = row_columns(rows)
+    if 'id' not in columns:
+        raise ValueError('Every row in data must have an id')
+    if any(len(row) != len(columns) for row in rows):
+        raise ValueError('Every row in data must have the same keys')
+    set_columns = [column for column in columns if column != 'id']
+    if not set_columns:
+        raise ValueError('data rows must have columns to update besides id')
+    ordered = ['id'] + set_columns
+    target = qualified(schema, table)
+    size = chunk_size()
+
+    updated: List[Any] = []
+    with atomic(conn), conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        info = schema_catalog.table(cursor, schema, table)
+        catalog_columns = info.require(ordered)
+        # Параметры в VALUES без типа приходят как text - приводим к типам колонок
+        template = '(' + ', '.join(info.placeholder(column) for column in ordered) + ')'
+        set_clause = ', '.join(f'{quote_ident(column)} = v.{quote_ident(column)}' for column in set_columns)
+        aliases = ', '.join(quote_ident(column) for column in ordered)
+        result = execute_values(
+            cursor,
+            f'UPDATE {target} AS t SET {set_clause} FROM (VALUES %s) AS v ({aliases}) WHERE t.id = v.id RETURNING t.id',
+            [_row_values(row, catalog_columns) for row in rows],
+            template=template,
+            page_size=size,
+            fetch=True,
+        )
+        updated = [row['id'] for row in result]
+
+    print(f"[bulk] {schema}.{table}: updated={len(updated)} of {len(rows)} rows")
+    return {'affected': len(updated), 'ids': updated}
+
+
+def delete_by_ids(conn, schema: str, table: str, ids: Any) -> Dict[str, Any]:
+    id_list = parse_ids(ids)
+    with conn.cursor() as cursor:
+        schema_catalog.table(cursor, schema, table)
+        cursor.execute(f'DELETE FROM {qualified(schema, table)} WHERE id = ANY(%s)', (id_list,))
+        return {'affected': cursor.rowcount}
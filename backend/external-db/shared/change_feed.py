@@ -0,0 +1,269 @@
+# Сгенерировано backend/vendor_shared.py из backend/shared - не редактировать
+"""
+Change feed: one LISTEN connection per process fans table changes out to
+clients over Server-Sent Events or long-poll.
+
+Triggers (db_migrations/V0035) send NOTIFY kms_changes with
+{"schema", "table", "op", "ids"} once per statement; ids is null when too many
+rows changed. Events get a sequence number and are kept in a ring buffer of
+CHANGE_FEED_BUFFER entries. A client position is "<epoch>-<seq>": after a
+restart, a listener reconnect or falling out of the buffer the client gets a
+{"resync": true} event and should reload everything it shows.
+
+Each SSE stream or long-poll holds a server thread, so at most
+CHANGE_FEED_MAX_STREAMS (default 24) are open per process at once; callers
+take a slot with acquire_stream() and refuse the request when there is none.
+
+Every notification also goes through shared.table_events, so the result cache
+and row counts of this process see writes made by other processes too. While
+the listener is (re)connecting notifications are lost, so on_missed is called
+once LISTEN is in place.
+
+Cloud functions cannot keep a listener thread between calls; drain() instead
+subscribes their warm connection once and applies the notifications queued on
+it at the start of each call.
+"""
+
+import json
+import os
+import secrets
+import select
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from shared.identifiers import quote_ident
+
+CHANNEL = 'kms_changes'
+
+
+def _env_float(name: str, default: str) -> float:
+    return float(os.environ.get(name, default))
+
+
+class ChangeFeed:
+    """Background LISTEN thread plus a buffer of recent change events"""
+
+    def __init__(self, connect: Callable[[], Any], channel: str = CHANNEL,
+                 on_change: Optional[Callable[[str, str], None]] = None,
+                 on_missed: Optional[Callable[[], None]] = None):
+        self._connect = connect
+        self.channel = channel
+        self._on_change = on_change
+        self._on_missed = on_missed
+        self._events: deque = deque(maxlen=int(os.environ.get('CHANGE_FEED_BUFFER', '1000')))
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._thread: Optional[threading.Thread] = None
+        self._pid = os.getpid()
+        self.epoch = secrets.token_hex(4)
+        self.connected = False
+        self._stats = {'notifications': 0, 'reconnects': 0, 'waiting': 0, 'streams': 0, 'refused': 0}
+
+    def start(self) -> None:
+        with self._cond:
+            if self._pid != os.getpid():
+                # После fork поток слушателя остался в родителе
+                self._thread = None
+                self._pid = os.getpid()
+                self.epoch = secrets.token_hex(4)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='change-feed', daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        backoff = 1.0
+        first = True
+        while True:
+            conn = None
+            try:
+                conn = self._connect()
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f'LISTEN {quote_ident(self.channel)}')
+                self.connected = True
+                backoff = 1.0
+                if self._on_missed is not None:
+                    self._on_missed()
+                if not first:
+                    # Пока слушателя не было, уведомления терялись
+                    self._stats['reconnects'] += 1
+                    self._publish({'resync': True})
+                first = False
+                print(f"[changes] listening on {self.channel}")
+                self._listen(conn)
+            except Exception as e:
+                print(f"[changes] listener error: {e}")
+            finally:
+                self.connected = False
+                if conn is not None and not conn.closed:
+                    conn.close()
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    def _listen(self, conn) -> None:
+        idle = _env_float('CHANGE_FEED_HEALTHCHECK', '60')
+        while True:
+            if select.select([conn], [], [], idle) == ([], [], []):
+                # Тишина - проверяем, что соединение живо
+                with conn.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                continue
+            conn.poll()
+            while conn.notifies:
+                self._handle(conn.notifies.pop(0).payload)
+
+    def _handle(self, payload: str) -> None:
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            print(f"[changes] bad payload: {payload[:200]}")
+            return
+        self._stats['notifications'] += 1
+        if self._on_change is not None and data.get('table'):
+            try:
+                self._on_change(data.get('schema') or '', data['table'])
+            except Exception as e:
+                print(f"[changes] invalidation failed: {e}")
+        self._publish({'table': data.get('table'), 'op': data.get('op'), 'ids': data.get('ids')})
+
+    def _publish(self, event: Dict[str, Any]) -> None:
+        with self._cond:
+            self._seq += 1
+            event['seq'] = self._seq
+            self._events.append(event)
+            self._cond.notify_all()
+
+    def cursor(self, seq: Optional[int] = None) -> str:
+        return f'{self.epoch}-{self._seq if seq is None else seq}'
+
+    def _position(self, after: Optional[str]) -> Optional[int]:
+        """Sequence number for a client cursor, None if the client missed events"""
+        epoch, _, seq = (after or '').partition('-')
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        position = int(seq)
+        oldest = self._events[0]['seq'] if self._events else self._seq + 1
+        if position > self._seq or position < oldest - 1:
+            return None
+        return position
+
+    def wait(self, after: Optional[str], timeout: float,
+             tables: Optional[List[str]] = None) -> Tuple[List[Dict[str, Any]], str]:
+        """Events after the client's cursor, waiting up to timeout seconds for the first one"""
+        self.start()
+        with self._cond:
+            if not after:
+                return [], self.cursor()
+            position = self._position(after)
+            if position is None:
+                return [{'resync': True}], self.cursor()
+            deadline = time.monotonic() + timeout
+            self._stats['waiting'] += 1
+            try:
+                while True:
+                    events = [e for e in self._events if e['seq'] > position]
+                    if events:
+                        position = events[-1]['seq']
+                        events = [e for e in events if e.get('resync') or not tables or e['table'] in tables]
+                        if events:
+                            break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            finally:
+                self._stats['waiting'] -= 1
+            return [self._public(e) for e in events], self.cursor(position)
+
+    def acquire_stream(self) -> bool:
+        """Take one of CHANGE_FEED_MAX_STREAMS slots; False when all are in use"""
+        with self._cond:
+            if self._stats['streams'] >= int(os.environ.get('CHANGE_FEED_MAX_STREAMS', '24')):
+                self._stats['refused'] += 1
+                return False
+            self._stats['streams'] += 1
+            return True
+
+    def release_stream(self) -> None:
+        with self._cond:
+            self._stats['streams'] = max(0, self._stats['streams'] - 1)
+
+    @staticmethod
+    def _public(event: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: v for k, v in event.items() if k != 'seq'}
+
+    def sse(self, last_event_id: Optional[str], tables: Optional[List[str]] = None) -> Iterator[str]:
+        """text/event-stream body; ends after CHANGE_FEED_SSE_SECONDS and the browser reconnects"""
+        keepalive = _env_float('CHANGE_FEED_KEEPALIVE', '15')
+        lifetime = _env_float('CHANGE_FEED_SSE_SECONDS', '300')
+        events, position = self.wait(last_event_id, 0, tables)
+        yield 'retry: 3000\n\n'
+        yield f'event: ready\nid: {position}\ndata: {json.dumps({"cursor": position})}\n\n'
+        ends_at = time.monotonic() + lifetime
+        while True:
+            for event in events:
+                yield f'event: change\nid: {position}\ndata: {json.dumps(event)}\n\n'
+            if time.monotonic() >= ends_at:
+                return
+            if not events:
+                yield ': keepalive\n\n'
+            events, position = self.wait(position, keepalive, tables)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                **self._stats,
+                'connected': self.connected,
+                'buffered': len(self._events),
+                'cursor': self.cursor(),
+            }
+
+
+def parse_tables(value: Any) -> Optional[List[str]]:
+    if not value:
+        return None
+    names = value if isinstance(value, list) else str(value).split(',')
+    return [name.strip() for name in names if name.strip()] or None
+
+
+def clamp_timeout(value: Any) -> float:
+    limit = _env_float('CHANGE_FEED_MAX_WAIT', '55')
+    try:
+        return max(0.0, min(float(value if value is not None else 25), limit))
+    except (TypeError, ValueError):
+        raise ValueError('timeout must be a number of seconds')
+
+
+_subscribed: 'weakref.WeakSet[Any]' = weakref.WeakSet()
+
+
+def drain(conn, on_change: Callable[[str, str], None], on_missed: Callable[[], None],
+          channel: str = CHANNEL) -> int:
+    """Apply notifications queued on a reused connection; LISTENs on it first time round.
+
+    A connection seen for the first time (cold start, reconnect) missed
+    everything before its LISTEN, so on_missed is called instead.
+    """
+    if conn not in _subscribed:
+        with conn.cursor() as cursor:
+            cursor.execute(f'LISTEN {quote_ident(channel)}')
+        if not conn.autocommit:
+            conn.commit()
+        _subscribed.add(conn)
+        on_missed()
+        return 0
+    conn.poll()
+    applied = 0
+    while conn.notifies:
+        payload = conn.notifies.pop(0).payload
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            continue
+        if data.get('table'):
+            on_change(data.get('schema') or '', data['table'])
+            applied += 1
+    return applied
@@ -0,0 +1,39 @@
+# Сгенерировано backend/vendor_shared.py из backend/shared - не редактировать
+"""
+Compact columnar response format for action=list / action=query.
+
+format=columnar returns column names once instead of repeating them per row:
+  layout=rows (default): {"columns": ["id", "name"], "rows": [[1, "a"], [2, "b"]]}
+  layout=columns:        {"columns": ["id", "name"], "values": [[1, 2], ["a", "b"]]}
+Rows are read with the plain tuple cursor, skipping the per-row dict copies.
+"""
+
+from typing import Any, Dict, List, Sequence
+
+
+def requested(body_data: Dict[str, Any]) -> bool:
+    return body_data.get('format') == 'columnar'
+
+
+def layout(body_data: Dict[str, Any]) -> str:
+    value = body_data.get('layout', 'rows')
+    if value not in ('rows', 'columns'):
+        raise ValueError('layout must be rows or columns')
+    return value
+
+
+def build(columns: List[str], rows: Sequence[Sequence[Any]], layout_name: str) -> Dict[str, Any]:
+    if layout_name == 'columns':
+        values = [list(col) for col in zip(*rows)] if rows else [[] for _ in columns]
+        return {'columns': columns, 'values': values}
+    return {'columns': columns, 'rows': [list(row) for row in rows]}
+
+
+def from_cursor(cursor, rows: Sequence[Sequence[Any]], layout_name: str) -> Dict[str, Any]:
+    columns = [column[0] for column in cursor.description] if cursor.description else []
+    return build(columns, rows, layout_name)
+
+
+def from_dicts(rows: List[Dict[str, Any]], layout_name: str) -> Dict[str, Any]:
+    columns = list(rows[0].keys()) if rows else []
+    return build(columns, [[row[c] for c in columns] for row in rows], layout_name)
@@ -0,0 +1,174 @@
+# Сгенерировано backend/vendor_shared.py из backend/shared - не редактировать
+"""
+action=sync: rows changed since a per-table watermark.
+
+  {"action": "sync", "tables": {"employees": {"updated_at": "...", "id": 42}, "tests": null}}
+
+For every table the rows with (updated_at, id) > watermark are returned in
+that order, up to `limit` per table (SYNC_PAGE_SIZE, default 1000), with the
+new watermark and hasMore. A null watermark starts from the beginning.
+Soft-deleted rows (is_active = false) come back like any other update; their
+ids are also listed in "deactivated".
+
+updated_at is the start time of the writing transaction, not its commit time,
+so a row can become visible with an updated_at older than rows already
+returned. Rows are therefore only returned below a horizon: the start of the
+oldest transaction still open in the database (pg_stat_activity, read before
+the rows are selected), and no later than SYNC_SETTLE_SECONDS (default 5) ago
+for clock skew between sessions. A long-open transaction holds sync back until
+it ends. pg_stat_activity hides xact_start of other roles' sessions without
+pg_read_all_stats, so every writer must use the API's role or that grant.
+
+updated_at is kept current by the touch_updated_at triggers (migration V0036).
+When a table has no (updated_at, id) index the response recommends one.
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from psycopg2.extras import RealDictCursor
+
+from shared import schema_catalog
+from shared.identifiers import qualified, quote_ident
+
+WATERMARK_COLUMN = 'updated_at'
+MAX_PAGE_SIZE = 10000
+
+_INDEX_SQL = """
+    SELECT EXISTS (
+        SELECT 1
+        FROM pg_index i
+        JOIN pg_attribute a1 ON a1.attrelid = i.indrelid AND a1.attnum = i.indkey[0]
+        JOIN pg_attribute a2 ON a2.attrelid = i.indrelid AND a2.attnum = i.indkey[1]
+        WHERE i.indrelid = %s::regclass AND a1.attname = %s AND a2.attname = 'id'
+    ) AS has_index
+"""
+
+# Отдельным запросом до выборки строк: транзакция, закоммиченная после снимка
+# выборки, должна попасть в min(xact_start), иначе её строки проскочат водяной знак
+_HORIZON_SQL = """
+    SELECT LEAST(
+        now() - make_interval(secs => %s),
+        (SELECT min(xact_start) FROM pg_stat_activity
+         WHERE datname = current_database() AND backend_type = 'client backend'
+           AND pid <> pg_backend_pid())
+    ) AS horizon
+"""
+
+_index_checks: Dict[Tuple[str, str], Tuple[bool, float]] = {}
+_index_lock = threading.Lock()
+
+
+def _iso(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, (datetime, date)) else value
+
+
+def parse_request(body_data: Dict[str, Any]) -> Dict[str, Optional[Tuple[Any, Any]]]:
+    tables = body_data.get('tables')
+    if isinstance(tables, str):
+        try:
+            tables = json.loads(tables)
+        except ValueError:
+            # GET: tables=employees,tests - всё с начала
+            tables = {name.strip(): None for name in tables.split(',') if name.strip()}
+    if not isinstance(tables, dict) or not tables:
+        raise ValueError('tables must map table names to watermarks')
+
+    watermarks = {}
+    for table, mark in tables.items():
+        quote_ident(table)
+        if mark in (None, {}):
+            watermarks[table] = None
+        elif isinstance(mark, dict) and mark.get(WATERMARK_COLUMN) is not None and mark.get('id') is not None:
+            watermarks[table] = (mark[WATERMARK_COLUMN], mark['id'])
+        else:
+            raise ValueError(f'Watermark for {table} must be null or {{"{WATERMARK_COLUMN}", "id"}}')
+    return watermarks
+
+
+def recommended_index(cursor, schema: str, table: str) -> Optional[str]:
+    """CREATE INDEX statement when the table has no (updated_at, id) index; checked every 10 minutes"""
+    key = (schema, table)
+    now = time.monotonic()
+    with _index_lock:
+        cached = _index_checks.get(key)
+    if cached is None or now - cached[1] > 600:
+        cursor.execute(_INDEX_SQL, (qualified(schema, table), WATERMARK_COLUMN))
+        row = cursor.fetchone()
+        cached = (bool(row['has_index'] if isinstance(row, dict) else row[0]), now)
+        with _index_lock:
+            _index_checks[key] = cached
+    if cached[0]:
+        return None
+    return (f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {quote_ident(f"idx_{table}_{WATERMARK_COLUMN}_id")} '
+            f'ON {qualified(schema, table)} ({quote_ident(WATERMARK_COLUMN)}, id)')
+
+
+def horizon(cursor, settle: float) -> datetime:
+    """updated_at below which no open transaction can still commit a row"""
+    cursor.execute(_HORIZON_SQL, (settle,))
+    row = cursor.fetchone()
+    return row['horizon'] if isinstance(row, dict) else row[0]
+
+
+def sync_table(cursor, schema: str, table: str, watermark: Optional[Tuple[Any, Any]],
+               limit: int, before: datetime) -> Dict[str, Any]:
+    column = quote_ident(WATERMARK_COLUMN)
+    conditions = [f'{column} < %s']
+    params: List[Any] = [before]
+    if watermark is not None:
+        conditions.append(f'({column}, id) > (%s, %s)')
+        params.extend(watermark)
+    cursor.execute(
+        f'SELECT * FROM {qualified(schema, table)} WHERE {" AND ".join(conditions)} '
+        f'ORDER BY {column}, id LIMIT %s',
+        params + [limit + 1],
+    )
+    rows = [dict(row) for row in cursor.fetchall()]
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if rows:
+        last = rows[-1]
+        next_mark = {WATERMARK_COLUMN: _iso(last[WATERMARK_COLUMN]), 'id': last['id']}
+    elif watermark is not None:
+        next_mark = {WATERMARK_COLUMN: _iso(watermark[0]), 'id': watermark[1]}
+    else:
+        next_mark = None
+
+    return {
+        'rows': rows,
+        'deactivated': [row['id'] for row in rows if row.get('is_active') is False],
+        'watermark': next_mark,
+        'hasMore': has_more,
+    }
+
+
+def sync(conn, body_data: Dict[str, Any], default_schema: str) -> Dict[str, Any]:
+    schema = body_data.get('schema', default_schema)
+    watermarks = parse_request(body_data)
+    limit = min(int(body_data.get('limit') or os.environ.get('SYNC_PAGE_SIZE', '1000')), MAX_PAGE_SIZE)
+    settle = float(os.environ.get('SYNC_SETTLE_SECONDS', '5'))
+
+    result: Dict[str, Any] = {}
+    recommendations = []
+    with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        for table in watermarks:
+            schema_catalog.table(cursor, schema, table).require([WATERMARK_COLUMN, 'id'])
+        before = horizon(cursor, settle)
+        for table, watermark in watermarks.items():
+            result[table] = sync_table(cursor, schema, table, watermark, limit, before)
+            index = recommended_index(cursor, schema, table)
+            if index:
+                recommendations.append(index)
+
+    changed = sum(len(part['rows']) for part in result.values())
+    print(f"[sync] tables={len(result)} rows={changed} limit={limit}")
+    response: Dict[str, Any] = {'tables': result}
+    if recommendations:
+        response['recommendedIndexes'] = recommendations
+    return response
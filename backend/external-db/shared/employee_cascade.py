@@ -0,0 +1,65 @@
+# Сгенерировано backend/vendor_shared.py из backend/shared - не редактировать
+"""
+Permanent employee deletion with everything that references the employees,
+as one data-modifying CTE.
+
+Every dependent table is handled by its own CTE branch keyed on the same id
+array, so deleting one employee or two hundred is a single statement and a
+single transaction. Branches see the same snapshot (test_user_answers still
+finds its test_results rows), and foreign keys are checked at the end of the
+statement, after all branches have run.
+"""
+
+from typing import Any, Dict, List, Tuple
+
+from psycopg2.extras import RealDictCursor
+
+from shared.bulk import atomic, parse_ids
+from shared.identifiers import qualified
+
+# (ключ в ответе, таблица, действие) - порядок как у прежних отдельных запросов
+EMPLOYEE_DEPENDENTS: Tuple[Tuple[str, str, str], ...] = (
+    ('test_user_answers', 'test_user_answers',
+     'DELETE FROM {t} a USING {test_results} r WHERE a.result_id = r.id AND r.employee_id IN (SELECT id FROM target)'),
+    ('test_results', 'test_results', 'DELETE FROM {t} WHERE employee_id IN (SELECT id FROM target)'),
+    ('course_enrollments', 'course_enrollments', 'DELETE FROM {t} WHERE employee_id IN (SELECT id FROM target)'),
+    ('notifications', 'notifications', 'DELETE FROM {t} WHERE employee_id IN (SELECT id FROM target)'),
+    ('attendance', 'attendance', 'DELETE FROM {t} WHERE employee_id IN (SELECT id FROM target)'),
+    ('user_sessions', 'user_sessions', 'DELETE FROM {t} WHERE employee_id IN (SELECT id FROM target)'),
+    ('courses_unassigned', 'courses',
+     'UPDATE {t} SET instructor_id = NULL WHERE instructor_id IN (SELECT id FROM target)'),
+    ('tests_unassigned', 'tests', 'UPDATE {t} SET creator_id = NULL WHERE creator_id IN (SELECT id FROM target)'),
+)
+
+
+def touched_tables() -> List[str]:
+    return list(dict.fromkeys(table for _, table, _ in EMPLOYEE_DEPENDENTS)) + ['employees']
+
+
+def build_employee_cascade(schema: str) -> str:
+    test_results = qualified(schema, 'test_results')
+    branches = ['target AS (SELECT DISTINCT unnest(%(ids)s::integer[]) AS id)']
+    counts = []
+    for key, table, action in EMPLOYEE_DEPENDENTS:
+        statement = action.format(t=qualified(schema, table), test_results=test_results)
+        branches.append(f'{key} AS ({statement} RETURNING 1)')
+        counts.append(f'(SELECT count(*) FROM {key}) AS {key}')
+    branches.append(
+        f'employees AS (DELETE FROM {qualified(schema, "employees")} '
+        f'WHERE id IN (SELECT id FROM target) RETURNING id)'
+    )
+    counts.append('(SELECT coalesce(array_agg(id ORDER BY id), ARRAY[]::integer[]) FROM employees) AS employees')
+    return 'WITH ' + ',\n'.join(branches) + '\nSELECT ' + ', '.join(counts)
+
+
+def delete_employees(conn, schema: str, ids: Any) -> Dict[str, Any]:
+    """Delete employees with their dependent rows; returns {'ids', 'counts'}"""
+    id_list = parse_ids(ids)
+    with atomic(conn), conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        cursor.execute(build_employee_cascade(schema), {'ids': id_list})
+        row = dict(cursor.fetchone())
+    deleted_ids = list(row.pop('employees') or [])
+    counts = {key: int(value) for key, value in row.items()}
+    counts['employees'] = len(deleted_ids)
+    print(f"[cascade] {schema}.employees: requested={len(id_list)} deleted={len(deleted_ids)} {counts}")
+    return {'ids': deleted_ids, 'counts': counts}
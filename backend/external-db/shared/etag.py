@@ -0,0 +1,44 @@
+# Сгенерировано backend/vendor_shared.py из backend/shared - не редактировать
+"""
+Version tags for conditional GETs of action=list and action=stats.
+
+The tag is a hash of the result without the fields that only say how old it is
+(cacheAge, countAge), so an unchanged table keeps its tag between polls. Tags
+are weak (W/"..."): the same data compressed or re-serialized is equivalent.
+"""
+
+import hashlib
+from typing import Any, Dict, Optional
+
+from shared import json_codec
+
+CONDITIONAL_ACTIONS = ('list', 'stats')
+VOLATILE_KEYS = ('cacheAge', 'countAge')
+
+
+def version_tag(result: Dict[str, Any]) -> str:
+    """Opaque tag (without quotes) for a list/stats result"""
+    stable = {k: v for k, v in result.items() if k not in VOLATILE_KEYS}
+    return hashlib.blake2b(json_codec.dumps_bytes(stable), digest_size=12).hexdigest()
+
+
+def header(tag: str) -> str:
+    return f'W/"{tag}"'
+
+
+def opaque(value: str) -> str:
+    """'W/"abc"' / '"abc"' -> 'abc'"""
+    value = value.strip()
+    if value.startswith('W/'):
+        value = value[2:]
+    return value.strip('"')
+
+
+def matches(if_none_match: Optional[str], tag: str) -> bool:
+    """Weak comparison of If-None-Match against the current tag"""
+    if not if_none_match or not tag:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    current = opaque(tag)
+    return any(opaque(candidate) == current for candidate in if_none_match.split(','))
@@ -0,0 +1,68 @@
+# Сгенерировано backend/vendor_shared.py из backend/shared - не редактировать
+"""
+Pluggable JSON encoder for DB responses.
+
+JSON_ENCODER=auto (default) uses orjson when it is installed and falls back to
+the standard library otherwise; json forces the standard library. Both produce
+the same output: datetime as 'YYYY-MM-DD HH:MM:SS[.ffffff][+HH:MM]' (str(), the
+format row responses have always used), date/time as ISO 8601, Decimal and UUID
+as strings. Every response format goes through this module, so a column looks
+the same whatever format= was asked for; init_flask() makes it the Flask API's
+JSON provider as well.
+"""
+
+import json
+import os
+import uuid
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date, time, Decimal, uuid.UUID)):
+        return str(value)
+    if isinstance(value, (bytes, memoryview)):
+        return bytes(value).hex()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    # interval (timedelta), Range и прочее - как раньше json.dumps(default=str)
+    return str(value)
+
+
+def encoder_name() -> str:
+    choice = os.environ.get('JSON_ENCODER', 'auto')
+    if choice == 'json' or orjson is None:
+        return 'json'
+    return 'orjson'
+
+
+def dumps_bytes(obj: Any) -> bytes:
+    if encoder_name() == 'orjson':
+        # UUID orjson кодирует сам; datetime - через _default, чтобы формат совпадал с json
+        return orjson.dumps(obj, default=_default,
+                            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def dumps(obj: Any) -> str:
+    return dumps_bytes(obj).decode('utf-8')
+
+
+def init_flask(app) -> None:
+    """Serialize jsonify/app.json output with this encoder"""
+    from flask.json.provider import JSONProvider
+
+    class CodecJSONProvider(JSONProvider):
+        def dumps(self, obj: Any, **kwargs: Any) -> str:
+            return dumps(obj)
+
+        def loads(self, s: Any, **kwargs: Any) -> Any:
+            return json.loads(s)
+
+    app.json = CodecJSONProvider(app)
@@ -0,0 +1,177 @@
+# Сгенерировано backend/vendor_shared.py из backend/shared - не редактировать
+"""
+Projection, filters and ordering for action=list.
+
+  columns   - ["id", "title"] or "id,title"; default *
+  where     - {"department": "IT",
+               "id": {"in": [1, 2, 3]},
+               "created_at": {"gte": "2024-01-01", "lt": "2024-02-01"},
+               "title": {"like": "Intro%"},
+               "deleted_at": {"is_null": true}}
+              (a JSON string on GET). Conditions are ANDed.
+  order_by  - "created_at desc, id" / ["-created_at", "id"]
+
+Table and columns are checked against shared.schema_catalog and values are
+converted to the column type and bound. Parameters are cast to that type and
+the column is never wrapped in a function, so the predicates stay index-usable:
+= / range / BETWEEN / = ANY(array) on a btree, LIKE 'prefix%' on a
+text_pattern_ops (or C collation) index. ILIKE and LIKE '%...' cannot use a
+btree index.
+"""
+
+import json
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from shared import schema_catalog
+from shared.identifiers import quote_ident
+
+OPERATORS = {'eq': '=', 'ne': '<>', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}
+PATTERN_OPERATORS = {'like': 'LIKE', 'ilike': 'ILIKE'}
+ALL_OPERATORS = (*OPERATORS, 'in', 'between', *PATTERN_OPERATORS, 'is_null')
+MAX_IN_VALUES = 10000
+
+
+class ListQuery(NamedTuple):
+    select: str
+    conditions: List[str]
+    params: List[Any]
+    order: str
+
+    @property
+    def where(self) -> str:
+        return f' WHERE {" AND ".join(self.conditions)}' if self.conditions else ''
+
+
+def _json_param(value: Any, name: str) -> Any:
+    if isinstance(value, str) and value.strip()[:1] in ('{', '['):
+        try:
+            return json.loads(value)
+        except ValueError:
+            raise ValueError(f'{name} is not valid JSON')
+    return value
+
+
+def parse_columns(value: Any) -> Optional[List[str]]:
+    if value in (None, '', '*', []):
+        return None
+    names = value if isinstance(value, list) else str(value).split(',')
+    columns = []
+    for name in names:
+        name = name.strip() if isinstance(name, str) else name
+        quote_ident(name)
+        if name not in columns:
+            columns.append(name)
+    return columns
+
+
+def parse_where(value: Any) -> List[Tuple[str, str, Any]]:
+    """{column: value | {op: value}} -> [(column, op, value)]"""
+    value = _json_param(value, 'where')
+    if value in (None, '', {}):
+        return []
+    if not isinstance(value, dict):
+        raise ValueError('where must be an object of column conditions')
+
+    filters = []
+    for column, condition in value.items():
+        quote_ident(column)
+        if not isinstance(condition, dict):
+            condition = {'eq': condition}
+        if not condition:
+            raise ValueError(f'Empty condition for {column}')
+        for op, operand in condition.items():
+            if op not in ALL_OPERATORS:
+                raise ValueError(f'Unknown operator {op!r}, expected one of: {", ".join(ALL_OPERATORS)}')
+            if op == 'in':
+                if not isinstance(operand, list) or not operand:
+                    raise ValueError(f'{column}: in expects a non-empty list')
+                if len(operand) > MAX_IN_VALUES:
+                    raise ValueError(f'{column}: in accepts at most {MAX_IN_VALUES} values')
+            elif op == 'between':
+                if not isinstance(operand, list) or len(operand) != 2:
+                    raise ValueError(f'{column}: between expects [low, high]')
+            elif op in PATTERN_OPERATORS:
+                if not isinstance(operand, str):
+                    raise ValueError(f'{column}: {op} expects a string pattern')
+            elif op == 'is_null':
+                if not isinstance(operand, bool):
+                    raise ValueError(f'{column}: is_null expects true or false')
+            elif isinstance(operand, (list, dict)):
+                raise ValueError(f'{column}: {op} expects a single value')
+            filters.append((column, op, operand))
+    return filters
+
+
+def parse_order_by(value: Any) -> List[Tuple[str, str]]:
+    """"created_at desc, id" / ["-created_at", "id"] -> [(column, 'ASC'|'DESC')]"""
+    value = _json_param(value, 'order_by')
+    if value in (None, '', []):
+        return []
+    items = value if isinstance(value, list) else str(value).split(',')
+    order = []
+    for item in items:
+        if not isinstance(item, str):
+            raise ValueError('order_by items must be strings')
+        parts = item.split()
+        if not parts:
+            continue
+        column, direction = parts[0], 'ASC'
+        if column.startswith('-'):
+            column, direction = column[1:], 'DESC'
+        if len(parts) == 2 and parts[1].lower() in ('asc', 'desc'):
+            direction = parts[1].upper()
+        elif len(parts) > 1:
+            raise ValueError(f'Invalid order_by item: {item!r}')
+        quote_ident(column)
+        order.append((column, direction))
+    return order
+
+
+def _condition(column: schema_catalog.Column, op: str, operand: Any) -> Tuple[str, List[Any]]:
+    column_sql = quote_ident(column.name)
+    sql_type = column.sql_type
+    # Приводим параметр, а не колонку - иначе индекс по колонке не используется
+    if op == 'is_null':
+        return f'{column_sql} IS {"" if operand else "NOT "}NULL', []
+    if op == 'eq' and operand is None:
+        return f'{column_sql} IS NULL', []
+    if op == 'ne' and operand is None:
+        return f'{column_sql} IS NOT NULL', []
+    if op == 'in':
+        return f'{column_sql} = ANY(%s::{sql_type}[])', [[schema_catalog.coerce(column, v) for v in operand]]
+    if op == 'between':
+        return (f'{column_sql} BETWEEN %s::{sql_type} AND %s::{sql_type}',
+                [schema_catalog.coerce(column, v) for v in operand])
+    if op in PATTERN_OPERATORS:
+        return f'{column_sql} {PATTERN_OPERATORS[op]} %s', [operand]
+    return f'{column_sql} {OPERATORS[op]} %s::{sql_type}', [schema_catalog.coerce(column, operand)]
+
+
+def build(cursor, schema: str, table: str, body_data: Dict[str, Any],
+          required: Sequence[str] = ()) -> ListQuery:
+    """SELECT list, WHERE conditions and ORDER BY for a list request.
+
+    required columns (keyset pagination needs the sort column and id) are
+    added to an explicit projection.
+    """
+    info = schema_catalog.table(cursor, schema, table)
+    columns = parse_columns(body_data.get('columns'))
+    filters = parse_where(body_data.get('where'))
+    order = parse_order_by(body_data.get('order_by'))
+    if columns is None and not filters and not order:
+        return ListQuery('*', [], [], '')
+
+    if columns is not None:
+        columns += [name for name in required if name not in columns]
+    info.require(dict.fromkeys([*(columns or []), *(f[0] for f in filters), *(o[0] for o in order)]))
+
+    conditions: List[str] = []
+    params: List[Any] = []
+    for column, op, operand in filters:
+        sql, values = _condition(info.columns[column], op, operand)
+        conditions.append(sql)
+        params.extend(values)
+
+    select = ', '.join(quote_ident(name) for name in columns) if columns is not None else '*'
+    order_sql = ' ORDER BY ' + ', '.join(f'{quote_ident(c)} {d}' for c, d in order) if order else ''
+    return ListQuery(select, conditions, params, order_sql)
@@ -0,0 +1,448 @@
+# Сгенерировано backend/vendor_shared.py из backend/shared - не редактировать
+"""
+Read-through cache of encoded action=list / action=query responses.
+
+The key is a hash of the action and its request (SQL normalized as in
+shared.statements, params, paging and format options). Entries record the
+tables they read; a write to a table through create/update/delete or a write
+statement in action=query drops them (see shared.table_events), and so does
+the NOTIFY the V0035 triggers send after a commit, which every process
+subscribes to (app.py runs shared.change_feed in each worker, cloud functions
+drain it from their warm connection on each call). Those triggers exist only
+on NOTIFIED_TABLES (INSERT/UPDATE/DELETE, not TRUNCATE), so only reads of
+those tables are cached; any other table could change in another process
+without this one hearing of it. Each entry also keeps the
+response's version tag (shared.etag), so a hit can be answered with 304
+without looking at the body.
+
+Every table also has a generation number, bumped on each invalidation. The
+caller takes generation(tables) before running the read and passes it to
+put(); if a write was invalidated in between, the result may predate it and
+is not stored.
+
+Backends (RESULT_CACHE_BACKEND):
+  memory - per process LRU (default)
+  sqlite - a SQLite file (RESULT_CACHE_PATH) shared by every worker on the
+           host, read through mmap; invalidation is seen by all workers
+
+Both are bounded by RESULT_CACHE_MAX_ENTRIES and RESULT_CACHE_MAX_BYTES and
+evict least recently used entries. A query is cached only when it is a
+SELECT whose FROM/JOIN items are all plain NOTIFIED_TABLES (CTE names
+aside) and it calls no volatile function: comma joins, views, set-returning
+functions and LATERAL items are not cached, since the tables they read
+cannot be told from the text. Clients can bypass the cache
+with cache=false. RESULT_CACHE_ENABLED=0 turns it off.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from shared.identifiers import NAME_PATTERN, QUALIFIED_NAME_PATTERN, split_qualified
+from shared.statements import normalize_query
+
+CACHEABLE_ACTIONS = ('list', 'query')
+# Ключи запроса, не влияющие на тело ответа
+_TRANSPORT_KEYS = ('action', 'cache', 'stream', 'batch_size')
+
+_READ_PREFIXES = ('SELECT', 'WITH', 'TABLE')
+_UNCACHEABLE_RE = re.compile(
+    r'\b(?:INSERT|UPDATE|DELETE|MERGE|TRUNCATE|CREATE|ALTER|DROP|COPY|CALL|FOR\s+(?:UPDATE|SHARE)'
+    r'|now|random|nextval|setval|currval|clock_timestamp|statement_timestamp|transaction_timestamp|timeofday'
+    r'|current_timestamp|current_date|current_time|localtimestamp|localtime|current_user|session_user'
+    r'|gen_random_uuid|txid_current|pg_sleep\w*)\b',
+    re.IGNORECASE,
+)
+# Таблицы с NOTIFY-триггерами V0035 - только их изменения видны всем процессам
+NOTIFIED_SCHEMA = 't_p47619579_knowledge_management'
+NOTIFIED_TABLES = frozenset(('employees', 'tests', 'test_results', 'courses', 'notifications', 'knowledge_materials'))
+# Элемент FROM/JOIN: имя, затем "(" у функции или псевдоним и "," у соединения через запятую
+_FROM_RE = re.compile(
+    rf'\b(?:FROM|JOIN)\s+(?:ONLY\s+)?({QUALIFIED_NAME_PATTERN})\s*(\()?(?:\s*(?:AS\s+)?{NAME_PATTERN})?\s*(,)?',
+    re.IGNORECASE,
+)
+_CTE_RE = re.compile(
+    rf'(?:\bWITH(?:\s+RECURSIVE)?|,)\s*({NAME_PATTERN})\s+AS\s*(?:(?:NOT\s+)?MATERIALIZED\s*)?\(',
+    re.IGNORECASE,
+)
+# EXTRACT(field FROM value) - не FROM запроса
+_EXTRACT_RE = re.compile(r'\b(EXTRACT\s*\(\s*\w+\s+)FROM\b', re.IGNORECASE)
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'stores': 0, 'stale_puts': 0, 'evictions': 0, 'invalidations': 0, 'errors': 0}
+
+
+def _count(name: str, value: int = 1) -> None:
+    if value:
+        with _stats_lock:
+            _stats[name] += value
+
+
+def _ttl() -> float:
+    return float(os.environ.get('RESULT_CACHE_TTL', '30'))
+
+
+class MemoryBackend:
+    """LRU of encoded bodies in this process"""
+
+    name = 'memory'
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[str, Tuple[bytes, float, Tuple[str, ...], Optional[str]]]' = OrderedDict()
+        self._by_table: Dict[str, set] = {}
+        self._generations: Dict[str, int] = {}
+        self._epoch = 0
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _drop(self, key: str) -> None:
+        body, _, tables, _ = self._entries.pop(key)
+        self._bytes -= len(body)
+        for table in tables:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[table]
+
+    def get(self, key: str, max_age: float) -> Optional[Tuple[bytes, Optional[str]]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[1] > max_age:
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[0], entry[3]
+
+    def _generation(self, tables: List[str]) -> Tuple[int, ...]:
+        return (self._epoch, *(self._generations.get(table, 0) for table in tables))
+
+    def generation(self, tables: List[str]) -> Tuple[int, ...]:
+        with self._lock:
+            return self._generation(tables)
+
+    def put(self, key: str, body: bytes, tables: List[str], tag: Optional[str],
+            generation: Tuple[int, ...]) -> Optional[int]:
+        """Evicted entry count; None when a table changed since generation was taken"""
+        if len(body) > self.max_bytes:
+            return 0
+        evicted = 0
+        with self._lock:
+            if self._generation(tables) != tuple(generation):
+                return None
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (body, time.monotonic(), tuple(tables), tag)
+            self._bytes += len(body)
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                evicted += 1
+        return evicted
+
+    def invalidate_table(self, table: str) -> int:
+        with self._lock:
+            self._generations[table] = self._generations.get(table, 0) + 1
+            keys = list(self._by_table.get(table, ()))
+            for key in keys:
+                self._drop(key)
+        return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._by_table.clear()
+            self._bytes = 0
+
+    def usage(self) -> Dict[str, int]:
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes}
+
+
+class SQLiteBackend:
+    """LRU in a SQLite file shared by the processes of one host"""
+
+    name = 'sqlite'
+
+    def __init__(self, path: str, max_entries: int, max_bytes: int):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        # Соединение SQLite нельзя использовать после fork - открываем своё в каждом процессе
+        conn = sqlite3.connect(self.path, timeout=2, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=OFF')
+        conn.execute(f'PRAGMA mmap_size={max(self.max_bytes * 2, 1 << 20)}')
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY, body BLOB NOT NULL, size INTEGER NOT NULL, etag TEXT,
+                created REAL NOT NULL, accessed REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+            CREATE TABLE IF NOT EXISTS entry_tables (
+                table_name TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (table_name, key));
+            CREATE INDEX IF NOT EXISTS entry_tables_key ON entry_tables (key);
+            CREATE TABLE IF NOT EXISTS generations (table_name TEXT PRIMARY KEY, gen INTEGER NOT NULL);
+        """)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _delete(conn: sqlite3.Connection, keys: List[str]) -> None:
+        for start in range(0, len(keys), 500):
+            part = keys[start:start + 500]
+            marks = ','.join('?' * len(part))
+            conn.execute(f'DELETE FROM entries WHERE key IN ({marks})', part)
+            conn.execute(f'DELETE FROM entry_tables WHERE key IN ({marks})', part)
+
+    def get(self, key: str, max_age: float) -> Optional[Tuple[bytes, Optional[str]]]:
+        conn = self._conn()
+        row = conn.execute('SELECT body, created, etag FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[1] > max_age:
+            self._delete(conn, [key])
+            return None
+        conn.execute('UPDATE entries SET accessed = ? WHERE key = ?', (now, key))
+        return bytes(row[0]), row[2]
+
+    # Поколение всего кэша (clear) хранится под этим именем
+    _EPOCH = '*'
+
+    @classmethod
+    def _generation(cls, conn: sqlite3.Connection, tables: List[str]) -> Tuple[int, ...]:
+        names = [cls._EPOCH, *tables]
+        marks = ','.join('?' * len(names))
+        found = dict(conn.execute(f'SELECT table_name, gen FROM generations WHERE table_name IN ({marks})', names))
+        return tuple(found.get(name, 0) for name in names)
+
+    @staticmethod
+    def _bump(conn: sqlite3.Connection, table: str) -> None:
+        conn.execute('INSERT INTO generations (table_name, gen) VALUES (?, 1) '
+                     'ON CONFLICT (table_name) DO UPDATE SET gen = gen + 1', (table,))
+
+    def generation(self, tables: List[str]) -> Tuple[int, ...]:
+        return self._generation(self._conn(), tables)
+
+    def put(self, key: str, body: bytes, tables: List[str], tag: Optional[str],
+            generation: Tuple[int, ...]) -> Optional[int]:
+        if len(body) > self.max_bytes:
+            return 0
+        conn = self._conn()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if self._generation(conn, tables) != tuple(generation):
+                conn.execute('ROLLBACK')
+                return None
+            self._delete(conn, [key])
+            conn.execute('INSERT INTO entries (key, body, size, etag, created, accessed) VALUES (?, ?, ?, ?, ?, ?)',
+                         (key, sqlite3.Binary(body), len(body), tag, now, now))
+            conn.executemany('INSERT OR IGNORE INTO entry_tables (table_name, key) VALUES (?, ?)',
+                             [(table, key) for table in tables])
+            evicted = self._evict(conn)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return evicted
+
+    def _evict(self, conn: sqlite3.Connection) -> int:
+        entries, total = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        if entries <= self.max_entries and total <= self.max_bytes:
+            return 0
+        victims = []
+        for key, size in conn.execute('SELECT key, size FROM entries ORDER BY accessed'):
+            if entries <= self.max_entries and total <= self.max_bytes:
+                break
+            victims.append(key)
+            entries -= 1
+            total -= size
+        self._delete(conn, victims)
+        return len(victims)
+
+    def invalidate_table(self, table: str) -> int:
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            self._bump(conn, table)
+            keys = [row[0] for row in conn.execute('SELECT key FROM entry_tables WHERE table_name = ?', (table,))]
+            self._delete(conn, keys)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return len(keys)
+
+    def clear(self) -> None:
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            self._bump(conn, self._EPOCH)
+            conn.execute('DELETE FROM entries')
+            conn.execute('DELETE FROM entry_tables')
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def usage(self) -> Dict[str, int]:
+        entries, total = self._conn().execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        return {'entries': entries, 'bytes': total}
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                max_entries = int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', '1000'))
+                max_bytes = int(os.environ.get('RESULT_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+                if os.environ.get('RESULT_CACHE_BACKEND', 'memory') == 'sqlite':
+                    path = os.environ.get('RESULT_CACHE_PATH', '/tmp/kms_result_cache.sqlite3')
+                    _backend = SQLiteBackend(path, max_entries, max_bytes)
+                else:
+                    _backend = MemoryBackend(max_entries, max_bytes)
+    return _backend
+
+
+def enabled(body_data: Dict[str, Any]) -> bool:
+    if os.environ.get('RESULT_CACHE_ENABLED', '1') in ('0', 'false', 'no'):
+        return False
+    return str(body_data.get('cache', 'true')).lower() not in ('0', 'false', 'no')
+
+
+def query_tables(query: str) -> Optional[List[str]]:
+    """Tables read by a cacheable SELECT, None when the statement must not be cached"""
+    text = normalize_query(query)
+    if not text.upper().startswith(_READ_PREFIXES) or _UNCACHEABLE_RE.search(text):
+        return None
+    text = _EXTRACT_RE.sub(r'\1 ', text)
+    ctes = {split_qualified(name)[1] for name in _CTE_RE.findall(text)}
+    tables = set()
+    for name, call, comma in _FROM_RE.findall(text):
+        if call or comma:
+            return None
+        schema, table = split_qualified(name)
+        if schema is None and table in ctes:
+            continue
+        if not notified(schema, table):
+            return None
+        tables.add(table)
+    return sorted(tables) or None
+
+
+def notified(schema: Optional[str], table: str) -> bool:
+    """Writes to the table reach every process through NOTIFY (V0035)"""
+    return table in NOTIFIED_TABLES and schema in (None, NOTIFIED_SCHEMA)
+
+
+def lookup_key(action: str, body_data: Dict[str, Any]) -> Optional[Tuple[str, List[str]]]:
+    """(cache key, tables read) for a cacheable request, None otherwise"""
+    if action not in CACHEABLE_ACTIONS or not enabled(body_data):
+        return None
+    request = {k: v for k, v in body_data.items() if k not in _TRANSPORT_KEYS}
+    if action == 'list':
+        if not body_data.get('table') or not notified(body_data.get('schema'), body_data['table']):
+            return None
+        tables = [body_data['table']]
+    else:
+        tables = query_tables(body_data.get('query', ''))
+        if tables is None:
+            return None
+        request['query'] = normalize_query(body_data['query'])
+    raw = json.dumps([action, request], sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest(), tables
+
+
+def get(key: str) -> Optional[Tuple[bytes, Optional[str]]]:
+    """(encoded body, version tag) of a fresh entry, None on a miss"""
+    try:
+        entry = backend().get(key, _ttl())
+    except sqlite3.Error as e:
+        print(f"[result-cache] get failed: {e}")
+        _count('errors')
+        entry = None
+    _count('hits' if entry is not None else 'misses')
+    return entry
+
+
+def generation(tables: List[str]) -> Optional[Tuple[int, ...]]:
+    """Take before running the read whose result goes to put()"""
+    try:
+        return backend().generation(tables)
+    except sqlite3.Error as e:
+        print(f"[result-cache] generation failed: {e}")
+        _count('errors')
+        return None
+
+
+def put(key: str, body: bytes, tables: List[str], generation: Optional[Tuple[int, ...]],
+        tag: Optional[str] = None) -> None:
+    """Store unless one of tables was invalidated after generation was taken"""
+    if generation is None:
+        return
+    try:
+        evicted = backend().put(key, body, tables, tag, generation)
+    except sqlite3.Error as e:
+        print(f"[result-cache] put failed: {e}")
+        _count('errors')
+        return
+    if evicted is None:
+        _count('stale_puts')
+        return
+    _count('stores')
+    _count('evictions', evicted)
+
+
+def invalidate_table(table: str) -> None:
+    try:
+        _count('invalidations', backend().invalidate_table(table))
+    except sqlite3.Error as e:
+        print(f"[result-cache] invalidate failed: {e}")
+        _count('errors')
+        clear()
+
+
+def clear() -> None:
+    try:
+        backend().clear()
+    except sqlite3.Error as e:
+        print(f"[result-cache] clear failed: {e}")
+        _count('errors')
+
+
+def stats() -> Dict[str, Any]:
+    with _stats_lock:
+        data = dict(_stats)
+    lookups = data['hits'] + data['misses']
+    data['hit_ratio'] = round(data['hits'] / lookups, 3) if lookups else 0.0
+    data['backend'] = backend().name
+    try:
+        data.update(backend().usage())
+    except sqlite3.Error as e:
+        data['usage_error'] = str(e)
+    return data
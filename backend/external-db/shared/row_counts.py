@@ -0,0 +1,134 @@
+# Сгенерировано backend/vendor_shared.py из backend/shared - не редактировать
+"""
+Row-count strategies for action=list.
+
+  exact     - SELECT COUNT(*) (default, same as before)
+  estimated - planner statistics (pg_class.reltuples); age is the time since
+              the last ANALYZE/autoanalyze
+  cached    - exact count memoized per process for PG_COUNT_CACHE_TTL seconds
+              and dropped by create/update/delete on the same table
+  none      - no count at all
+
+With a where filter (filtered_count) exact and cached both run COUNT(*) with
+the same WHERE, estimated takes the planner's row estimate for it.
+
+Invalidation is per process: other gunicorn workers see a write only when their
+cached entry expires.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from shared.identifiers import qualified
+
+COUNT_MODES = ('exact', 'estimated', 'cached', 'none')
+
+_cache: Dict[Tuple[str, str], Tuple[int, float]] = {}
+_cache_lock = threading.Lock()
+
+
+def _ttl() -> float:
+    return float(os.environ.get('PG_COUNT_CACHE_TTL', '60'))
+
+
+def _fetch_value(cursor, key: str):
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return row[key] if isinstance(row, dict) else row[0]
+
+
+def exact_count(cursor, schema: str, table: str) -> int:
+    cursor.execute(f'SELECT COUNT(*) AS count FROM {qualified(schema, table)}')
+    return _fetch_value(cursor, 'count') or 0
+
+
+def estimated_count(cursor, schema: str, table: str) -> Tuple[Optional[int], Optional[float]]:
+    cursor.execute("""
+        SELECT c.reltuples::bigint AS estimate,
+               EXTRACT(EPOCH FROM NOW() - GREATEST(s.last_analyze, s.last_autoanalyze)) AS age
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+        WHERE n.nspname = %s AND c.relname = %s
+    """, (schema, table))
+    row = cursor.fetchone()
+    if row is None:
+        return None, None
+    estimate = row['estimate'] if isinstance(row, dict) else row[0]
+    age = row['age'] if isinstance(row, dict) else row[1]
+    # reltuples = -1: таблица ещё ни разу не анализировалась
+    if estimate is None or estimate < 0:
+        return None, None
+    return int(estimate), float(age) if age is not None else None
+
+
+def count_rows(cursor, schema: str, table: str, mode: str = 'exact') -> Dict[str, Any]:
+    """Return {'count', 'countMode', 'countAge'} for the requested mode"""
+    if mode not in COUNT_MODES:
+        raise ValueError(f'count must be one of: {", ".join(COUNT_MODES)}')
+
+    if mode == 'none':
+        return {'count': None, 'countMode': 'none', 'countAge': None}
+
+    if mode == 'estimated':
+        estimate, age = estimated_count(cursor, schema, table)
+        if estimate is not None:
+            return {'count': estimate, 'countMode': 'estimated', 'countAge': round(age, 1) if age is not None else None}
+        mode = 'exact'
+
+    if mode == 'cached':
+        key = (schema, table)
+        now = time.monotonic()
+        with _cache_lock:
+            cached = _cache.get(key)
+        if cached is not None and now - cached[1] < _ttl():
+            return {'count': cached[0], 'countMode': 'cached', 'countAge': round(now - cached[1], 1)}
+        count = exact_count(cursor, schema, table)
+        with _cache_lock:
+            _cache[key] = (count, time.monotonic())
+        return {'count': count, 'countMode': 'cached', 'countAge': 0.0}
+
+    return {'count': exact_count(cursor, schema, table), 'countMode': 'exact', 'countAge': 0.0}
+
+
+def filtered_count(cursor, schema: str, table: str, where_sql: str, params: Sequence[Any],
+                   mode: str = 'exact') -> Dict[str, Any]:
+    """count_rows for rows matching a WHERE clause"""
+    if mode not in COUNT_MODES:
+        raise ValueError(f'count must be one of: {", ".join(COUNT_MODES)}')
+
+    if mode == 'none':
+        return {'count': None, 'countMode': 'none', 'countAge': None}
+
+    table_sql = qualified(schema, table)
+    if mode == 'estimated':
+        cursor.execute(f'EXPLAIN (FORMAT JSON) SELECT 1 FROM {table_sql}{where_sql}', list(params))
+        plan = _fetch_value(cursor, 'QUERY PLAN')
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return {'count': int(plan[0]['Plan']['Plan Rows']), 'countMode': 'estimated', 'countAge': None}
+
+    cursor.execute(f'SELECT COUNT(*) AS count FROM {table_sql}{where_sql}', list(params))
+    return {'count': _fetch_value(cursor, 'count') or 0, 'countMode': 'exact', 'countAge': 0.0}
+
+
+def invalidate(schema: str, table: str) -> None:
+    """Called after writes through create/update/delete"""
+    with _cache_lock:
+        _cache.pop((schema, table), None)
+
+
+def invalidate_table(table: str) -> None:
+    """Write whose schema is unknown (free-form SQL): drop the table in every schema"""
+    with _cache_lock:
+        for key in [key for key in _cache if key[1] == table]:
+            del _cache[key]
+
+
+def invalidate_all() -> None:
+    with _cache_lock:
+        _cache.clear()
@@ -0,0 +1,223 @@
+# Сгенерировано backend/vendor_shared.py из backend/shared - не редактировать
+"""
+Per-process catalog of tables and column types, loaded from pg_catalog one
+schema at a time.
+
+Actions resolve table and column names here before building SQL: an unknown
+table or column is rejected with a 400 without a round trip, and values are
+converted to the column type and bound as %s::type parameters, so the
+statement text depends only on the column list and its plan can be reused.
+
+A schema is reloaded after SCHEMA_CATALOG_TTL seconds (default 300), after DDL
+reported through shared.table_events, and on a table or column lookup miss at
+most once per SCHEMA_CATALOG_MISS_INTERVAL seconds (default 5), so a table or
+column added by a migration or another process is found without reloading on
+every bad name.
+"""
+
+import os
+import threading
+import time
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from psycopg2.extras import Json
+
+from shared.identifiers import quote_ident
+
+_CATALOG_SQL = """
+    SELECT c.relname AS table_name,
+           a.attname AS column_name,
+           format_type(a.atttypid, a.atttypmod) AS sql_type,
+           t.typname AS type_name,
+           t.typcategory AS category,
+           a.attnotnull AS not_null,
+           a.atthasdef AS has_default
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+    JOIN pg_type t ON t.oid = a.atttypid
+    WHERE n.nspname = %s AND c.relkind IN ('r', 'p', 'v', 'm', 'f')
+    ORDER BY c.relname, a.attnum
+"""
+_FIELDS = ('table_name', 'column_name', 'sql_type', 'type_name', 'category', 'not_null', 'has_default')
+
+INTEGER_TYPES = ('int2', 'int4', 'int8')
+DECIMAL_TYPES = ('float4', 'float8', 'numeric')
+JSON_TYPES = ('json', 'jsonb')
+_TRUE = ('true', 't', 'yes', 'y', 'on', '1')
+_FALSE = ('false', 'f', 'no', 'n', 'off', '0')
+
+
+class Column(NamedTuple):
+    name: str
+    sql_type: str
+    type_name: str
+    category: str
+    not_null: bool
+    has_default: bool
+
+
+def _invalid(column: Column, value: Any) -> ValueError:
+    shown = repr(value)
+    return ValueError(f'{column.name}: expected {column.sql_type}, got {shown[:60]}')
+
+
+def coerce(column: Column, value: Any) -> Any:
+    """Python value for a column, checked against its type"""
+    if value is None:
+        if column.not_null:
+            raise ValueError(f'{column.name} cannot be null')
+        return None
+    if column.type_name in INTEGER_TYPES:
+        if isinstance(value, bool):
+            raise _invalid(column, value)
+        if isinstance(value, int):
+            return value
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        if isinstance(value, str) and value.strip().lstrip('-').isdigit():
+            return int(value)
+        raise _invalid(column, value)
+    if column.type_name in DECIMAL_TYPES:
+        if isinstance(value, bool):
+            raise _invalid(column, value)
+        if isinstance(value, (int, float, Decimal)):
+            return value
+        if isinstance(value, str):
+            try:
+                return Decimal(value.strip())
+            except InvalidOperation:
+                pass
+        raise _invalid(column, value)
+    if column.type_name == 'bool':
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, int) and value in (0, 1):
+            return bool(value)
+        if isinstance(value, str) and value.strip().lower() in _TRUE + _FALSE:
+            return value.strip().lower() in _TRUE
+        raise _invalid(column, value)
+    if column.type_name in JSON_TYPES:
+        # Строка - уже готовый JSON-текст, как и раньше
+        return value if isinstance(value, str) else Json(value)
+    if column.category == 'A':
+        if isinstance(value, list):
+            return value
+        raise _invalid(column, value)
+    if isinstance(value, (dict, list)):
+        raise _invalid(column, value)
+    if column.category == 'S' and not isinstance(value, str):
+        return ('true' if value else 'false') if isinstance(value, bool) else str(value)
+    return value
+
+
+class Table:
+    """Columns of one table, bound to the cursor of the current request for reloads"""
+
+    def __init__(self, schema: str, name: str, columns: Dict[str, Column], cursor=None):
+        self.schema = schema
+        self.name = name
+        self.columns = columns
+        self._cursor = cursor
+
+    def column(self, name: str) -> Column:
+        return self.require([name])[0]
+
+    def require(self, names: Iterable[str]) -> List[Column]:
+        names = list(names)
+        missing = [name for name in names if name not in self.columns]
+        if missing and self._cursor is not None:
+            for name in missing:
+                quote_ident(name)
+            # Колонка могла появиться после загрузки (ALTER TABLE из миграции)
+            tables = _reload_after_miss(self._cursor, self.schema)
+            if tables is not None and self.name in tables:
+                self.columns = tables[self.name]
+                missing = [name for name in names if name not in self.columns]
+        if missing:
+            for name in missing:
+                quote_ident(name)
+            raise ValueError(f'Unknown columns in {self.name}: {", ".join(missing)}')
+        return [self.columns[name] for name in names]
+
+    def types(self, names: Iterable[str]) -> Dict[str, str]:
+        return {column.name: column.sql_type for column in self.require(names)}
+
+    def placeholder(self, name: str) -> str:
+        return f'%s::{self.columns[name].sql_type}'
+
+    def coerce_row(self, data: Dict[str, Any]) -> List[Any]:
+        """Values of a column -> value mapping in its own order"""
+        return [coerce(column, data[column.name]) for column in self.require(data)]
+
+
+_schemas: Dict[str, Tuple[Dict[str, Dict[str, Column]], float]] = {}
+_lock = threading.Lock()
+_stats = {'loads': 0, 'hits': 0, 'misses': 0}
+
+
+def _ttl() -> float:
+    return float(os.environ.get('SCHEMA_CATALOG_TTL', '300'))
+
+
+def _load(cursor, schema: str) -> Dict[str, Dict[str, Column]]:
+    cursor.execute(_CATALOG_SQL, (schema,))
+    tables: Dict[str, Dict[str, Column]] = {}
+    for row in cursor.fetchall():
+        values = [row[field] for field in _FIELDS] if isinstance(row, dict) else list(row)
+        table_name = values[0]
+        tables.setdefault(table_name, {})[values[1]] = Column(*values[1:])
+    with _lock:
+        _schemas[schema] = (tables, time.monotonic())
+        _stats['loads'] += 1
+    print(f"[catalog] loaded {schema}: {len(tables)} tables")
+    return tables
+
+
+def _cached(schema: str) -> Optional[Tuple[Dict[str, Dict[str, Column]], float]]:
+    with _lock:
+        entry = _schemas.get(schema)
+    if entry is not None and time.monotonic() - entry[1] < _ttl():
+        return entry
+    return None
+
+
+def _reload_after_miss(cursor, schema: str) -> Optional[Dict[str, Dict[str, Column]]]:
+    """Reload a schema unless it was loaded less than SCHEMA_CATALOG_MISS_INTERVAL ago"""
+    with _lock:
+        entry = _schemas.get(schema)
+    miss_interval = float(os.environ.get('SCHEMA_CATALOG_MISS_INTERVAL', '5'))
+    if entry is not None and time.monotonic() - entry[1] < miss_interval:
+        return None
+    return _load(cursor, schema)
+
+
+def table(cursor, schema: str, name: str) -> Table:
+    """Catalog entry for schema.table; ValueError when it does not exist"""
+    quote_ident(schema)
+    quote_ident(name)
+    entry = _cached(schema)
+    tables = _load(cursor, schema) if entry is None else entry[0]
+    if name not in tables:
+        tables = _reload_after_miss(cursor, schema) or tables
+    columns = tables.get(name)
+    with _lock:
+        _stats['hits' if columns is not None else 'misses'] += 1
+    if columns is None:
+        raise ValueError(f'Unknown table: {schema}.{name}')
+    return Table(schema, name, columns, cursor)
+
+
+def invalidate(schema: Optional[str] = None) -> None:
+    """Drop one schema, or everything after DDL"""
+    with _lock:
+        if schema is None:
+            _schemas.clear()
+        else:
+            _schemas.pop(schema, None)
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        return {**_stats, 'schemas': len(_schemas)}
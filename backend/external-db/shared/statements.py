@@ -0,0 +1,288 @@
+# Сгенерировано backend/vendor_shared.py из backend/shared - не редактировать
+"""
+Bind parameters and a per-connection prepared-statement cache for action=query.
+
+Clients send PostgreSQL-style placeholders ($1..$n). psycopg2 has no extended
+query protocol, so parameters are bound in one of two ways:
+  * a statement seen PG_PREPARE_THRESHOLD times on a connection is sent once as
+    PREPARE <name>(<types>) AS <query text> and then run as EXECUTE <name>
+    (params); the server keeps the parsed statement and its plan for the session;
+  * other statements have their $n placeholders translated to psycopg2
+    placeholders and the values adapted by psycopg2 (never spliced as text).
+The PREPARE parameter types are the types PostgreSQL gives the literals
+psycopg2 sends for the same values: an int is a bare numeric constant, so it
+is int4 when it fits, else int8, else numeric; a float or Decimal is numeric
+(NaN/Infinity are sent as ::float); bool -> boolean, datetime -> timestamp,
+...; strings, JSON and NULL stay unknown. A statement therefore returns the
+same types whether it runs prepared or not. $n inside string literals, quoted identifiers,
+dollar-quoted bodies and comments is not a placeholder.
+Prepared statements are evicted LRU (DEALLOCATE) above PG_PREPARED_CACHE_SIZE.
+"""
+
+import os
+import re
+import threading
+import weakref
+from collections import OrderedDict
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import psycopg2
+from psycopg2.extras import Json
+
+_TOKEN_RE = re.compile(r"""
+    (?P<placeholder>\$(?P<n>\d+))
+  | (?P<dollar>\$(?:[A-Za-z_][A-Za-z0-9_]*)?\$)
+  | (?<![A-Za-z0-9_])[Ee]'(?:[^'\\]|\\.|'')*'
+  | '(?:[^']|'')*'
+  | "(?:[^"]|"")*"
+  | --[^\n]*
+  | /\*
+""", re.VERBOSE | re.DOTALL)
+_STALE_STATEMENT_CODES = ('0A000', '26000')
+_PREPARABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'VALUES', 'WITH', 'TABLE', 'MERGE')
+
+_counters_lock = threading.Lock()
+_counters = {
+    'hits': 0,
+    'misses': 0,
+    'prepares': 0,
+    'evictions': 0,
+    'unprepared': 0,
+    'prepare_failures': 0,
+}
+
+
+def _count(name: str) -> None:
+    with _counters_lock:
+        _counters[name] += 1
+
+
+def normalize_query(query: str) -> str:
+    return query.strip().rstrip(';').strip()
+
+
+def adapt_params(params: Optional[Sequence[Any]]) -> List[Any]:
+    """JSON objects arrive as dicts; psycopg2 cannot adapt them without a wrapper"""
+    return [Json(p) if isinstance(p, dict) else p for p in (params or [])]
+
+
+def _skip_block_comment(query: str, pos: int) -> int:
+    """End of a /* ... */ comment starting at pos (comments nest in PostgreSQL)"""
+    depth, pos = 1, pos + 2
+    while depth and pos < len(query):
+        if query.startswith('/*', pos):
+            depth, pos = depth + 1, pos + 2
+        elif query.startswith('*/', pos):
+            depth, pos = depth - 1, pos + 2
+        else:
+            pos += 1
+    return pos
+
+
+def placeholders(query: str) -> List[Tuple[int, int, int]]:
+    """(start, end, n) of every $n outside literals, quoted identifiers and comments"""
+    found = []
+    pos = 0
+    while True:
+        match = _TOKEN_RE.search(query, pos)
+        if match is None:
+            return found
+        pos = match.end()
+        if match.group('placeholder'):
+            found.append((match.start(), match.end(), int(match.group('n'))))
+        elif match.group('dollar'):
+            # $tag$ ... $tag$ - тело целиком пропускаем
+            close = query.find(match.group('dollar'), pos)
+            pos = len(query) if close < 0 else close + len(match.group('dollar'))
+        elif match.group(0) == '/*':
+            pos = _skip_block_comment(query, match.start())
+
+
+def placeholder_count(query: str) -> int:
+    return max((n for _, _, n in placeholders(query)), default=0)
+
+
+_NUMERIC_WIDTH = ('int4', 'int8', 'numeric')
+
+
+def _scalar_type(value: Any) -> Optional[str]:
+    if isinstance(value, bool):
+        return 'boolean'
+    if isinstance(value, int):
+        # Литерал без точки: int4, если помещается, потом int8, потом numeric
+        if -2 ** 31 <= value < 2 ** 31:
+            return 'int4'
+        return 'int8' if -2 ** 63 <= value < 2 ** 63 else 'numeric'
+    if isinstance(value, float) and (value != value or value in (float('inf'), float('-inf'))):
+        return 'float8'
+    if isinstance(value, (float, Decimal)):
+        return 'numeric'
+    if isinstance(value, datetime):
+        return 'timestamptz' if value.tzinfo is not None else 'timestamp'
+    if isinstance(value, date):
+        return 'date'
+    if isinstance(value, time):
+        return 'time'
+    if isinstance(value, str):
+        return 'text'
+    return None
+
+
+def param_type(value: Any) -> str:
+    """PREPARE parameter type matching how psycopg2 sends value as a literal"""
+    if isinstance(value, list):
+        # ARRAY[...] из psycopg2 типизирован по элементам; пустой список - '{}' без типа
+        element_types = {_scalar_type(v) for v in value if v is not None}
+        if element_types and element_types <= set(_NUMERIC_WIDTH):
+            # ARRAY[1, 3000000000] - общий тип элементов, самый широкий
+            return max(element_types, key=_NUMERIC_WIDTH.index) + '[]'
+        if len(element_types) == 1 and None not in element_types:
+            return element_types.pop() + '[]'
+        return 'unknown'
+    if isinstance(value, str):
+        # Строка уходит как литерал без типа - тип выводит сервер по контексту
+        return 'unknown'
+    return _scalar_type(value) or 'unknown'
+
+
+def to_pyformat(query: str, params: Sequence[Any]):
+    """Translate $n placeholders to %(pn)s so psycopg2 adapts the values"""
+    expected = placeholder_count(query)
+    if expected > len(params):
+        raise ValueError(f'Query uses ${expected} but only {len(params)} params given')
+    if not params:
+        return query, None
+    parts = []
+    pos = 0
+    for start, end, n in placeholders(query):
+        parts.append(query[pos:start].replace('%', '%%'))
+        parts.append(f'%(p{n})s')
+        pos = end
+    parts.append(query[pos:].replace('%', '%%'))
+    return ''.join(parts), {f'p{i}': value for i, value in enumerate(params, 1)}
+
+
+class StatementCache:
+    """Prepared statements of one connection, keyed by statement text and parameter types"""
+
+    def __init__(self, capacity: int, prepare_threshold: int):
+        self.capacity = capacity
+        self.prepare_threshold = prepare_threshold
+        self._prepared: 'OrderedDict[Tuple[str, Tuple[str, ...]], str]' = OrderedDict()
+        self._seen: 'OrderedDict[str, int]' = OrderedDict()
+        self._unpreparable = set()
+        self._next_id = 0
+
+    def _should_prepare(self, text: str) -> bool:
+        if self.capacity <= 0 or text in self._unpreparable:
+            return False
+        if ';' in text or not text.upper().startswith(_PREPARABLE):
+            return False
+        seen = self._seen.pop(text, 0) + 1
+        self._seen[text] = seen
+        while len(self._seen) > self.capacity * 4:
+            self._seen.popitem(last=False)
+        return seen >= self.prepare_threshold
+
+    def _evict(self, cursor) -> None:
+        while len(self._prepared) >= self.capacity:
+            _, old_name = self._prepared.popitem(last=False)
+            cursor.execute(f'DEALLOCATE {old_name}')
+            _count('evictions')
+
+    def _prepare(self, cursor, text: str, types: Tuple[str, ...]) -> Optional[str]:
+        self._evict(cursor)
+        self._next_id += 1
+        name = f'kms_stmt_{self._next_id}'
+        signature = f'({", ".join(types)})' if types else ''
+        try:
+            cursor.execute(f'PREPARE {name}{signature} AS {text}')
+        except psycopg2.Error:
+            _count('prepare_failures')
+            if not cursor.connection.autocommit:
+                raise
+            self._unpreparable.add(text)
+            return None
+        _count('prepares')
+        self._prepared[(text, types)] = name
+        return name
+
+    def execute(self, cursor, query: str, params: Optional[Sequence[Any]] = None) -> None:
+        text = normalize_query(query)
+        values = adapt_params(params)
+        expected = placeholder_count(text)
+        if expected > len(values):
+            raise ValueError(f'Query uses ${expected} but only {len(values)} params given')
+        types = tuple(param_type(v) for v in (params or []))
+        key = (text, types)
+
+        name = self._prepared.get(key)
+        if name is not None:
+            self._prepared.move_to_end(key)
+            _count('hits')
+        elif self._should_prepare(text):
+            _count('misses')
+            name = self._prepare(cursor, text, types)
+        else:
+            _count('unprepared')
+
+        if name is None:
+            converted, bound = to_pyformat(text, values)
+            cursor.execute(converted, bound)
+            return
+        try:
+            self._execute_prepared(cursor, name, values)
+        except psycopg2.Error as e:
+            # После DDL план может стать невалидным (0A000), а DISCARD ALL удаляет
+            # сами statements (26000) - готовим заново и повторяем один раз
+            if e.pgcode not in _STALE_STATEMENT_CODES or not cursor.connection.autocommit:
+                raise
+            self._prepared.pop(key, None)
+            if e.pgcode != '26000':
+                cursor.execute(f'DEALLOCATE {name}')
+            name = self._prepare(cursor, text, types)
+            if name is None:
+                converted, bound = to_pyformat(text, values)
+                cursor.execute(converted, bound)
+            else:
+                self._execute_prepared(cursor, name, values)
+
+    @staticmethod
+    def _execute_prepared(cursor, name: str, values: List[Any]) -> None:
+        if values:
+            cursor.execute(f'EXECUTE {name} ({", ".join(["%s"] * len(values))})', values)
+        else:
+            cursor.execute(f'EXECUTE {name}')
+
+
+_caches: 'weakref.WeakKeyDictionary[Any, StatementCache]' = weakref.WeakKeyDictionary()
+_caches_lock = threading.Lock()
+
+
+def cache_for(conn) -> StatementCache:
+    with _caches_lock:
+        cache = _caches.get(conn)
+        if cache is None:
+            cache = _caches[conn] = StatementCache(
+                capacity=int(os.environ.get('PG_PREPARED_CACHE_SIZE', '64')),
+                prepare_threshold=int(os.environ.get('PG_PREPARE_THRESHOLD', '2')),
+            )
+        return cache
+
+
+def execute(cursor, query: str, params: Optional[Sequence[Any]] = None) -> None:
+    """Run a $n-parameterized statement through the connection's statement cache"""
+    cache_for(cursor.connection).execute(cursor, query, params)
+
+
+def stats() -> Dict[str, Any]:
+    with _counters_lock:
+        counters = dict(_counters)
+    lookups = counters['hits'] + counters['misses']
+    counters['hit_rate'] = round(counters['hits'] / lookups, 3) if lookups else 0.0
+    with _caches_lock:
+        counters['connections'] = len(_caches)
+        counters['prepared'] = sum(len(c._prepared) for c in _caches.values())
+    return counters
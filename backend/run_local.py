@@ -6,10 +6,13 @@ Runs on port 8000 by default
 import os
 import sys
 import json
-from http.server import HTTPServer, BaseHTTPRequestHandler
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
 import importlib.util
 
+from shared import change_feed, compression, table_events
+
 PORT = int(os.environ.get('BACKEND_PORT', 8000))
 BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -27,11 +30,45 @@ class MockContext:
     def get_remaining_time_in_millis(self):
         return 30000
 
+_loaded_functions = {}
+# Облачная функция обрабатывает один запрос за раз - сервер многопоточный только ради /api/db/changes
+_invoke_lock = threading.Lock()
+_feed = None
+
+def load_function(function_name, function_path):
+    """Import function module once, like a warm cloud container keeps its globals"""
+    module = _loaded_functions.get(function_name)
+    if module is None:
+        spec = importlib.util.spec_from_file_location(f"handler_{function_name.replace('-', '_')}", function_path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _loaded_functions[function_name] = module
+    return module
+
+def get_change_feed():
+    """One LISTEN connection for the whole server, using external-db's connection settings"""
+    global _feed
+    with _invoke_lock:
+        if _feed is None:
+            module = load_function('external-db', os.path.join(BACKEND_DIR, 'external-db', 'index.py'))
+            _feed = change_feed.ChangeFeed(module.get_db_connection, on_change=table_events.table_changed,
+                                           on_missed=table_events.all_changed)
+    return _feed
+
 class BackendHandler(BaseHTTPRequestHandler):
     def log_message(self, format, *args):
         """Override to add timestamps"""
         sys.stderr.write(f"[{self.log_date_time_string()}] {format % args}\n")
     
+    def log_request(self, code='-', size='-'):
+        """Access log line with compression ratio and CPU time when the body was compressed"""
+        report = getattr(self, '_compression', None)
+        if report:
+            self.log_message('"%s" %s %s %s ratio=%s cpu_ms=%s', self.requestline, str(code), str(size),
+                             report['compression.encoding'], report['compression.ratio'], report['compression.cpu_ms'])
+        else:
+            self.log_message('"%s" %s %s', self.requestline, str(code), str(size))
+    
     def do_OPTIONS(self):
         """Handle CORS preflight"""
         self.send_response(200)
@@ -65,6 +102,10 @@ class BackendHandler(BaseHTTPRequestHandler):
             
             # Parse function name from path
             # /api/auth -> auth, /api/db -> external-db
+            if path == '/api/db/changes' and method == 'GET':
+                self.serve_changes(query_params)
+                return
+            
             function_name = None
             if path.startswith('/api/'):
                 endpoint = path[5:]  # Remove '/api/'
@@ -111,30 +152,40 @@ class BackendHandler(BaseHTTPRequestHandler):
                 self.send_error(404, f"Function not found: {function_name}")
                 return
             
-            # Import module
-            spec = importlib.util.spec_from_file_location("handler_module", function_path)
-            module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(module)
-            
-            # Execute handler
-            context = MockContext()
-            result = module.handler(event, context)
+            with _invoke_lock:
+                module = load_function(function_name, function_path)
+                
+                # Execute handler
+                context = MockContext()
+                result = module.handler(event, context)
             
             # Send response
             status_code = result.get('statusCode', 200)
             headers = result.get('headers', {})
             response_body = result.get('body', '')
             
+            if isinstance(response_body, str):
+                body_bytes = response_body.encode('utf-8')
+            else:
+                body_bytes = json.dumps(response_body).encode('utf-8')
+            
+            self._compression = None
+            encoding = compression.negotiate(self.headers.get('Accept-Encoding'))
+            if (encoding and len(body_bytes) >= compression.MIN_SIZE
+                    and not result.get('isBase64Encoded') and 'Content-Encoding' not in headers):
+                body_bytes, self._compression = compression.compress_body(body_bytes, encoding)
+            
             self.send_response(status_code)
             for key, value in headers.items():
                 self.send_header(key, value)
             self.send_header('Access-Control-Allow-Origin', '*')
+            self.send_header('Vary', 'Accept-Encoding')
+            if self._compression:
+                self.send_header('Content-Encoding', encoding)
+            self.send_header('Content-Length', str(len(body_bytes)))
             self.end_headers()
             
-            if isinstance(response_body, str):
-                self.wfile.write(response_body.encode('utf-8'))
-            else:
-                self.wfile.write(json.dumps(response_body).encode('utf-8'))
+            self.wfile.write(body_bytes)
                 
         except Exception as e:
             print(f"Error handling request: {e}")
@@ -142,15 +193,52 @@ class BackendHandler(BaseHTTPRequestHandler):
             traceback.print_exc()
             self.send_error(500, str(e))
 
+    def serve_changes(self, query_params):
+        """Change feed: Server-Sent Events for EventSource, otherwise a JSON long-poll"""
+        feed = get_change_feed()
+        tables = change_feed.parse_tables(query_params.get('tables'))
+        
+        if 'text/event-stream' in self.headers.get('Accept', '') or query_params.get('mode') == 'sse':
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('X-Accel-Buffering', 'no')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            try:
+                for chunk in feed.sse(self.headers.get('Last-Event-ID') or query_params.get('after'), tables):
+                    self.wfile.write(chunk.encode('utf-8'))
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            self.close_connection = True
+            return
+        
+        try:
+            timeout = change_feed.clamp_timeout(query_params.get('timeout'))
+        except ValueError as e:
+            self.send_error(400, str(e))
+            return
+        events, cursor = feed.wait(query_params.get('after'), timeout, tables)
+        body = json.dumps({'events': events, 'cursor': cursor}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
 def run_server():
     """Start the local backend server"""
     server_address = ('', PORT)
-    httpd = HTTPServer(server_address, BackendHandler)
+    httpd = ThreadingHTTPServer(server_address, BackendHandler)
     print(f"🚀 Local backend server running on http://localhost:{PORT}")
     print(f"Backend directory: {BACKEND_DIR}")
     print(f"Available endpoints:")
     print(f"  - /api/auth          -> backend/auth/")
     print(f"  - /api/db            -> backend/external-db/")
+    print(f"  - /api/db/changes    -> change feed (SSE / long-poll)")
     print(f"  - /api/email         -> backend/email-notifications/")
     print(f"  - /api/password-reset -> backend/password-reset/")
     print()
@@ -0,0 +1,8 @@
+"""
+Общие модули для Flask API (app.py) и cloud функций из backend/*/index.py
+
+Cloud функции деплоятся каждая своим каталогом, поэтому нужные им модули
+копируются в backend/<функция>/shared/ скриптом backend/vendor_shared.py -
+после изменений здесь запустите его и закоммитьте копии
+(`python3 vendor_shared.py --check` проверяет, что копии актуальны).
+"""
@@ -0,0 +1,27 @@
+"""
+SQL identifier validation for names that come from request bodies
+"""
+
+import re
+
+_IDENT_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]{0,62}$')
+# Имя в SQL-тексте: "quoted" или bare, опционально со схемой
+NAME_PATTERN = r'(?:"[^"]+"|\w+)'
+QUALIFIED_NAME_PATTERN = rf'{NAME_PATTERN}(?:\s*\.\s*{NAME_PATTERN})?'
+
+
+def quote_ident(name: str) -> str:
+    """Validate a table/column/schema name and return it double-quoted"""
+    if not isinstance(name, str) or not _IDENT_RE.match(name):
+        raise ValueError(f'Invalid identifier: {name!r}')
+    return f'"{name}"'
+
+
+def qualified(schema: str, table: str) -> str:
+    return f'{quote_ident(schema)}.{quote_ident(table)}'
+
+
+def split_qualified(name: str):
+    """'"schema"."table"' / 'schema.table' / 'table' from SQL text -> (schema or None, table)"""
+    parts = [p[1:-1] if p.startswith('"') else p.lower() for p in re.findall(NAME_PATTERN, name)]
+    return (parts[0], parts[1]) if len(parts) == 2 else (None, parts[0])
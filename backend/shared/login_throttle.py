@@ -0,0 +1,436 @@
+"""
+Token buckets for auth action=login, checked before the employee lookup and hashing.
+
+Every attempt takes a token from the bucket of its email and of its client
+IP; a successful login gives the IP token back and refills the email bucket.
+When either bucket is empty the attempt is rejected with 429 and Retry-After.
+
+  email - LOGIN_THROTTLE_EMAIL_BURST attempts (default 5), then
+          LOGIN_THROTTLE_EMAIL_PER_MINUTE (default 2)
+  ip    - LOGIN_THROTTLE_IP_BURST (default 30), then
+          LOGIN_THROTTLE_IP_PER_MINUTE (default 20)
+
+Buckets are kept in two layers. The first is always in this process's
+memory: an attempt it rejects is answered without touching any store or the
+database. An attempt it allows also takes from the shared store chosen by
+LOGIN_THROTTLE_BACKEND, if any:
+  memory   - none, per process limits only (default)
+  postgres - an UNLOGGED table (db_migrations/V0039), one upsert per bucket,
+             shared by every instance of the function; refill is computed
+             from the database clock, so instance clock skew does not matter.
+             Needs a connection registered with use_connection(), else the
+             limiter stays in memory
+  sqlite   - a SQLite file (LOGIN_THROTTLE_PATH) shared by the workers of one
+             host only; cloud function instances each have their own /tmp
+
+All keep at most LOGIN_THROTTLE_MAX_KEYS buckets (default 100000, least
+recently used dropped first) and every LOGIN_THROTTLE_SWEEP_SECONDS (default
+60) drop buckets that have refilled, which is the same as having none.
+LOGIN_THROTTLE_ENABLED=0 turns the limiter off. A store error lets the
+attempt through rather than locking every user out.
+
+The IP bucket is keyed by the gateway's sourceIp. X-Forwarded-For is set by
+the client, so it is only read when sourceIp is one of
+LOGIN_THROTTLE_TRUSTED_PROXIES (addresses or networks, comma-separated);
+without sourceIp there is no IP bucket.
+"""
+
+import ipaddress
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import psycopg2
+
+STORE_ERRORS = (sqlite3.Error, psycopg2.Error)
+
+_stats_lock = threading.Lock()
+_stats = {'allowed': 0, 'rejected': 0, 'swept': 0, 'evicted': 0, 'errors': 0}
+
+
+def _count(name: str, value: int = 1) -> None:
+    if value:
+        with _stats_lock:
+            _stats[name] += value
+
+
+def _refilled(tokens: float, updated: float, capacity: float, rate: float, now: float) -> float:
+    return min(capacity, tokens + max(0.0, now - updated) * rate)
+
+
+class MemoryStore:
+    """Buckets in this process: key -> (tokens, updated, capacity, rate)"""
+
+    name = 'memory'
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: 'OrderedDict[str, Tuple[float, float, float, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: float, rate: float, now: float) -> float:
+        """0 when a token was taken, else seconds until one is available"""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            tokens = capacity if bucket is None else _refilled(bucket[0], bucket[1], capacity, rate, now)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now, capacity, rate)
+                self._buckets.move_to_end(key)
+                return (1 - tokens) / rate
+            self._buckets[key] = (tokens - 1, now, capacity, rate)
+            self._buckets.move_to_end(key)
+            evicted = 0
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+                evicted += 1
+        _count('evicted', evicted)
+        return 0.0
+
+    def give_back(self, key: str, tokens: float, now: float) -> None:
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                level = _refilled(bucket[0], bucket[1], bucket[2], bucket[3], now)
+                self._buckets[key] = (min(bucket[2], level + tokens), now, bucket[2], bucket[3])
+
+    def reset(self, key: str) -> None:
+        with self._lock:
+            self._buckets.pop(key, None)
+
+    def sweep(self, now: float) -> int:
+        with self._lock:
+            full = [key for key, (tokens, updated, capacity, rate) in self._buckets.items()
+                    if _refilled(tokens, updated, capacity, rate, now) >= capacity]
+            for key in full:
+                del self._buckets[key]
+        return len(full)
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._buckets)
+
+
+class SQLiteStore:
+    """Buckets in a SQLite file shared by the processes of one host"""
+
+    name = 'sqlite'
+
+    def __init__(self, path: str, max_keys: int):
+        self.path = path
+        self.max_keys = max_keys
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=2, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=OFF')
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS buckets (
+                key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL,
+                capacity REAL NOT NULL, rate REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS buckets_updated ON buckets (updated);
+        """)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def take(self, key: str, capacity: float, rate: float, now: float) -> float:
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+            tokens = capacity if row is None else _refilled(row[0], row[1], capacity, rate, now)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            conn.execute('INSERT OR REPLACE INTO buckets (key, tokens, updated, capacity, rate) VALUES (?, ?, ?, ?, ?)',
+                         (key, tokens - 1 if wait == 0 else tokens, now, capacity, rate))
+            evicted = 0
+            if row is None:
+                (count,) = conn.execute('SELECT COUNT(*) FROM buckets').fetchone()
+                if count > self.max_keys:
+                    evicted = conn.execute(
+                        'DELETE FROM buckets WHERE key IN (SELECT key FROM buckets ORDER BY updated LIMIT ?)',
+                        (count - self.max_keys,)).rowcount
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        _count('evicted', evicted)
+        return wait
+
+    def give_back(self, key: str, tokens: float, now: float) -> None:
+        self._conn().execute(
+            'UPDATE buckets SET tokens = MIN(capacity, MIN(capacity, tokens + (? - updated) * rate) + ?), updated = ? '
+            'WHERE key = ?', (now, tokens, now, key))
+
+    def reset(self, key: str) -> None:
+        self._conn().execute('DELETE FROM buckets WHERE key = ?', (key,))
+
+    def sweep(self, now: float) -> int:
+        return self._conn().execute(
+            'DELETE FROM buckets WHERE tokens + (? - updated) * rate >= capacity', (now,)).rowcount
+
+    def size(self) -> int:
+        return self._conn().execute('SELECT COUNT(*) FROM buckets').fetchone()[0]
+
+
+# Время - по часам БД, а не экземпляра: у экземпляров часы могут расходиться
+_PG_NOW = 'EXTRACT(EPOCH FROM clock_timestamp())'
+# Пополнение корзины к моменту EXCLUDED.updated - как _refilled()
+_PG_REFILLED = 'LEAST(EXCLUDED.capacity, b.tokens + GREATEST(0, EXCLUDED.updated - b.updated) * EXCLUDED.rate)'
+
+
+class PostgresStore:
+    """Buckets in an UNLOGGED Postgres table shared by every instance; the now arguments are ignored"""
+
+    name = 'postgres'
+    TABLE = 't_p47619579_knowledge_management.auth_login_buckets'
+
+    def __init__(self, connection: Callable[[], Any], max_keys: int):
+        self.connection = connection
+        self.max_keys = max_keys
+
+    def _execute(self, query: str, params: Any) -> Any:
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(query, params)
+                result = cursor.fetchone() if cursor.description else cursor.rowcount
+                if not conn.autocommit:
+                    conn.commit()
+                return result
+            finally:
+                cursor.close()
+
+    def take(self, key: str, capacity: float, rate: float, now: float) -> float:
+        # Одним оператором: конкурентные попытки с разных экземпляров сериализует блокировка строки
+        (wait,) = self._execute(f"""
+            INSERT INTO {self.TABLE} AS b (key, tokens, updated, capacity, rate, wait)
+            VALUES (%(key)s, %(capacity)s - 1, {_PG_NOW}, %(capacity)s, %(rate)s, 0)
+            ON CONFLICT (key) DO UPDATE SET
+                tokens = CASE WHEN {_PG_REFILLED} >= 1 THEN {_PG_REFILLED} - 1 ELSE {_PG_REFILLED} END,
+                wait = CASE WHEN {_PG_REFILLED} >= 1 THEN 0 ELSE (1 - {_PG_REFILLED}) / EXCLUDED.rate END,
+                updated = EXCLUDED.updated, capacity = EXCLUDED.capacity, rate = EXCLUDED.rate
+            RETURNING wait
+        """, {'key': key, 'capacity': capacity, 'rate': rate})
+        return float(wait)
+
+    def give_back(self, key: str, tokens: float, now: float) -> None:
+        self._execute(f"""
+            UPDATE {self.TABLE}
+            SET tokens = LEAST(capacity, LEAST(capacity, tokens + GREATEST(0, {_PG_NOW} - updated) * rate) + %(tokens)s),
+                updated = {_PG_NOW}
+            WHERE key = %(key)s
+        """, {'key': key, 'tokens': tokens})
+
+    def reset(self, key: str) -> None:
+        self._execute(f'DELETE FROM {self.TABLE} WHERE key = %s', (key,))
+
+    def sweep(self, now: float) -> int:
+        swept = self._execute(f'DELETE FROM {self.TABLE} WHERE tokens + ({_PG_NOW} - updated) * rate >= capacity', None)
+        # Сверх LOGIN_THROTTLE_MAX_KEYS - самые давние
+        evicted = self._execute(f"""
+            DELETE FROM {self.TABLE} WHERE key IN (
+                SELECT key FROM {self.TABLE} ORDER BY updated DESC OFFSET %s)
+        """, (self.max_keys,))
+        _count('evicted', evicted)
+        return swept
+
+    def size(self) -> int:
+        return self._execute(f'SELECT COUNT(*) FROM {self.TABLE}', None)[0]
+
+
+_local: Optional[MemoryStore] = None
+_store = None
+_store_chosen = False
+_store_lock = threading.Lock()
+_last_sweep = 0.0
+_connection: Optional[Callable[[], Any]] = None
+
+
+def _max_keys() -> int:
+    return int(os.environ.get('LOGIN_THROTTLE_MAX_KEYS', '100000'))
+
+
+def use_connection(connection: Callable[[], Any]) -> None:
+    """Register a () -> context manager yielding a psycopg2 connection for the postgres store"""
+    global _connection
+    _connection = connection
+
+
+def local() -> MemoryStore:
+    """First layer: buckets of this process"""
+    global _local
+    if _local is None:
+        with _store_lock:
+            if _local is None:
+                _local = MemoryStore(_max_keys())
+    return _local
+
+
+def store():
+    """Second layer shared between processes, None with LOGIN_THROTTLE_BACKEND=memory"""
+    global _store, _store_chosen
+    if not _store_chosen:
+        with _store_lock:
+            if not _store_chosen:
+                backend = os.environ.get('LOGIN_THROTTLE_BACKEND', 'memory')
+                if backend == 'postgres' and _connection is not None:
+                    _store = PostgresStore(_connection, _max_keys())
+                elif backend == 'sqlite':
+                    _store = SQLiteStore(os.environ.get('LOGIN_THROTTLE_PATH', '/tmp/kms_login_throttle.sqlite3'),
+                                         _max_keys())
+                elif backend == 'postgres':
+                    print("[login-throttle] postgres store has no database connection, limits are per process")
+                _store_chosen = True
+    return _store
+
+
+def enabled() -> bool:
+    return os.environ.get('LOGIN_THROTTLE_ENABLED', '1') not in ('0', 'false', 'no')
+
+
+def _limit(kind: str, burst: str, per_minute: str) -> Tuple[float, float]:
+    capacity = float(os.environ.get(f'LOGIN_THROTTLE_{kind}_BURST', burst))
+    rate = float(os.environ.get(f'LOGIN_THROTTLE_{kind}_PER_MINUTE', per_minute)) / 60
+    return max(capacity, 1.0), max(rate, 1e-6)
+
+
+def _buckets(email: str, ip: Optional[str]) -> List[Tuple[str, float, float]]:
+    buckets = []
+    if email:
+        buckets.append((f'email:{email.strip().lower()}', *_limit('EMAIL', '5', '2')))
+    if ip:
+        buckets.append((f'ip:{ip}', *_limit('IP', '30', '20')))
+    return buckets
+
+
+def _maybe_sweep(now: float) -> None:
+    global _last_sweep
+    if now - _last_sweep < float(os.environ.get('LOGIN_THROTTLE_SWEEP_SECONDS', '60')):
+        return
+    _last_sweep = now
+    swept = local().sweep(now)
+    shared = store()
+    if shared is not None:
+        swept += shared.sweep(now)
+    _count('swept', swept)
+
+
+def _take_all(target, buckets: List[Tuple[str, float, float]], now: float) -> float:
+    """0 when every bucket gave a token, else the wait (tokens already taken are given back)"""
+    taken: List[str] = []
+    for key, capacity, rate in buckets:
+        wait = target.take(key, capacity, rate, now)
+        if wait > 0:
+            for previous in taken:
+                target.give_back(previous, 1, now)
+            return wait
+        taken.append(key)
+    return 0.0
+
+
+def acquire(email: str, ip: Optional[str]) -> Optional[float]:
+    """None when the attempt may proceed, else seconds to wait before retrying"""
+    if not enabled():
+        return None
+    now = time.time()
+    buckets = _buckets(email, ip)
+    # Сначала корзины процесса - отказ без обращения к общему хранилищу и БД
+    wait = _take_all(local(), buckets, now)
+    if wait == 0:
+        try:
+            _maybe_sweep(now)
+            shared = store()
+            if shared is not None:
+                wait = _take_all(shared, buckets, now)
+        except STORE_ERRORS as e:
+            # Общее хранилище недоступно - остаются лимиты процесса
+            print(f"[login-throttle] store failed: {e}")
+            _count('errors')
+        if wait > 0:
+            for key, _, _ in buckets:
+                local().give_back(key, 1, now)
+    if wait > 0:
+        _count('rejected')
+        return wait
+    _count('allowed')
+    return None
+
+
+def _release(target, buckets: List[Tuple[str, float, float]], now: float) -> None:
+    for key, _, _ in buckets:
+        if key.startswith('email:'):
+            target.reset(key)
+        else:
+            target.give_back(key, 1, now)
+
+
+def succeeded(email: str, ip: Optional[str]) -> None:
+    """Successful login: refill the email bucket and return the IP token"""
+    if not enabled():
+        return
+    now = time.time()
+    buckets = _buckets(email, ip)
+    _release(local(), buckets, now)
+    try:
+        shared = store()
+        if shared is not None:
+            _release(shared, buckets, now)
+    except STORE_ERRORS as e:
+        print(f"[login-throttle] store failed: {e}")
+        _count('errors')
+
+
+def retry_after_header(wait: float) -> str:
+    return str(max(1, math.ceil(wait)))
+
+
+def _trusted_proxies() -> List[Any]:
+    networks = []
+    for item in os.environ.get('LOGIN_THROTTLE_TRUSTED_PROXIES', '').split(','):
+        if item.strip():
+            networks.append(ipaddress.ip_network(item.strip(), strict=False))
+    return networks
+
+
+def _is_trusted(address: str, proxies: List[Any]) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in proxies)
+
+
+def client_ip(event: Dict[str, Any]) -> Optional[str]:
+    """Client address: the gateway's sourceIp, or the X-Forwarded-For hop in front of a trusted proxy"""
+    identity = (event.get('requestContext') or {}).get('identity') or {}
+    peer = identity.get('sourceIp')
+    proxies = _trusted_proxies()
+    if not peer or not _is_trusted(peer, proxies):
+        return peer or None
+    headers = {k.lower(): v for k, v in (event.get('headers') or {}).items()}
+    # Справа налево: адреса, дописанные нашими прокси, пропускаем; левее первого чужого - от клиента
+    for hop in reversed((headers.get('x-forwarded-for') or '').split(',')):
+        hop = hop.strip()
+        if hop and not _is_trusted(hop, proxies):
+            return hop
+    return peer
+
+
+def stats() -> Dict[str, Any]:
+    with _stats_lock:
+        counts = dict(_stats)
+    counts['keys'] = local().size()
+    shared = store()
+    try:
+        counts['shared_keys'] = shared.size() if shared is not None else None
+    except STORE_ERRORS:
+        counts['shared_keys'] = None
+    return {**counts, 'backend': shared.name if shared is not None else 'memory', 'enabled': enabled()}
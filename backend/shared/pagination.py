@@ -0,0 +1,114 @@
+"""
+Keyset (cursor) pagination for action=list.
+
+The opaque token is base64url JSON holding the sort column, direction and the
+last row's (sort value, id). The next page is fetched with
+WHERE (sort, id) > (last sort, last id) ORDER BY sort, id LIMIT n, so the
+cost of a page does not depend on how deep the client has scrolled, provided
+an index on (sort, id) exists. The sort column must be NOT NULL - a row
+comparison never matches NULL, so such rows would be skipped; check_sortable()
+rejects nullable columns before the first page.
+"""
+
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from shared import schema_catalog
+from shared.identifiers import quote_ident
+
+PRIMARY_KEY = 'id'
+
+
+def _json_value(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(sort: str, direction: str, sort_value: Any, row_id: Any) -> str:
+    payload = {'s': sort, 'd': direction, 'v': _json_value(sort_value), 'id': row_id}
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token: str) -> Dict[str, Any]:
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, dict) or 'id' not in payload:
+            raise ValueError
+        return payload
+    except (ValueError, TypeError):
+        raise ValueError('Invalid pagination cursor')
+
+
+def is_cursor_request(body_data: Dict[str, Any]) -> bool:
+    return bool(body_data.get('after')) or body_data.get('paginate') == 'cursor'
+
+
+def sort_column(body_data: Dict[str, Any]) -> str:
+    after: Optional[str] = body_data.get('after') or None
+    return body_data.get('sort') or (decode_cursor(after).get('s') if after else None) or PRIMARY_KEY
+
+
+def check_sortable(cursor, schema: str, table: str, sort: str) -> None:
+    """Keyset sort column must exist and be NOT NULL"""
+    (column,) = schema_catalog.table(cursor, schema, table).require([sort])
+    if sort != PRIMARY_KEY and not column.not_null:
+        raise ValueError(f'Cursor pagination requires a NOT NULL sort column, {sort} is nullable')
+
+
+def build_keyset_query(table_sql: str, body_data: Dict[str, Any], limit: int, select: str = '*',
+                       conditions: Sequence[str] = (), condition_params: Sequence[Any] = ()
+                       ) -> Tuple[str, List[Any], str, str]:
+    """SQL and params for the next page; fetches limit + 1 rows to detect hasMore.
+
+    conditions/condition_params are extra filters (action=list where) ANDed
+    with the keyset predicate.
+    """
+    after: Optional[str] = body_data.get('after') or None
+    cursor = decode_cursor(after) if after else None
+
+    sort = sort_column(body_data)
+    direction = str(body_data.get('direction') or (cursor or {}).get('d') or 'asc').lower()
+    if direction not in ('asc', 'desc'):
+        raise ValueError('direction must be asc or desc')
+    if cursor and (cursor.get('s') != sort or cursor.get('d') != direction):
+        raise ValueError('Cursor was issued for a different sort order')
+
+    sort_sql = quote_ident(sort)
+    pk_sql = quote_ident(PRIMARY_KEY)
+    op = '>' if direction == 'asc' else '<'
+    order = 'ASC' if direction == 'asc' else 'DESC'
+
+    predicates = list(conditions)
+    params: List[Any] = list(condition_params)
+    if cursor:
+        if sort == PRIMARY_KEY:
+            predicates.append(f'{pk_sql} {op} %s')
+            params.append(cursor['id'])
+        else:
+            predicates.append(f'({sort_sql}, {pk_sql}) {op} (%s, %s)')
+            params.extend([cursor['v'], cursor['id']])
+
+    where = f' WHERE {" AND ".join(predicates)}' if predicates else ''
+    order_by = f'{pk_sql} {order}' if sort == PRIMARY_KEY else f'{sort_sql} {order}, {pk_sql} {order}'
+    query = f'SELECT {select} FROM {table_sql}{where} ORDER BY {order_by} LIMIT {limit + 1}'
+    return query, params, sort, direction
+
+
+def page_result(rows: List[Dict[str, Any]], limit: int, sort: str, direction: str) -> Dict[str, Any]:
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_token = None
+    if has_more and rows:
+        last = rows[-1]
+        if last.get(sort) is None:
+            raise ValueError(f'Cursor pagination requires a non-null sort column, {sort} is NULL')
+        next_token = encode_cursor(sort, direction, last.get(sort), last.get(PRIMARY_KEY))
+    return {'rows': rows, 'next': next_token, 'hasMore': has_more}
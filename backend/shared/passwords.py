@@ -0,0 +1,223 @@
+"""
+PBKDF2 password hashing off the request thread.
+
+Hashes are computed in a process pool of PASSWORD_HASH_WORKERS processes
+(default: 2, at most the CPU count; 0 hashes inline), so a burst of logins
+occupies those processes instead of every web worker. At most
+PASSWORD_HASH_QUEUE (default 32) hashes may be queued or running; a caller
+that cannot get a slot within PASSWORD_HASH_WAIT seconds (default 5) gets
+HashQueueFull.
+
+Stored formats:
+  pbkdf2_sha256$<iterations>$<salt>$<hex>  - written now
+  <salt>:<hex>                             - older rows, 100000 iterations
+  <hex>                                    - plain SHA-256 from early imports
+PASSWORD_PBKDF2_ITERATIONS (default 100000) sets the iteration count of new
+hashes; needs_rehash() is true for anything else, and login rewrites it.
+
+hash_async/verify_async return concurrent.futures.Future objects (usable with
+asyncio.wrap_future); hash_password/verify_password wait for the result.
+"""
+
+import hashlib
+import hmac
+import multiprocessing
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+ALGORITHM = 'pbkdf2_sha256'
+LEGACY_ITERATIONS = 100000
+
+_lock = threading.Lock()
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_pid: Optional[int] = None
+_slots: Optional[threading.BoundedSemaphore] = None
+_pool_failed = False
+_stats = {'hashed': 0, 'queued': 0, 'rejected': 0,
+          'total_ms': 0.0, 'max_ms': 0.0, 'wait_total_ms': 0.0, 'inline': 0}
+
+
+class HashQueueFull(RuntimeError):
+    pass
+
+
+def iterations() -> int:
+    return int(os.environ.get('PASSWORD_PBKDF2_ITERATIONS', str(LEGACY_ITERATIONS)))
+
+
+def _pbkdf2(password: str, salt: str, rounds: int) -> str:
+    return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt.encode('utf-8'), rounds).hex()
+
+
+def _timed_pbkdf2(password: str, salt: str, rounds: int) -> Tuple[str, float]:
+    """Runs in the worker process; returns the digest and the CPU time it took"""
+    started = time.perf_counter()
+    digest = _pbkdf2(password, salt, rounds)
+    return digest, (time.perf_counter() - started) * 1000
+
+
+def parse(stored: str) -> Tuple[str, int, str, str]:
+    """(format, iterations, salt, hex digest) of a stored hash"""
+    if stored.startswith(ALGORITHM + '$'):
+        _, rounds, salt, digest = stored.split('$', 3)
+        return ALGORITHM, int(rounds), salt, digest
+    if ':' in stored:
+        salt, digest = stored.split(':', 1)
+        return 'legacy', LEGACY_ITERATIONS, salt, digest
+    return 'sha256', 0, '', stored
+
+
+def needs_rehash(stored: str) -> bool:
+    try:
+        kind, rounds, _, _ = parse(stored)
+    except ValueError:
+        return True
+    return kind != ALGORITHM or rounds != iterations()
+
+
+def _worker_count() -> int:
+    default = min(2, os.cpu_count() or 1)
+    return max(0, int(os.environ.get('PASSWORD_HASH_WORKERS', str(default))))
+
+
+def _pool() -> Optional[ProcessPoolExecutor]:
+    global _executor, _executor_pid, _slots, _pool_failed
+    with _lock:
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(int(os.environ.get('PASSWORD_HASH_QUEUE', '32')))
+        if _executor is not None and _executor_pid == os.getpid():
+            return _executor
+        workers = _worker_count()
+        if workers == 0 or _pool_failed:
+            return None
+        try:
+            # spawn: fork из многопоточного воркера может унести чужие блокировки
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _executor_pid = os.getpid()
+        except (OSError, NotImplementedError) as e:
+            # Нет /dev/shm и т.п. - считаем в текущем процессе
+            print(f"[passwords] process pool unavailable, hashing inline: {e}")
+            _pool_failed = True
+            return None
+        print(f"[passwords] process pool started: workers={workers}")
+        return _executor
+
+
+def _record(elapsed_ms: float, waited_ms: float) -> None:
+    with _lock:
+        _stats['hashed'] += 1
+        _stats['total_ms'] += elapsed_ms
+        _stats['max_ms'] = max(_stats['max_ms'], elapsed_ms)
+        _stats['wait_total_ms'] += waited_ms
+
+
+def _submit(password: str, salt: str, rounds: int) -> 'Future[str]':
+    """Future with the hex digest; the slot is held until the hash is done"""
+    pool = _pool()
+    result: 'Future[str]' = Future()
+    if pool is None:
+        started = time.perf_counter()
+        digest = _pbkdf2(password, salt, rounds)
+        with _lock:
+            _stats['inline'] += 1
+        _record((time.perf_counter() - started) * 1000, 0.0)
+        result.set_result(digest)
+        return result
+
+    if not _slots.acquire(timeout=float(os.environ.get('PASSWORD_HASH_WAIT', '5'))):
+        with _lock:
+            _stats['rejected'] += 1
+        raise HashQueueFull('Too many password operations in progress, try again')
+    submitted = time.perf_counter()
+    with _lock:
+        _stats['queued'] += 1
+
+    def done(future) -> None:
+        _slots.release()
+        with _lock:
+            _stats['queued'] -= 1
+        try:
+            digest, elapsed_ms = future.result()
+        except BaseException as e:
+            result.set_exception(e)
+            return
+        total_ms = (time.perf_counter() - submitted) * 1000
+        _record(elapsed_ms, max(0.0, total_ms - elapsed_ms))
+        result.set_result(digest)
+
+    try:
+        pool.submit(_timed_pbkdf2, password, salt, rounds).add_done_callback(done)
+    except BaseException:
+        _slots.release()
+        with _lock:
+            _stats['queued'] -= 1
+        raise
+    return result
+
+
+def hash_async(password: str) -> 'Future[str]':
+    """Future with a new stored hash in the current format"""
+    salt = secrets.token_hex(16)
+    rounds = iterations()
+    digest_future = _submit(password, salt, rounds)
+    result: 'Future[str]' = Future()
+
+    def done(future) -> None:
+        try:
+            result.set_result(f'{ALGORITHM}${rounds}${salt}${future.result()}')
+        except BaseException as e:
+            result.set_exception(e)
+
+    digest_future.add_done_callback(done)
+    return result
+
+
+def verify_async(password: str, stored: str) -> 'Future[bool]':
+    result: 'Future[bool]' = Future()
+    try:
+        kind, rounds, salt, expected = parse(stored)
+    except ValueError:
+        result.set_result(False)
+        return result
+    if kind == 'sha256':
+        actual = hashlib.sha256(password.encode('utf-8')).hexdigest()
+        result.set_result(hmac.compare_digest(actual, expected))
+        return result
+    digest_future = _submit(password, salt, rounds)
+
+    def done(future) -> None:
+        try:
+            result.set_result(hmac.compare_digest(future.result(), expected))
+        except BaseException as e:
+            result.set_exception(e)
+
+    digest_future.add_done_callback(done)
+    return result
+
+
+def hash_password(password: str) -> str:
+    return hash_async(password).result()
+
+
+def verify_password(password: str, stored: str) -> bool:
+    return verify_async(password, stored).result()
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        hashed = _stats['hashed']
+        return {
+            'workers': _worker_count(),
+            'queue_depth': _stats['queued'],
+            'hashed': hashed,
+            'inline': _stats['inline'],
+            'rejected': _stats['rejected'],
+            'avg_ms': round(_stats['total_ms'] / hashed, 1) if hashed else None,
+            'max_ms': round(_stats['max_ms'], 1),
+            'avg_wait_ms': round(_stats['wait_total_ms'] / hashed, 1) if hashed else None,
+            'iterations': iterations(),
+        }
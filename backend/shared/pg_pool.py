@@ -0,0 +1,284 @@
+"""
+Thread-safe PostgreSQL connection pool with health checks, max lifetime and idle reaping.
+
+Safe under gunicorn: connections inherited through fork() are dropped and the
+pool is rebuilt lazily in every worker process.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+import psycopg2
+import psycopg2.extensions
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within checkout_timeout"""
+
+
+class _Slot:
+    __slots__ = ('conn', 'created_at', 'last_used')
+
+    def __init__(self, conn):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used = now
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        min_size: int = 1,
+        max_size: int = 10,
+        max_lifetime: float = 1800.0,
+        idle_timeout: float = 300.0,
+        checkout_timeout: float = 10.0,
+        check_after_idle: float = 5.0,
+    ):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError('Invalid pool size: min_size=%s max_size=%s' % (min_size, max_size))
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.check_after_idle = check_after_idle
+
+        self._cond = threading.Condition(threading.Lock())
+        self._reset_state()
+
+    def _reset_state(self) -> None:
+        self._pid = os.getpid()
+        self._idle: List[_Slot] = []
+        self._in_use: Dict[int, _Slot] = {}
+        self._opening = 0
+        self._waiting = 0
+        self._closed = False
+        self._counters = {
+            'checkouts': 0,
+            'connections_opened': 0,
+            'connections_closed': 0,
+            'health_check_failures': 0,
+            'timeouts': 0,
+            'wait_count': 0,
+            'wait_time_total_ms': 0.0,
+            'wait_time_max_ms': 0.0,
+        }
+
+    def _check_fork(self) -> None:
+        # Сокеты родителя нельзя ни использовать, ни закрывать: close() отправит
+        # Terminate и оборвёт сессию родительского процесса. Просто забываем их.
+        if self._pid != os.getpid():
+            self._reset_state()
+
+    def _open_slot(self) -> _Slot:
+        conn = self._connect()
+        with self._cond:
+            self._counters['connections_opened'] += 1
+        return _Slot(conn)
+
+    def _close_slot(self, slot: _Slot) -> None:
+        try:
+            slot.conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._counters['connections_closed'] += 1
+
+    def _expired(self, slot: _Slot, now: float) -> bool:
+        return self.max_lifetime > 0 and now - slot.created_at > self.max_lifetime
+
+    def _healthy(self, slot: _Slot, now: float) -> bool:
+        conn = slot.conn
+        if conn.closed:
+            return False
+        if now - slot.last_used < self.check_after_idle:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if not conn.autocommit:
+                conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _reap_idle_locked(self, now: float) -> List[_Slot]:
+        """Remove expired and long-idle connections above min_size; caller closes them"""
+        reaped = []
+        keep = []
+        total = len(self._idle) + len(self._in_use) + self._opening
+        # Самые старые по last_used стоят в начале списка
+        for slot in self._idle:
+            too_idle = self.idle_timeout > 0 and now - slot.last_used > self.idle_timeout
+            if self._expired(slot, now) or (too_idle and total > self.min_size):
+                reaped.append(slot)
+                total -= 1
+            else:
+                keep.append(slot)
+        self._idle = keep
+        return reaped
+
+    def getconn(self, block: bool = True):
+        """Check out a healthy connection, opening a new one if the pool is not full.
+
+        With block=False returns None at once instead of waiting for a full pool.
+        """
+        self._check_fork()
+        deadline = time.monotonic() + self.checkout_timeout
+        waited_from: Optional[float] = None
+
+        while True:
+            slot = None
+            open_new = False
+            exhausted = False
+            with self._cond:
+                if self._closed:
+                    raise PoolTimeout('Connection pool is closed')
+                now = time.monotonic()
+                reaped = self._reap_idle_locked(now)
+                if self._idle:
+                    slot = self._idle.pop()
+                elif len(self._in_use) + self._opening < self.max_size:
+                    self._opening += 1
+                    open_new = True
+                elif not block:
+                    exhausted = True
+                else:
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self._counters['timeouts'] += 1
+                        raise PoolTimeout(
+                            'No free database connection within %.1fs (max_size=%d)'
+                            % (self.checkout_timeout, self.max_size)
+                        )
+                    if waited_from is None:
+                        waited_from = now
+                    self._waiting += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+            for old in reaped:
+                self._close_slot(old)
+            if exhausted:
+                return None
+            if slot is None and not open_new:
+                continue
+
+            if open_new:
+                try:
+                    slot = self._open_slot()
+                finally:
+                    with self._cond:
+                        self._opening -= 1
+                        if slot is None:
+                            self._cond.notify()
+            elif not self._healthy(slot, time.monotonic()):
+                with self._cond:
+                    self._counters['health_check_failures'] += 1
+                self._close_slot(slot)
+                continue
+
+            with self._cond:
+                self._in_use[id(slot.conn)] = slot
+                self._counters['checkouts'] += 1
+                if waited_from is not None:
+                    waited_ms = (time.monotonic() - waited_from) * 1000
+                    self._counters['wait_count'] += 1
+                    self._counters['wait_time_total_ms'] += waited_ms
+                    self._counters['wait_time_max_ms'] = max(self._counters['wait_time_max_ms'], waited_ms)
+            return slot.conn
+
+    def putconn(self, conn, discard: bool = False) -> None:
+        """Return a connection to the pool; broken or expired connections are closed"""
+        if self._pid != os.getpid():
+            return
+        with self._cond:
+            slot = self._in_use.pop(id(conn), None)
+        if slot is None:
+            return
+
+        if not discard and not conn.closed:
+            try:
+                status = conn.info.transaction_status
+                if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                discard = True
+
+        now = time.monotonic()
+        if discard or conn.closed or self._closed or self._expired(slot, now):
+            self._close_slot(slot)
+            with self._cond:
+                self._cond.notify()
+            return
+
+        slot.last_used = now
+        with self._cond:
+            self._idle.append(slot)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.getconn()
+        try:
+            yield conn
+        except BaseException:
+            self.putconn(conn, discard=bool(conn.closed))
+            raise
+        else:
+            self.putconn(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        """Gauges and counters for pool sizing"""
+        with self._cond:
+            counters = dict(self._counters)
+            in_use = len(self._in_use)
+            idle = len(self._idle)
+            waiting = self._waiting
+        wait_count = counters['wait_count']
+        return {
+            'pid': self._pid,
+            'min_size': self.min_size,
+            'max_size': self.max_size,
+            'in_use': in_use,
+            'idle': idle,
+            'size': in_use + idle,
+            'waiting': waiting,
+            'checkouts': counters['checkouts'],
+            'connections_opened': counters['connections_opened'],
+            'connections_closed': counters['connections_closed'],
+            'health_check_failures': counters['health_check_failures'],
+            'timeouts': counters['timeouts'],
+            'wait_count': wait_count,
+            'wait_time_avg_ms': round(counters['wait_time_total_ms'] / wait_count, 3) if wait_count else 0.0,
+            'wait_time_max_ms': round(counters['wait_time_max_ms'], 3),
+        }
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for slot in idle:
+            self._close_slot(slot)
+
+
+def pool_from_env(connect: Callable[[], Any], prefix: str = 'DB_POOL_') -> ConnectionPool:
+    """Build a pool configured by DB_POOL_MIN/MAX/MAX_LIFETIME/IDLE_TIMEOUT/TIMEOUT"""
+    env = os.environ.get
+    return ConnectionPool(
+        connect,
+        min_size=int(env(prefix + 'MIN', '1')),
+        max_size=int(env(prefix + 'MAX', '10')),
+        max_lifetime=float(env(prefix + 'MAX_LIFETIME', '1800')),
+        idle_timeout=float(env(prefix + 'IDLE_TIMEOUT', '300')),
+        checkout_timeout=float(env(prefix + 'TIMEOUT', '10')),
+    )
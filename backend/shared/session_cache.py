@@ -0,0 +1,114 @@
+"""
+Per-process cache of auth action=check results, token -> employee profile.
+
+  valid token   - kept for AUTH_CHECK_CACHE_TTL seconds (default 60), never
+                  past the session's own expires_at
+  invalid token - kept for AUTH_CHECK_NEGATIVE_TTL seconds (default 10), so a
+                  client retrying a dead token does not hit Postgres each time
+
+At most AUTH_CHECK_CACHE_SIZE entries (default 10000), least recently used
+dropped first. Tokens are stored as hashes only.
+
+Entries are indexed by employee id. The employees and auth_sessions writes
+happen in other processes (external-db, app.py), so they are not seen here
+directly: triggers record the employee id in auth_revoked_tokens (V0037,
+V0038) and auth calls evict_employees() for the ids it reads on every
+revocation refresh. logout evicts its token at once.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+# token hash -> (профиль или None, срок, id сотрудника)
+_entries: 'OrderedDict[str, Tuple[Optional[Dict[str, Any]], float, Optional[int]]]' = OrderedDict()
+_by_employee: Dict[int, Set[str]] = {}
+_lock = threading.Lock()
+_stats = {'hits': 0, 'negative_hits': 0, 'misses': 0, 'evictions': 0}
+
+
+def _key(token: str) -> str:
+    return hashlib.blake2b(token.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _drop(key: str) -> None:
+    """Remove an entry and its employee index; caller holds _lock"""
+    entry = _entries.pop(key, None)
+    if entry is None or entry[2] is None:
+        return
+    keys = _by_employee.get(entry[2])
+    if keys is not None:
+        keys.discard(key)
+        if not keys:
+            del _by_employee[entry[2]]
+
+
+def _store(token: str, employee: Optional[Dict[str, Any]], ttl: float, employee_id: Optional[int]) -> None:
+    if ttl <= 0:
+        return
+    limit = int(os.environ.get('AUTH_CHECK_CACHE_SIZE', '10000'))
+    with _lock:
+        key = _key(token)
+        _drop(key)
+        _entries[key] = (employee, time.monotonic() + ttl, employee_id)
+        if employee_id is not None:
+            _by_employee.setdefault(employee_id, set()).add(key)
+        while len(_entries) > limit:
+            _drop(next(iter(_entries)))
+            _stats['evictions'] += 1
+
+
+def lookup(token: str) -> Optional[Tuple[bool, Optional[Dict[str, Any]]]]:
+    """(True, employee) / (False, None) for a cached token, None on a miss"""
+    with _lock:
+        key = _key(token)
+        entry = _entries.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            if entry is not None:
+                _drop(key)
+            _stats['misses'] += 1
+            return None
+        _entries.move_to_end(key)
+        employee = entry[0]
+        _stats['hits' if employee is not None else 'negative_hits'] += 1
+        return (employee is not None, employee)
+
+
+def put_valid(token: str, employee: Dict[str, Any], expires_in: Optional[float]) -> None:
+    """expires_in: seconds until the session's expires_at, as computed by Postgres"""
+    ttl = float(os.environ.get('AUTH_CHECK_CACHE_TTL', '60'))
+    if expires_in is not None:
+        ttl = min(ttl, float(expires_in))
+    _store(token, employee, ttl, employee.get('id'))
+
+
+def put_invalid(token: str, employee_id: Optional[int] = None) -> None:
+    """employee_id: the token's employee when known (signed tokens), so reactivation evicts it"""
+    _store(token, None, float(os.environ.get('AUTH_CHECK_NEGATIVE_TTL', '10')), employee_id)
+
+
+def evict(token: str) -> None:
+    with _lock:
+        _drop(_key(token))
+
+
+def evict_employees(employee_ids: Iterable[int]) -> None:
+    """Drop every cached token of these employees"""
+    with _lock:
+        for employee_id in employee_ids:
+            for key in list(_by_employee.get(employee_id, ())):
+                _drop(key)
+
+
+def clear() -> None:
+    with _lock:
+        _entries.clear()
+        _by_employee.clear()
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        return {**_stats, 'entries': len(_entries)}
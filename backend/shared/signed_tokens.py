@@ -0,0 +1,191 @@
+"""
+Stateless session tokens: v1.<payload>.<signature>, HMAC-SHA256 over a
+base64url JSON payload {"jti", "eid", "role", "iat", "exp"}.
+
+Issued by auth login when AUTH_TOKEN_MODE=signed and AUTH_TOKEN_SECRET is
+set; verify() needs only the secret, so the caller's employee id and role are
+known without a database lookup. Opaque tokens (no dots) keep going through
+auth_sessions as before, whatever the mode.
+
+Logout cannot recall a token, so a token is also checked against a revocation
+set mirrored from auth_revoked_tokens (db_migrations/V0037):
+  jti rows         - written by logout, one token
+  employee_id rows - written by a trigger when an employee is deactivated,
+                     deleted, changes role or password; tokens issued
+                     strictly before revoked_at, both in whole seconds (iat
+                     has no fraction), so a token issued right after the
+                     change in the same second stays valid
+  revokes = false  - profile or auth_sessions changes (V0038): nothing is
+                     revoked, refresh() only reports the employee id so the
+                     auth check cache can drop it
+The set is refreshed incrementally every AUTH_REVOCATION_REFRESH seconds
+(default 15) by revoked_at, with an overlap for transactions that commit
+late; revocations made in this process apply immediately. Until the set has
+loaded, or when it is older than AUTH_REVOCATION_MAX_AGE seconds (default four
+refresh intervals) because refreshes fail, it is not trusted: callers check
+the token against the table itself (DB_CHECK_CONDITION) and fail closed.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import math
+import os
+import secrets
+import threading
+import time
+from typing import Any, Dict, Optional, Set, Tuple
+
+PREFIX = 'v1'
+REVOCATION_TABLE = 't_p47619579_knowledge_management.auth_revoked_tokens'
+# Транзакция logout может закоммититься позже строк, уже прочитанных другим процессом
+REFRESH_OVERLAP_SECONDS = 60
+# Проверка в БД вместо набора в памяти; параметры %(jti)s, %(eid)s, %(iat)s
+DB_CHECK_CONDITION = f"""NOT EXISTS (
+    SELECT 1 FROM {REVOCATION_TABLE} r
+    WHERE r.expires_at > now()
+      AND (r.jti = %(jti)s OR (r.employee_id = %(eid)s AND r.revokes
+           AND %(iat)s < floor(EXTRACT(EPOCH FROM r.revoked_at))))
+)"""
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def _secret() -> Optional[bytes]:
+    secret = os.environ.get('AUTH_TOKEN_SECRET')
+    return secret.encode('utf-8') if secret else None
+
+
+def enabled() -> bool:
+    """Login issues signed tokens"""
+    return os.environ.get('AUTH_TOKEN_MODE', 'opaque') == 'signed' and _secret() is not None
+
+
+def is_signed(token: str) -> bool:
+    return token.startswith(PREFIX + '.')
+
+
+def _sign(message: bytes, secret: bytes) -> str:
+    return _b64encode(hmac.new(secret, message, hashlib.sha256).digest())
+
+
+def issue(employee_id: int, role: str, ttl_seconds: float) -> Tuple[str, Dict[str, Any]]:
+    """(token, claims) for a new session"""
+    secret = _secret()
+    if secret is None:
+        raise RuntimeError('AUTH_TOKEN_SECRET is not set')
+    now = int(time.time())
+    claims = {'jti': secrets.token_urlsafe(12), 'eid': employee_id, 'role': role,
+              'iat': now, 'exp': now + int(ttl_seconds)}
+    payload = _b64encode(json.dumps(claims, separators=(',', ':')).encode('utf-8'))
+    message = f'{PREFIX}.{payload}'
+    return f'{message}.{_sign(message.encode("ascii"), secret)}', claims
+
+
+def verify(token: str) -> Optional[Dict[str, Any]]:
+    """Claims of a well-signed, unexpired token; None otherwise (revocation is not checked here)"""
+    secret = _secret()
+    if secret is None or not is_signed(token):
+        return None
+    message, _, signature = token.rpartition('.')
+    if not hmac.compare_digest(_sign(message.encode('ascii', 'replace'), secret), signature):
+        return None
+    try:
+        claims = json.loads(_b64decode(message.split('.', 1)[1]))
+    except (ValueError, IndexError):
+        return None
+    if not isinstance(claims, dict) or not isinstance(claims.get('exp'), int) or claims['exp'] <= time.time():
+        return None
+    return claims
+
+
+class RevocationSet:
+    def __init__(self):
+        self._jtis: Dict[str, float] = {}
+        self._employees: Dict[int, Tuple[float, float]] = {}
+        self._watermark: Optional[float] = None
+        # Строки из окна перекрытия, уже прочитанные: id -> revoked_at
+        self._seen: Dict[int, float] = {}
+        self._refreshed: Optional[float] = None
+        self._lock = threading.Lock()
+        self._stats = {'refreshes': 0, 'rows': 0}
+
+    @staticmethod
+    def _interval() -> float:
+        return float(os.environ.get('AUTH_REVOCATION_REFRESH', '15'))
+
+    def stale(self) -> bool:
+        """Due for a refresh"""
+        return self._refreshed is None or time.monotonic() - self._refreshed >= self._interval()
+
+    def trusted(self) -> bool:
+        """Loaded and refreshed recently enough to decide revocation without the database"""
+        max_age = float(os.environ.get('AUTH_REVOCATION_MAX_AGE', str(self._interval() * 4)))
+        return self._refreshed is not None and time.monotonic() - self._refreshed < max_age
+
+    def refresh(self, cursor) -> Set[int]:
+        """
+        Fetch revocations newer than the last seen one (all unexpired ones on the
+        first call); returns the employee ids of rows not seen before.
+        """
+        since = None if self._watermark is None else self._watermark - REFRESH_OVERLAP_SECONDS
+        cursor.execute(f"""
+            SELECT id, jti, employee_id, revokes, EXTRACT(EPOCH FROM revoked_at), EXTRACT(EPOCH FROM expires_at)
+            FROM {REVOCATION_TABLE}
+            WHERE expires_at > now() AND (%s::float8 IS NULL OR revoked_at > to_timestamp(%s::float8))
+        """, (since, since))
+        rows = cursor.fetchall()
+        now = time.time()
+        changed: Set[int] = set()
+        with self._lock:
+            for row_id, jti, employee_id, revokes, revoked_at, expires_at in rows:
+                if row_id in self._seen:
+                    continue
+                revoked_at, expires_at = float(revoked_at), float(expires_at)
+                self._seen[row_id] = revoked_at
+                if jti:
+                    self._jtis[jti] = expires_at
+                if employee_id is not None:
+                    changed.add(employee_id)
+                    if revokes:
+                        previous = self._employees.get(employee_id, (0.0, 0.0))
+                        self._employees[employee_id] = (max(previous[0], math.floor(revoked_at)),
+                                                        max(previous[1], expires_at))
+                self._watermark = max(self._watermark or 0.0, revoked_at)
+            self._jtis = {jti: exp for jti, exp in self._jtis.items() if exp > now}
+            self._employees = {eid: entry for eid, entry in self._employees.items() if entry[1] > now}
+            if self._watermark is None:
+                self._watermark = now
+            horizon = self._watermark - REFRESH_OVERLAP_SECONDS
+            self._seen = {row_id: at for row_id, at in self._seen.items() if at > horizon}
+            self._refreshed = time.monotonic()
+            self._stats['refreshes'] += 1
+            self._stats['rows'] += len(rows)
+        return changed
+
+    def add(self, jti: str, expires_at: float) -> None:
+        """Revocation made by this process (logout), effective before the next refresh"""
+        with self._lock:
+            self._jtis[jti] = expires_at
+
+    def is_revoked(self, claims: Dict[str, Any]) -> bool:
+        with self._lock:
+            if claims.get('jti') in self._jtis:
+                return True
+            entry = self._employees.get(claims.get('eid'))
+        return entry is not None and claims.get('iat', 0) < entry[0]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, 'jtis': len(self._jtis), 'employees': len(self._employees),
+                    'trusted': self.trusted()}
+
+
+revocations = RevocationSet()
@@ -0,0 +1,134 @@
+"""
+Streaming large result sets with server-side (named) cursors.
+
+Rows are pulled with fetchmany() in PG_STREAM_BATCH_SIZE batches and encoded
+batch by batch, so worker memory stays flat regardless of result size.
+Formats: json ({"rows": [...]}, same shape as the buffered response) and
+ndjson (one JSON object per line).
+"""
+
+import os
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import psycopg2.extensions
+from psycopg2.extras import RealDictCursor
+
+from shared import statements
+
+STREAM_FORMATS = ('json', 'ndjson')
+STREAMABLE = ('SELECT', 'WITH', 'VALUES', 'TABLE')
+
+_stats_lock = threading.Lock()
+_stats = {'streams': 0, 'rows': 0, 'ttfb_total_ms': 0.0, 'ttfb_max_ms': 0.0}
+
+
+def stream_format(body_data: Dict[str, Any]) -> Optional[str]:
+    """stream=true|json|ndjson -> format, None when streaming is not requested"""
+    value = body_data.get('stream')
+    if value in (None, False, '', 'false', '0'):
+        return None
+    if value in (True, 'true', '1'):
+        return 'json'
+    if value not in STREAM_FORMATS:
+        raise ValueError(f'stream must be one of: true, {", ".join(STREAM_FORMATS)}')
+    return value
+
+
+def batch_size(body_data: Dict[str, Any]) -> int:
+    return max(1, int(body_data.get('batch_size') or os.environ.get('PG_STREAM_BATCH_SIZE', '1000')))
+
+
+def query_statement(body_data: Dict[str, Any]):
+    """action=query text and params in psycopg2 form (DECLARE CURSOR cannot use EXECUTE)"""
+    text = statements.normalize_query(body_data.get('query', ''))
+    if not text.upper().startswith(STREAMABLE):
+        raise ValueError('Only SELECT queries can be streamed')
+    return statements.to_pyformat(text, statements.adapt_params(body_data.get('params')))
+
+
+def stream_rows(conn, query: str, params=None, size: int = 1000, cursor_factory=RealDictCursor) -> Iterator[List[Any]]:
+    """Yield batches of rows from a named cursor; leaves the connection as it found it"""
+    # Named cursor живёт только внутри транзакции
+    was_autocommit = conn.autocommit
+    if was_autocommit:
+        conn.autocommit = False
+    try:
+        with conn.cursor(name=f'kms_stream_{uuid.uuid4().hex[:12]}', cursor_factory=cursor_factory) as cursor:
+            cursor.itersize = size
+            cursor.execute(query, params)
+            while True:
+                batch = cursor.fetchmany(size)
+                if not batch:
+                    break
+                yield batch
+    finally:
+        if not conn.closed:
+            if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            conn.autocommit = was_autocommit
+
+
+def encode_stream(
+    batches: Iterable[List[Any]],
+    encode_row: Callable[[Any], str],
+    fmt: str,
+    started_at: float,
+    label: str = 'stream',
+) -> Iterator[str]:
+    """Encode row batches incrementally; records time-to-first-byte from started_at"""
+    rows = 0
+    ttfb_ms = None
+
+    def first_byte():
+        nonlocal ttfb_ms
+        if ttfb_ms is None:
+            ttfb_ms = (time.monotonic() - started_at) * 1000
+
+    if fmt == 'ndjson':
+        for batch in batches:
+            first_byte()
+            rows += len(batch)
+            yield ''.join(encode_row(row) + '\n' for row in batch)
+        first_byte()
+    else:
+        for batch in batches:
+            chunk = ','.join(encode_row(row) for row in batch)
+            if ttfb_ms is None:
+                first_byte()
+                yield '{"rows":[' + chunk
+            else:
+                yield ',' + chunk
+            rows += len(batch)
+        if ttfb_ms is None:
+            first_byte()
+            yield '{"rows":[]}'
+        else:
+            yield ']}'
+
+    total_ms = (time.monotonic() - started_at) * 1000
+    _record(rows, ttfb_ms)
+    print(f"[stream] {label}: rows={rows} format={fmt} ttfb_ms={ttfb_ms:.1f} total_ms={total_ms:.1f}")
+
+
+def _record(rows: int, ttfb_ms: float) -> None:
+    with _stats_lock:
+        _stats['streams'] += 1
+        _stats['rows'] += rows
+        _stats['ttfb_total_ms'] += ttfb_ms
+        _stats['ttfb_max_ms'] = max(_stats['ttfb_max_ms'], ttfb_ms)
+
+
+def stats() -> Dict[str, Any]:
+    with _stats_lock:
+        data = dict(_stats)
+    streams = data.pop('streams')
+    total = data.pop('ttfb_total_ms')
+    return {
+        'streams': streams,
+        'rows': data['rows'],
+        'ttfb_avg_ms': round(total / streams, 3) if streams else 0.0,
+        'ttfb_max_ms': round(data['ttfb_max_ms'], 3),
+    }
@@ -0,0 +1,100 @@
+"""
+Single place that is told about writes, so every per-table cache (row counts,
+result cache) is invalidated the same way.
+
+create/update/delete handlers call table_changed(); action=query calls
+statement_executed() for non-SELECT statements, which finds the written tables
+(INSERT/UPDATE/DELETE/MERGE/TRUNCATE/COPY targets) in the SQL text and drops
+everything, the schema catalog included, after DDL.
+
+Inside deferred() the calls made by the current thread are queued instead.
+action=batch replays them with replay() once the batch has committed and
+drops them when a transaction is rolled back, so a concurrent read cannot
+re-cache pre-commit rows and a rolled-back batch invalidates nothing.
+
+The auth check cache lives in the auth function's own processes and is
+invalidated from the database (shared.session_cache), not from here.
+"""
+
+import re
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, List, Tuple
+
+from shared import result_cache, row_counts, schema_catalog
+from shared.identifiers import QUALIFIED_NAME_PATTERN, split_qualified
+
+_WRITE_TARGET_RE = re.compile(
+    r'\b(?:INSERT\s+INTO|UPDATE(?:\s+ONLY)?|DELETE\s+FROM(?:\s+ONLY)?|MERGE\s+INTO|TRUNCATE(?:\s+TABLE)?(?:\s+ONLY)?|COPY)'
+    rf'\s+({QUALIFIED_NAME_PATTERN})',
+    re.IGNORECASE,
+)
+_DDL_RE = re.compile(r'\b(?:CREATE|ALTER|DROP|RENAME|COMMENT|GRANT|REVOKE|CALL|DO)\b', re.IGNORECASE)
+
+# Очередь отложенных сбросов текущего потока (None - сбрасываем сразу)
+_deferred = threading.local()
+
+Pending = List[Tuple[Callable[..., None], Tuple[Any, ...]]]
+
+
+def _queued(callback: Callable[..., None], *args: Any) -> bool:
+    pending = getattr(_deferred, 'pending', None)
+    if pending is None:
+        return False
+    pending.append((callback, args))
+    return True
+
+
+@contextmanager
+def deferred() -> Iterator[Pending]:
+    """Queue this thread's invalidations until the block ends; the caller replays or drops them"""
+    previous = getattr(_deferred, 'pending', None)
+    pending: Pending = []
+    _deferred.pending = pending
+    try:
+        yield pending
+    finally:
+        _deferred.pending = previous
+
+
+def replay(pending: Pending) -> None:
+    for callback, args in pending:
+        callback(*args)
+
+
+def table_changed(schema: str, *tables: str) -> None:
+    if _queued(table_changed, schema, *tables):
+        return
+    for table in tables:
+        row_counts.invalidate(schema, table)
+        result_cache.invalidate_table(table)
+
+
+def all_changed() -> None:
+    if _queued(all_changed):
+        return
+    row_counts.invalidate_all()
+    result_cache.clear()
+    schema_catalog.invalidate()
+
+
+def written_tables(query: str) -> List[str]:
+    return _WRITE_TARGET_RE.findall(query)
+
+
+def statement_executed(query: str) -> None:
+    """Invalidate after a free-form write statement (action=query)"""
+    if _queued(statement_executed, query):
+        return
+    if _DDL_RE.search(query):
+        all_changed()
+        return
+    targets = written_tables(query)
+    for name in targets:
+        schema, table = split_qualified(name)
+        if schema is None:
+            # Схема в запросе не указана - сбрасываем счётчики таблицы во всех схемах
+            row_counts.invalidate_table(table)
+            result_cache.invalidate_table(table)
+        else:
+            table_changed(schema, table)
@@ -0,0 +1,142 @@
+"""
+action=stats from the system catalogs in a single query.
+
+Lists the same relations as information_schema.tables did before: tables,
+partitioned tables, views and foreign tables (table_type tells them apart).
+Row counts are estimates (pg_stat_user_tables.n_live_tup, falling back to
+pg_class.reltuples); views and foreign tables have none, so their estimate is
+0. With exact=true the counts are computed with COUNT(*), as one statement
+with a scalar subquery per table on the request's connection. With a pool the
+tables are split between that connection and the pooled connections that are
+free right now (up to PG_STATS_PARALLELISM in total); the pool is never
+waited on, so concurrent stats requests cannot starve it. Results are cached
+per process for PG_STATS_CACHE_TTL seconds.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from shared.identifiers import qualified, quote_ident
+
+CATALOG_STATS_SQL = """
+    SELECT c.relname AS table_name,
+           CASE c.relkind WHEN 'v' THEN 'VIEW' WHEN 'f' THEN 'FOREIGN' ELSE 'BASE TABLE' END AS table_type,
+           COALESCE(a.column_count, 0) AS column_count,
+           COALESCE(s.n_live_tup, GREATEST(c.reltuples, 0))::bigint AS record_count,
+           pg_table_size(c.oid) AS table_size,
+           pg_indexes_size(c.oid) AS index_size,
+           pg_total_relation_size(c.oid) AS total_size
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+    LEFT JOIN (
+        SELECT attrelid, COUNT(*) AS column_count
+        FROM pg_attribute
+        WHERE attnum > 0 AND NOT attisdropped
+        GROUP BY attrelid
+    ) a ON a.attrelid = c.oid
+    WHERE n.nspname = %s AND c.relkind IN ('r', 'p', 'v', 'f')
+    ORDER BY c.relname
+"""
+
+_cache: Dict[Tuple[str, bool], Tuple[Dict[str, Any], float]] = {}
+_cache_lock = threading.Lock()
+
+
+def _ttl() -> float:
+    return float(os.environ.get('PG_STATS_CACHE_TTL', '30'))
+
+
+def catalog_stats(cursor, schema: str) -> List[Dict[str, Any]]:
+    cursor.execute(CATALOG_STATS_SQL, (schema,))
+    return [dict(row) for row in cursor.fetchall()]
+
+
+def exact_counts_single_statement(cursor, schema: str, tables: List[str]) -> Dict[str, int]:
+    """All COUNT(*) in one round trip: SELECT (SELECT COUNT(*) FROM t1) AS c0, ..."""
+    if not tables:
+        return {}
+    columns = ', '.join(
+        f'(SELECT COUNT(*) FROM {qualified(schema, table)}) AS {quote_ident(f"c{i}")}'
+        for i, table in enumerate(tables)
+    )
+    cursor.execute(f'SELECT {columns}')
+    row = cursor.fetchone()
+    values = [row[f'c{i}'] for i in range(len(tables))] if isinstance(row, dict) else list(row)
+    return dict(zip(tables, values))
+
+
+def exact_counts_parallel(cursor, pool, schema: str, tables: List[str], workers: int) -> Dict[str, int]:
+    """COUNT(*) spread over the held cursor and up to workers - 1 pooled connections that are free now"""
+    if not tables:
+        return {}
+    # Ждать пул нельзя: запрос уже держит соединение, а свободные могут забрать другие
+    extra = []
+    while len(extra) < min(workers, len(tables)) - 1:
+        conn = pool.getconn(block=False)
+        if conn is None:
+            break
+        extra.append(conn)
+    if not extra:
+        return exact_counts_single_statement(cursor, schema, tables)
+
+    step = len(extra) + 1
+    chunks = [tables[i::step] for i in range(step)]
+
+    def count_chunk(conn, chunk: List[str]) -> Dict[str, int]:
+        with conn.cursor() as extra_cursor:
+            return exact_counts_single_statement(extra_cursor, schema, chunk)
+
+    counts: Dict[str, int] = {}
+    try:
+        with ThreadPoolExecutor(max_workers=len(extra)) as executor:
+            futures = [executor.submit(count_chunk, conn, chunk) for conn, chunk in zip(extra, chunks[1:])]
+            counts.update(exact_counts_single_statement(cursor, schema, chunks[0]))
+            for future in futures:
+                counts.update(future.result())
+    finally:
+        for conn in extra:
+            pool.putconn(conn, discard=bool(conn.closed))
+    return counts
+
+
+def collect_stats(cursor, schema: str, exact: bool = False, pool=None) -> Dict[str, Any]:
+    """Stats payload for action=stats, served from the per-process cache when fresh"""
+    key = (schema, exact)
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _cache.get(key)
+    if cached is not None and now - cached[1] < _ttl():
+        return {**cached[0], 'cacheAge': round(now - cached[1], 1)}
+
+    table_list = catalog_stats(cursor, schema)
+    if exact:
+        names = [t['table_name'] for t in table_list]
+        workers = _parallelism(pool)
+        if workers > 1:
+            counts = exact_counts_parallel(cursor, pool, schema, names, workers)
+        else:
+            counts = exact_counts_single_statement(cursor, schema, names)
+        for table in table_list:
+            table['record_count'] = counts.get(table['table_name'], table['record_count'])
+
+    result = {
+        'tables': table_list,
+        'totalTables': len(table_list),
+        'totalRecords': sum(t['record_count'] for t in table_list),
+        'totalSize': sum(t['total_size'] for t in table_list),
+        'exact': exact,
+    }
+    with _cache_lock:
+        _cache[key] = (result, time.monotonic())
+    return {**result, 'cacheAge': 0.0}
+
+
+def _parallelism(pool: Optional[Any]) -> int:
+    if pool is None:
+        return 1
+    # Текущее соединение запроса плюс не больше max_size - 1 из пула
+    return max(1, min(int(os.environ.get('PG_STATS_PARALLELISM', '4')), pool.max_size))
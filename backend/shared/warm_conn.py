@@ -0,0 +1,129 @@
+"""
+Module-level connection cache for cloud functions.
+
+A warm container keeps its Python globals between invocations, so the
+connection opened by the first (cold) call is reused by the following ones.
+Before reuse the connection is validated cheaply: closed flag and transaction
+status always, a SELECT 1 ping only after PG_WARM_CHECK_AFTER seconds of idling.
+A dropped connection is replaced transparently.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import psycopg2
+import psycopg2.extensions
+
+
+class WarmConnection:
+    def __init__(self, name: str, connect: Callable[..., Any], check_after_idle: Optional[float] = None):
+        self.name = name
+        self._connect = connect
+        if check_after_idle is None:
+            check_after_idle = float(os.environ.get('PG_WARM_CHECK_AFTER', '10'))
+        self.check_after_idle = check_after_idle
+        self._lock = threading.RLock()
+        self._conn = None
+        self._conn_args: Optional[Tuple] = None
+        self._last_used = 0.0
+        self._counts = {'cold': 0, 'warm': 0, 'reconnects': 0}
+
+    def _is_usable(self, conn) -> bool:
+        if conn.closed:
+            return False
+        status = conn.info.transaction_status
+        if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        try:
+            if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            if time.monotonic() - self._last_used >= self.check_after_idle:
+                with conn.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                if not conn.autocommit:
+                    conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _drop(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is not None and not conn.closed:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def acquire(self, *args, **kwargs):
+        """Return the cached connection, (re)connecting when it is missing or dead"""
+        key = (args, tuple(sorted(kwargs.items())))
+        with self._lock:
+            if self._conn is not None and self._conn_args == key and self._is_usable(self._conn):
+                self._counts['warm'] += 1
+                kind = 'warm'
+            else:
+                if self._conn is not None:
+                    self._counts['reconnects'] += 1
+                    self._drop()
+                self._conn = self._connect(*args, **kwargs)
+                self._conn_args = key
+                self._counts['cold'] += 1
+                kind = 'cold'
+            self._last_used = time.monotonic()
+            self._log(kind)
+            return self._conn
+
+    def release(self, conn) -> None:
+        """End of invocation: keep the connection open, but never leave a transaction behind"""
+        with self._lock:
+            if conn is not self._conn:
+                return
+            if conn.closed:
+                self._conn = None
+                return
+            try:
+                if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                self._drop()
+                return
+            self._last_used = time.monotonic()
+
+    @contextmanager
+    def connection(self, *args, **kwargs):
+        conn = self.acquire(*args, **kwargs)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._counts)
+        total = counts['cold'] + counts['warm']
+        counts['hit_rate'] = round(counts['warm'] / total, 3) if total else 0.0
+        return counts
+
+    def _log(self, kind: str) -> None:
+        stats = self.stats()
+        print(
+            f"[db] {self.name}: {kind} connection "
+            f"(cold={stats['cold']}, warm={stats['warm']}, reconnects={stats['reconnects']}, "
+            f"hit_rate={stats['hit_rate']:.0%})"
+        )
+
+
+_registry: Dict[str, WarmConnection] = {}
+_registry_lock = threading.Lock()
+
+
+def warm_connection(name: str, connect: Callable[..., Any]) -> WarmConnection:
+    """Process-wide WarmConnection for a function; survives module re-imports"""
+    with _registry_lock:
+        cached = _registry.get(name)
+        if cached is None:
+            cached = _registry[name] = WarmConnection(name, connect)
+        return cached
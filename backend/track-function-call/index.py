@@ -6,24 +6,19 @@ Returns: HTTP response с обновленной статистикой
 
 import json
 import os
+import sys
 from datetime import datetime
 import psycopg2
 from typing import Dict, Any
-import urllib.request
-import ssl
 
-def setup_ssl_cert():
-    """Download and setup SSL certificate for TimeWeb Cloud PostgreSQL"""
-    import os
-    cert_dir = '/tmp/.postgresql'
-    cert_path = f'{cert_dir}/root.crt'
-    
-    if not os.path.exists(cert_path):
-        os.makedirs(cert_dir, exist_ok=True)
-        cert_url = 'https://st.timeweb.com/cloud-static/ca.crt'
-        urllib.request.urlretrieve(cert_url, cert_path)
-    
-    os.environ['PGSSLROOTCERT'] = cert_path
+# При деплое shared/ лежит в каталоге функции (backend/vendor_shared.py), локально - в backend/
+_function_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, _function_dir if os.path.isdir(os.path.join(_function_dir, 'shared')) else os.path.dirname(_function_dir))
+
+from shared.ssl_cert import setup_ssl_cert
+from shared.warm_conn import warm_connection
+
+_db = warm_connection('track-function-call', psycopg2.connect)
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     setup_ssl_cert()
@@ -64,7 +59,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         
         current_month = datetime.now().strftime('%Y-%m')
         
-        conn = psycopg2.connect(dsn)
+        conn = _db.acquire(dsn)
         cur = conn.cursor()
         
         cur.execute("""
@@ -94,7 +89,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         
         conn.commit()
         cur.close()
-        conn.close()
+        _db.release(conn)
         
         return {
             'statusCode': 200,
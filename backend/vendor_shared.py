@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Copy the backend/shared modules each cloud function imports into its directory.
+
+Every function from func2url.json is deployed as its own directory, so a
+function that does `from shared import ...` needs its own shared/ package.
+The script follows the shared imports of <function>/index.py (and of the
+copied modules themselves), writes exactly those modules to
+<function>/shared/ and checks that <function>/requirements.txt lists the
+packages they need.
+
+The single-file Flask apps (server/, standalone-backend/) are deployed without
+backend/, so the modules they import directly get a copy next to app.py.
+
+    python3 vendor_shared.py          # refresh the copies
+    python3 vendor_shared.py --check  # exit 1 when a copy is stale (CI / pre-deploy)
+
+Run it after changing anything in backend/shared and commit the copies.
+"""
+import json
+import os
+import re
+import sys
+from typing import Dict, List, Set
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+SHARED_DIR = os.path.join(BACKEND_DIR, 'shared')
+
+# Сторонние пакеты, без которых модуль shared не импортируется (brotli/orjson - необязательные)
+REQUIRED_PACKAGES = {'psycopg2': 'psycopg2-binary'}
+
+# Приложения из одного app.py: модуль кладётся рядом с app.py, пакет - в их requirements.txt
+STANDALONE_APPS = {
+    'server': {'compression': 'Brotli'},
+    'standalone-backend': {'compression': 'Brotli'},
+}
+
+HEADER = '# Сгенерировано backend/vendor_shared.py из backend/shared - не редактировать\n'
+_IMPORT_RE = re.compile(r'^\s*from shared(?:\.(\w+))? import ([^\n(]+|\([^)]*\))', re.MULTILINE)
+_THIRD_PARTY_RE = re.compile(r'^\s*(?:import|from) (\w+)', re.MULTILINE)
+
+
+def shared_imports(source: str) -> Set[str]:
+    """Names of shared modules imported by source"""
+    modules = set()
+    for module, names in _IMPORT_RE.findall(source):
+        if module:
+            modules.add(module)
+        else:
+            modules.update(n.strip() for n in names.strip('()').replace('\n', ' ').split(',') if n.strip())
+    return modules
+
+
+def closure(source: str) -> List[str]:
+    pending = list(shared_imports(source))
+    seen: Set[str] = set()
+    while pending:
+        module = pending.pop()
+        if module in seen:
+            continue
+        seen.add(module)
+        with open(os.path.join(SHARED_DIR, f'{module}.py'), encoding='utf-8') as f:
+            pending.extend(shared_imports(f.read()))
+    return sorted(seen)
+
+
+def expected_files(modules: List[str]) -> Dict[str, str]:
+    files = {'__init__.py': HEADER}
+    for module in modules:
+        with open(os.path.join(SHARED_DIR, f'{module}.py'), encoding='utf-8') as f:
+            files[f'{module}.py'] = HEADER + f.read()
+    return files
+
+
+def missing_requirements(function_dir: str, modules: List[str]) -> List[str]:
+    needed = set()
+    for module in modules:
+        with open(os.path.join(SHARED_DIR, f'{module}.py'), encoding='utf-8') as f:
+            needed.update(REQUIRED_PACKAGES[name] for name in _THIRD_PARTY_RE.findall(f.read())
+                          if name in REQUIRED_PACKAGES)
+    path = os.path.join(function_dir, 'requirements.txt')
+    listed = ''
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            listed = f.read().lower()
+    return sorted(p for p in needed if p.lower() not in listed)
+
+
+def main() -> int:
+    check = '--check' in sys.argv[1:]
+    with open(os.path.join(BACKEND_DIR, 'func2url.json'), encoding='utf-8') as f:
+        functions = sorted(json.load(f))
+
+    problems = []
+    for name in functions:
+        function_dir = os.path.join(BACKEND_DIR, name)
+        with open(os.path.join(function_dir, 'index.py'), encoding='utf-8') as f:
+            modules = closure(f.read())
+        target = os.path.join(function_dir, 'shared')
+        if not modules:
+            continue
+
+        expected = expected_files(modules)
+        current = {}
+        if os.path.isdir(target):
+            for file_name in os.listdir(target):
+                if file_name.endswith('.py'):
+                    with open(os.path.join(target, file_name), encoding='utf-8') as f:
+                        current[file_name] = f.read()
+        if current != expected:
+            if check:
+                problems.append(f'{name}/shared is out of date')
+            else:
+                os.makedirs(target, exist_ok=True)
+                for file_name in set(current) - set(expected):
+                    os.unlink(os.path.join(target, file_name))
+                for file_name, content in expected.items():
+                    with open(os.path.join(target, file_name), 'w', encoding='utf-8') as f:
+                        f.write(content)
+                print(f"✅ {name}/shared: {', '.join(modules)}")
+        for package in missing_requirements(function_dir, modules):
+            problems.append(f'{name}/requirements.txt is missing {package}')
+
+    for app_name, modules in sorted(STANDALONE_APPS.items()):
+        app_dir = os.path.join(BACKEND_DIR, '..', app_name)
+        with open(os.path.join(app_dir, 'requirements.txt'), encoding='utf-8') as f:
+            listed = f.read().lower()
+        for module, package in sorted(modules.items()):
+            with open(os.path.join(SHARED_DIR, f'{module}.py'), encoding='utf-8') as f:
+                expected = HEADER + f.read()
+            path = os.path.join(app_dir, f'{module}.py')
+            current = None
+            if os.path.exists(path):
+                with open(path, encoding='utf-8') as f:
+                    current = f.read()
+            if current != expected:
+                if check:
+                    problems.append(f'{app_name}/{module}.py is out of date')
+                else:
+                    with open(path, 'w', encoding='utf-8') as f:
+                        f.write(expected)
+                    print(f"✅ {app_name}/{module}.py")
+            if package.lower() not in listed:
+                problems.append(f'{app_name}/requirements.txt is missing {package}')
+
+    for problem in problems:
+        print(f"❌ {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
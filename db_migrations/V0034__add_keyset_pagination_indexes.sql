@@ -0,0 +1,14 @@
+-- Курсорная пагинация (sort, id) > (...) пропускает строки с NULL в sort -
+-- created_at делаем NOT NULL, прежде чем давать его как ключ сортировки
+UPDATE t_p47619579_knowledge_management.test_results
+SET created_at = COALESCE(completed_at, started_at, CURRENT_TIMESTAMP)
+WHERE created_at IS NULL;
+ALTER TABLE t_p47619579_knowledge_management.test_results ALTER COLUMN created_at SET NOT NULL;
+
+UPDATE function_calls_detailed SET created_at = COALESCE(updated_at, CURRENT_TIMESTAMP) WHERE created_at IS NULL;
+ALTER TABLE function_calls_detailed ALTER COLUMN created_at SET NOT NULL;
+
+-- Индексы для курсорной пагинации action=list (sort=created_at): (created_at, id)
+CREATE INDEX IF NOT EXISTS idx_test_results_created_at_id ON t_p47619579_knowledge_management.test_results(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_notifications_created_at_id ON t_p47619579_knowledge_management.notifications(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_function_calls_detailed_created_at_id ON function_calls_detailed(created_at, id);
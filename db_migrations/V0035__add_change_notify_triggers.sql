@@ -0,0 +1,80 @@
+-- Лента изменений (/changes): statement-level триггеры шлют NOTIFY kms_changes
+-- с именем таблицы, операцией и id изменённых строк (до 500 id, иначе ids = null)
+CREATE OR REPLACE FUNCTION t_p47619579_knowledge_management.notify_table_change() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    changed_ids JSONB;
+    total INTEGER;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        SELECT COUNT(*), jsonb_agg(id) INTO total, changed_ids FROM (SELECT id FROM old_rows LIMIT 501) s;
+    ELSE
+        SELECT COUNT(*), jsonb_agg(id) INTO total, changed_ids FROM (SELECT id FROM new_rows LIMIT 501) s;
+    END IF;
+    IF total = 0 THEN
+        RETURN NULL;
+    END IF;
+    -- Payload NOTIFY ограничен 8000 байт: при большом изменении клиент перечитывает таблицу
+    IF total > 500 THEN
+        changed_ids := NULL;
+    END IF;
+    PERFORM pg_notify('kms_changes', json_build_object(
+        'schema', TG_TABLE_SCHEMA, 'table', TG_TABLE_NAME, 'op', TG_OP, 'ids', changed_ids)::text);
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS employees_notify_insert ON t_p47619579_knowledge_management.employees;
+CREATE TRIGGER employees_notify_insert AFTER INSERT ON t_p47619579_knowledge_management.employees
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION t_p47619579_knowledge_management.notify_table_change();
+DROP TRIGGER IF EXISTS employees_notify_update ON t_p47619579_knowledge_management.employees;
+CREATE TRIGGER employees_notify_update AFTER UPDATE ON t_p47619579_knowledge_management.employees
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION t_p47619579_knowledge_management.notify_table_change();
+DROP TRIGGER IF EXISTS employees_notify_delete ON t_p47619579_knowledge_management.employees;
+CREATE TRIGGER employees_notify_delete AFTER DELETE ON t_p47619579_knowledge_management.employees
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION t_p47619579_knowledge_management.notify_table_change();
+DROP TRIGGER IF EXISTS tests_notify_insert ON t_p47619579_knowledge_management.tests;
+CREATE TRIGGER tests_notify_insert AFTER INSERT ON t_p47619579_knowledge_management.tests
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION t_p47619579_knowledge_management.notify_table_change();
+DROP TRIGGER IF EXISTS tests_notify_update ON t_p47619579_knowledge_management.tests;
+CREATE TRIGGER tests_notify_update AFTER UPDATE ON t_p47619579_knowledge_management.tests
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION t_p47619579_knowledge_management.notify_table_change();
+DROP TRIGGER IF EXISTS tests_notify_delete ON t_p47619579_knowledge_management.tests;
+CREATE TRIGGER tests_notify_delete AFTER DELETE ON t_p47619579_knowledge_management.tests
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION t_p47619579_knowledge_management.notify_table_change();
+DROP TRIGGER IF EXISTS test_results_notify_insert ON t_p47619579_knowledge_management.test_results;
+CREATE TRIGGER test_results_notify_insert AFTER INSERT ON t_p47619579_knowledge_management.test_results
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION t_p47619579_knowledge_management.notify_table_change();
+DROP TRIGGER IF EXISTS test_results_notify_update ON t_p47619579_knowledge_management.test_results;
+CREATE TRIGGER test_results_notify_update AFTER UPDATE ON t_p47619579_knowledge_management.test_results
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION t_p47619579_knowledge_management.notify_table_change();
+DROP TRIGGER IF EXISTS test_results_notify_delete ON t_p47619579_knowledge_management.test_results;
+CREATE TRIGGER test_results_notify_delete AFTER DELETE ON t_p47619579_knowledge_management.test_results
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION t_p47619579_knowledge_management.notify_table_change();
+DROP TRIGGER IF EXISTS courses_notify_insert ON t_p47619579_knowledge_management.courses;
+CREATE TRIGGER courses_notify_insert AFTER INSERT ON t_p47619579_knowledge_management.courses
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION t_p47619579_knowledge_management.notify_table_change();
+DROP TRIGGER IF EXISTS courses_notify_update ON t_p47619579_knowledge_management.courses;
+CREATE TRIGGER courses_notify_update AFTER UPDATE ON t_p47619579_knowledge_management.courses
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION t_p47619579_knowledge_management.notify_table_change();
+DROP TRIGGER IF EXISTS courses_notify_delete ON t_p47619579_knowledge_management.courses;
+CREATE TRIGGER courses_notify_delete AFTER DELETE ON t_p47619579_knowledge_management.courses
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION t_p47619579_knowledge_management.notify_table_change();
+DROP TRIGGER IF EXISTS notifications_notify_insert ON t_p47619579_knowledge_management.notifications;
+CREATE TRIGGER notifications_notify_insert AFTER INSERT ON t_p47619579_knowledge_management.notifications
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION t_p47619579_knowledge_management.notify_table_change();
+DROP TRIGGER IF EXISTS notifications_notify_update ON t_p47619579_knowledge_management.notifications;
+CREATE TRIGGER notifications_notify_update AFTER UPDATE ON t_p47619579_knowledge_management.notifications
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION t_p47619579_knowledge_management.notify_table_change();
+DROP TRIGGER IF EXISTS notifications_notify_delete ON t_p47619579_knowledge_management.notifications;
+CREATE TRIGGER notifications_notify_delete AFTER DELETE ON t_p47619579_knowledge_management.notifications
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION t_p47619579_knowledge_management.notify_table_change();
+DROP TRIGGER IF EXISTS knowledge_materials_notify_insert ON t_p47619579_knowledge_management.knowledge_materials;
+CREATE TRIGGER knowledge_materials_notify_insert AFTER INSERT ON t_p47619579_knowledge_management.knowledge_materials
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION t_p47619579_knowledge_management.notify_table_change();
+DROP TRIGGER IF EXISTS knowledge_materials_notify_update ON t_p47619579_knowledge_management.knowledge_materials;
+CREATE TRIGGER knowledge_materials_notify_update AFTER UPDATE ON t_p47619579_knowledge_management.knowledge_materials
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION t_p47619579_knowledge_management.notify_table_change();
+DROP TRIGGER IF EXISTS knowledge_materials_notify_delete ON t_p47619579_knowledge_management.knowledge_materials;
+CREATE TRIGGER knowledge_materials_notify_delete AFTER DELETE ON t_p47619579_knowledge_management.knowledge_materials
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION t_p47619579_knowledge_management.notify_table_change();
@@ -0,0 +1,54 @@
+-- Дельта-синхронизация (action=sync) по водяному знаку (updated_at, id)
+-- updated_at у test_results и notifications появляется впервые - заполняем по последнему изменению.
+-- DEFAULT ставится после заполнения (иначе все строки получат время миграции), а заполняются
+-- только пустые значения, чтобы повторный запуск не переписал водяные знаки
+ALTER TABLE t_p47619579_knowledge_management.test_results ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP;
+UPDATE t_p47619579_knowledge_management.test_results SET updated_at = COALESCE(completed_at, created_at, CURRENT_TIMESTAMP) WHERE updated_at IS NULL;
+ALTER TABLE t_p47619579_knowledge_management.test_results ALTER COLUMN updated_at SET DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE t_p47619579_knowledge_management.notifications ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP;
+UPDATE t_p47619579_knowledge_management.notifications SET updated_at = COALESCE(read_at, created_at, CURRENT_TIMESTAMP) WHERE updated_at IS NULL;
+ALTER TABLE t_p47619579_knowledge_management.notifications ALTER COLUMN updated_at SET DEFAULT CURRENT_TIMESTAMP;
+
+UPDATE t_p47619579_knowledge_management.employees SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP) WHERE updated_at IS NULL;
+UPDATE t_p47619579_knowledge_management.tests SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP) WHERE updated_at IS NULL;
+UPDATE t_p47619579_knowledge_management.courses SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP) WHERE updated_at IS NULL;
+UPDATE t_p47619579_knowledge_management.knowledge_materials SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP) WHERE updated_at IS NULL;
+
+-- updated_at обновляется при любом UPDATE, в том числе при мягком удалении (is_active = false)
+CREATE OR REPLACE FUNCTION t_p47619579_knowledge_management.touch_updated_at() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.updated_at := CURRENT_TIMESTAMP;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS employees_touch_updated_at ON t_p47619579_knowledge_management.employees;
+CREATE TRIGGER employees_touch_updated_at BEFORE UPDATE ON t_p47619579_knowledge_management.employees
+    FOR EACH ROW EXECUTE FUNCTION t_p47619579_knowledge_management.touch_updated_at();
+CREATE INDEX IF NOT EXISTS idx_employees_updated_at_id ON t_p47619579_knowledge_management.employees(updated_at, id);
+
+DROP TRIGGER IF EXISTS tests_touch_updated_at ON t_p47619579_knowledge_management.tests;
+CREATE TRIGGER tests_touch_updated_at BEFORE UPDATE ON t_p47619579_knowledge_management.tests
+    FOR EACH ROW EXECUTE FUNCTION t_p47619579_knowledge_management.touch_updated_at();
+CREATE INDEX IF NOT EXISTS idx_tests_updated_at_id ON t_p47619579_knowledge_management.tests(updated_at, id);
+
+DROP TRIGGER IF EXISTS test_results_touch_updated_at ON t_p47619579_knowledge_management.test_results;
+CREATE TRIGGER test_results_touch_updated_at BEFORE UPDATE ON t_p47619579_knowledge_management.test_results
+    FOR EACH ROW EXECUTE FUNCTION t_p47619579_knowledge_management.touch_updated_at();
+CREATE INDEX IF NOT EXISTS idx_test_results_updated_at_id ON t_p47619579_knowledge_management.test_results(updated_at, id);
+
+DROP TRIGGER IF EXISTS courses_touch_updated_at ON t_p47619579_knowledge_management.courses;
+CREATE TRIGGER courses_touch_updated_at BEFORE UPDATE ON t_p47619579_knowledge_management.courses
+    FOR EACH ROW EXECUTE FUNCTION t_p47619579_knowledge_management.touch_updated_at();
+CREATE INDEX IF NOT EXISTS idx_courses_updated_at_id ON t_p47619579_knowledge_management.courses(updated_at, id);
+
+DROP TRIGGER IF EXISTS notifications_touch_updated_at ON t_p47619579_knowledge_management.notifications;
+CREATE TRIGGER notifications_touch_updated_at BEFORE UPDATE ON t_p47619579_knowledge_management.notifications
+    FOR EACH ROW EXECUTE FUNCTION t_p47619579_knowledge_management.touch_updated_at();
+CREATE INDEX IF NOT EXISTS idx_notifications_updated_at_id ON t_p47619579_knowledge_management.notifications(updated_at, id);
+
+DROP TRIGGER IF EXISTS knowledge_materials_touch_updated_at ON t_p47619579_knowledge_management.knowledge_materials;
+CREATE TRIGGER knowledge_materials_touch_updated_at BEFORE UPDATE ON t_p47619579_knowledge_management.knowledge_materials
+    FOR EACH ROW EXECUTE FUNCTION t_p47619579_knowledge_management.touch_updated_at();
+CREATE INDEX IF NOT EXISTS idx_knowledge_materials_updated_at_id ON t_p47619579_knowledge_management.knowledge_materials(updated_at, id);
@@ -0,0 +1,47 @@
+-- Отзыв подписанных токенов (AUTH_TOKEN_MODE=signed): logout пишет jti,
+-- триггер на employees отзывает все токены сотрудника, выданные раньше revoked_at
+CREATE TABLE IF NOT EXISTS t_p47619579_knowledge_management.auth_revoked_tokens (
+    id SERIAL PRIMARY KEY,
+    jti VARCHAR(64),
+    employee_id INTEGER,
+    expires_at TIMESTAMPTZ NOT NULL,
+    revoked_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    CHECK (jti IS NOT NULL OR employee_id IS NOT NULL)
+);
+
+CREATE INDEX IF NOT EXISTS idx_auth_revoked_tokens_revoked_at
+    ON t_p47619579_knowledge_management.auth_revoked_tokens (revoked_at);
+CREATE INDEX IF NOT EXISTS idx_auth_revoked_tokens_expires_at
+    ON t_p47619579_knowledge_management.auth_revoked_tokens (expires_at);
+
+-- Деактивация, удаление или смена роли: роль зашита в токен, старые токены недействительны.
+-- Смена пароля тоже отзывает токены и завершает сессии auth_sessions - кроме пересчёта
+-- хэша того же пароля при входе (login ставит kms.password_rehash на свою транзакцию)
+CREATE OR REPLACE FUNCTION t_p47619579_knowledge_management.revoke_employee_tokens() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    password_changed BOOLEAN := TG_OP = 'UPDATE'
+        AND NEW.password_hash IS DISTINCT FROM OLD.password_hash
+        AND current_setting('kms.password_rehash', true) IS DISTINCT FROM 'on';
+BEGIN
+    IF TG_OP = 'DELETE'
+       OR (OLD.is_active AND NOT NEW.is_active)
+       OR NEW.role IS DISTINCT FROM OLD.role
+       OR password_changed THEN
+        INSERT INTO t_p47619579_knowledge_management.auth_revoked_tokens (employee_id, expires_at)
+        VALUES (OLD.id, now() + INTERVAL '30 days');
+    END IF;
+    IF password_changed THEN
+        DELETE FROM t_p47619579_knowledge_management.auth_sessions WHERE employee_id = OLD.id;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_employees_revoke_tokens ON t_p47619579_knowledge_management.employees;
+CREATE TRIGGER trg_employees_revoke_tokens
+    AFTER UPDATE OR DELETE ON t_p47619579_knowledge_management.employees
+    FOR EACH ROW EXECUTE FUNCTION t_p47619579_knowledge_management.revoke_employee_tokens();
+
+-- Истёкшие записи больше не нужны
+DELETE FROM t_p47619579_knowledge_management.auth_revoked_tokens WHERE expires_at < now();
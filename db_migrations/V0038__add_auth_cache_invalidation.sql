@@ -0,0 +1,49 @@
+-- Кэш action=check в процессах auth сбрасывается по auth_revoked_tokens: изменения
+-- employees и auth_sessions делают другие процессы (external-db, app.py).
+-- revokes = false - токены не отзываются, auth только сбрасывает кэш сотрудника
+ALTER TABLE t_p47619579_knowledge_management.auth_revoked_tokens
+    ADD COLUMN IF NOT EXISTS revokes BOOLEAN NOT NULL DEFAULT true;
+
+-- Отзыв как в V0037; любое другое изменение полей профиля из ответа check
+-- (и is_active в обе стороны) - строка только для сброса кэша.
+-- Срок короткий: её должны успеть прочитать работающие процессы, новым она не нужна
+CREATE OR REPLACE FUNCTION t_p47619579_knowledge_management.revoke_employee_tokens() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    password_changed BOOLEAN := TG_OP = 'UPDATE'
+        AND NEW.password_hash IS DISTINCT FROM OLD.password_hash
+        AND current_setting('kms.password_rehash', true) IS DISTINCT FROM 'on';
+BEGIN
+    IF TG_OP = 'DELETE'
+       OR (OLD.is_active AND NOT NEW.is_active)
+       OR NEW.role IS DISTINCT FROM OLD.role
+       OR password_changed THEN
+        INSERT INTO t_p47619579_knowledge_management.auth_revoked_tokens (employee_id, expires_at)
+        VALUES (OLD.id, now() + INTERVAL '30 days');
+    ELSIF (NEW.is_active, NEW.email, NEW.full_name, NEW.phone, NEW.department, NEW.position, NEW.avatar_url, NEW.theme)
+          IS DISTINCT FROM
+          (OLD.is_active, OLD.email, OLD.full_name, OLD.phone, OLD.department, OLD.position, OLD.avatar_url, OLD.theme) THEN
+        INSERT INTO t_p47619579_knowledge_management.auth_revoked_tokens (employee_id, expires_at, revokes)
+        VALUES (OLD.id, now() + INTERVAL '1 hour', false);
+    END IF;
+    IF password_changed THEN
+        DELETE FROM t_p47619579_knowledge_management.auth_sessions WHERE employee_id = OLD.id;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- Удаление или изменение сессии (logout на другом экземпляре, очистка, продление)
+CREATE OR REPLACE FUNCTION t_p47619579_knowledge_management.invalidate_session_cache() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO t_p47619579_knowledge_management.auth_revoked_tokens (employee_id, expires_at, revokes)
+    VALUES (OLD.employee_id, now() + INTERVAL '1 hour', false);
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_auth_sessions_invalidate_cache ON t_p47619579_knowledge_management.auth_sessions;
+CREATE TRIGGER trg_auth_sessions_invalidate_cache
+    AFTER UPDATE OR DELETE ON t_p47619579_knowledge_management.auth_sessions
+    FOR EACH ROW EXECUTE FUNCTION t_p47619579_knowledge_management.invalidate_session_cache();
@@ -0,0 +1,14 @@
+-- Лимит попыток входа (backend/shared/login_throttle.py, LOGIN_THROTTLE_BACKEND=postgres):
+-- корзины общие для всех экземпляров функции auth. UNLOGGED - без WAL, после сбоя
+-- сервера таблица пустеет, это то же, что полные корзины
+CREATE UNLOGGED TABLE IF NOT EXISTS t_p47619579_knowledge_management.auth_login_buckets (
+    key TEXT PRIMARY KEY,
+    tokens DOUBLE PRECISION NOT NULL,
+    updated DOUBLE PRECISION NOT NULL,
+    capacity DOUBLE PRECISION NOT NULL,
+    rate DOUBLE PRECISION NOT NULL,
+    wait DOUBLE PRECISION NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_auth_login_buckets_updated
+    ON t_p47619579_knowledge_management.auth_login_buckets (updated);
@@ -0,0 +1,26 @@
+"""Конфигурация Gunicorn для app.py (gunicorn -c gunicorn.conf.py app:app)"""
+import os
+
+# Адрес и порт
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# Количество worker процессов
+workers = int(os.environ.get('WEB_CONCURRENCY', '4'))
+
+# Класс worker: GET /changes (SSE, long-poll) держит поток на всё время подключения.
+# У sync worker'а это весь процесс - несколько открытых вкладок останавливают API.
+# Потоков больше, чем CHANGE_FEED_MAX_STREAMS (24): остальные обслуживают обычные запросы
+worker_class = "gthread"
+threads = int(os.environ.get('GUNICORN_THREADS', '32'))
+
+# Таймауты: у gthread timeout - это пульс worker'а, а не длительность запроса,
+# поэтому долгие SSE-подключения его не превышают
+timeout = 120
+keepalive = 5
+
+# Логирование
+accesslog = "-"
+errorlog = "-"
+loglevel = "info"
+# Степень и CPU-время сжатия ответа (см. backend/shared/compression.py)
+access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s" %({compression.encoding}e)s %({compression.ratio}e)s %({compression.cpu_ms}e)s'
@@ -13,6 +13,16 @@ import os
 app = Flask(__name__)
 CORS(app, resources={r"/api/*": {"origins": "*"}})
 
+# Сжатие ответов (gzip/brotli): compression.py деплоится рядом с app.py
+# (копия backend/shared/compression.py, обновляется backend/vendor_shared.py)
+try:
+    import compression
+except ImportError:
+    compression = None
+    print("⚠️ [compression] compression.py не найден рядом с app.py - ответы отдаются без сжатия")
+if compression is not None:
+    compression.init_flask(app)
+
 # Конфигурация базы данных
 DB_CONFIG = {
     'host': 'localhost',
@@ -0,0 +1,162 @@
+# Сгенерировано backend/vendor_shared.py из backend/shared - не редактировать
+"""
+Accept-Encoding negotiation and response compression (gzip, brotli when installed).
+
+Buffered bodies smaller than COMPRESS_MIN_SIZE bytes are sent as is. Streamed
+bodies are compressed chunk by chunk with a sync flush, so the client still
+receives every chunk as soon as it is produced.
+
+Per-response results go into the WSGI environ for the access log:
+  compression.encoding, compression.ratio, compression.cpu_ms
+gunicorn: --access-logformat '... %({compression.encoding}e)s %({compression.ratio}e)s %({compression.cpu_ms}e)s'
+
+The module depends only on the standard library (plus optional brotli), so it
+can be copied next to a single-file app.
+"""
+
+import os
+import time
+import zlib
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', '1024'))
+GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', '5'))
+
+SKIP_MIMETYPES = ('image/', 'video/', 'audio/', 'application/zip', 'application/gzip')
+
+
+def supported_encodings() -> Tuple[str, ...]:
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick br or gzip from an Accept-Encoding header, honouring q-values"""
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name] = q
+    best = None
+    best_q = 0.0
+    for encoding in supported_encodings():
+        q = weights.get(encoding, weights.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class StreamCompressor:
+    """Incremental compressor that tracks input/output bytes and CPU time"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_seconds = 0.0
+        if encoding == 'br':
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def _timed(self, func, *args) -> bytes:
+        started = time.thread_time()
+        out = func(*args)
+        self.cpu_seconds += time.thread_time() - started
+        self.bytes_out += len(out)
+        return out
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        self.bytes_in += len(data)
+        if self.encoding == 'br':
+            out = self._timed(self._brotli.process, data)
+            return out + self._timed(self._brotli.flush) if flush else out
+        out = self._timed(self._zlib.compress, data)
+        return out + self._timed(self._zlib.flush, zlib.Z_SYNC_FLUSH) if flush else out
+
+    def finish(self) -> bytes:
+        if self.encoding == 'br':
+            return self._timed(self._brotli.finish)
+        return self._timed(self._zlib.flush, zlib.Z_FINISH)
+
+    def report(self) -> Dict[str, str]:
+        ratio = self.bytes_out / self.bytes_in if self.bytes_in else 1.0
+        return {
+            'compression.encoding': self.encoding,
+            'compression.ratio': f'{ratio:.3f}',
+            'compression.cpu_ms': f'{self.cpu_seconds * 1000:.2f}',
+        }
+
+
+def compress_body(data: bytes, encoding: str) -> Tuple[bytes, Dict[str, str]]:
+    compressor = StreamCompressor(encoding)
+    body = compressor.compress(data) + compressor.finish()
+    return body, compressor.report()
+
+
+def compress_stream(chunks: Iterable[Any], encoding: str, environ: Dict[str, Any]) -> Iterator[bytes]:
+    """Compress a streamed body; the report lands in environ when the stream ends"""
+    compressor = StreamCompressor(encoding)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            if chunk:
+                out = compressor.compress(chunk, flush=True)
+                if out:
+                    yield out
+        yield compressor.finish()
+    finally:
+        environ.update(compressor.report())
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+def _compressible(status_code: int, headers, mimetype: Optional[str]) -> bool:
+    if status_code < 200 or status_code in (204, 206, 304):
+        return False
+    if 'Content-Encoding' in headers:
+        return False
+    return not (mimetype or '').startswith(SKIP_MIMETYPES)
+
+
+def init_flask(app) -> None:
+    """Compress Flask responses according to the request's Accept-Encoding"""
+    from flask import request
+
+    @app.after_request
+    def compress_response(response):
+        if request.method == 'HEAD' or not _compressible(response.status_code, response.headers, response.mimetype):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = negotiate(request.headers.get('Accept-Encoding'))
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = compress_stream(response.response, encoding, request.environ)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < MIN_SIZE:
+                return response
+            body, report = compress_body(data, encoding)
+            request.environ.update(report)
+            response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -17,6 +17,8 @@ keepalive = 5
 accesslog = "/var/log/giftbox/access.log"
 errorlog = "/var/log/giftbox/error.log"
 loglevel = "info"
+# Степень и CPU-время сжатия ответа (см. backend/shared/compression.py)
+access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s" %({compression.encoding}e)s %({compression.ratio}e)s %({compression.cpu_ms}e)s'
 
 # Daemon mode
 daemon = False
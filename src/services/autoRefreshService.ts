@@ -1,4 +1,5 @@
 import { externalDb } from './externalDbService';
+import { API_CONFIG } from '@/config/apiConfig';
 
 interface ChangeCheckResult {
   hasChanges: boolean;
@@ -6,6 +7,13 @@ interface ChangeCheckResult {
   changedTables: string[];
 }
 
+interface ChangeEvent {
+  table?: string;
+  op?: 'INSERT' | 'UPDATE' | 'DELETE';
+  ids?: number[] | null;
+  resync?: boolean;
+}
+
 interface RefreshListener {
   id: string;
   callback: () => void | Promise<void>;
@@ -18,6 +26,12 @@ class AutoRefreshService {
   private listeners: RefreshListener[] = [];
   private lastKnownUpdates: Record<string, string> = {};
   private tables = ['employees', 'tests', 'test_results', 'courses', 'notifications', 'knowledge_materials'];
+  private eventSource: EventSource | null = null;
+  private pushConnected = false;
+  private mode: 'push' | 'polling' | 'stopped' = 'stopped';
+  private pendingTables = new Set<string>();
+  private notifyTimerId: number | null = null;
+  private notifyDelay = 500;
 
   start() {
     if (this.isRunning) {
@@ -25,10 +39,12 @@ class AutoRefreshService {
       return;
     }
 
-    console.log('AutoRefreshService запущен, проверка каждые 30 секунд');
     this.isRunning = true;
-    this.checkForUpdates();
-    this.timerId = window.setInterval(() => this.checkForUpdates(), this.checkInterval);
+    if (typeof EventSource !== 'undefined') {
+      this.startPush();
+    } else {
+      this.startPolling();
+    }
   }
 
   stop() {
@@ -36,10 +52,80 @@ class AutoRefreshService {
       clearInterval(this.timerId);
       this.timerId = null;
     }
+    if (this.eventSource) {
+      this.eventSource.close();
+      this.eventSource = null;
+    }
+    if (this.notifyTimerId) {
+      clearTimeout(this.notifyTimerId);
+      this.notifyTimerId = null;
+    }
+    this.pushConnected = false;
+    this.mode = 'stopped';
     this.isRunning = false;
     console.log('AutoRefreshService остановлен');
   }
 
+  /**
+   * Изменения приходят с сервера (LISTEN/NOTIFY -> SSE), БД не опрашивается.
+   * Если лента недоступна, переходим на опрос каждые 30 секунд.
+   */
+  private startPush() {
+    const url = `${API_CONFIG.EXTERNAL_DB}/changes?tables=${this.tables.join(',')}`;
+    const source = new EventSource(url);
+    this.eventSource = source;
+
+    source.addEventListener('ready', () => {
+      if (!this.pushConnected) {
+        console.log('AutoRefreshService запущен, изменения приходят с сервера');
+      }
+      this.pushConnected = true;
+      this.mode = 'push';
+    });
+
+    source.addEventListener('change', (event) => {
+      const change: ChangeEvent = JSON.parse((event as MessageEvent).data);
+      if (change.resync) {
+        this.tables.forEach(table => this.pendingTables.add(table));
+      } else if (change.table) {
+        this.pendingTables.add(change.table);
+      }
+      this.scheduleNotify();
+    });
+
+    source.onerror = () => {
+      // После первого подключения браузер переподключается сам (с Last-Event-ID);
+      // CLOSED - сервер отказал (503 сверх лимита подключений), переподключения не будет
+      if (!this.isRunning) return;
+      if (this.pushConnected && source.readyState !== EventSource.CLOSED) return;
+      source.close();
+      this.eventSource = null;
+      console.log('Лента изменений недоступна, переходим на опрос');
+      this.startPolling();
+    };
+  }
+
+  private startPolling() {
+    console.log('AutoRefreshService запущен, проверка каждые 30 секунд');
+    this.mode = 'polling';
+    this.checkForUpdates();
+    this.timerId = window.setInterval(() => this.checkForUpdates(), this.checkInterval);
+  }
+
+  private scheduleNotify() {
+    if (this.notifyTimerId) return;
+    // Серия изменений (импорт, каскадное удаление) даёт одно обновление подписчиков
+    this.notifyTimerId = window.setTimeout(async () => {
+      this.notifyTimerId = null;
+      const changedTables = Array.from(this.pendingTables);
+      this.pendingTables.clear();
+      const now = new Date().toISOString();
+      changedTables.forEach(table => { this.lastKnownUpdates[table] = now; });
+      console.log('🔄 Обнаружены изменения в таблицах:', changedTables);
+      await this.notifyListeners();
+    }, this.notifyDelay);
+  }
+
   subscribe(id: string, callback: () => void | Promise<void>) {
     this.listeners.push({ id, callback });
     console.log(`Подписчик ${id} зарегистрирован`);
@@ -134,6 +220,7 @@ class AutoRefreshService {
   getStatus() {
     return {
       isRunning: this.isRunning,
+      mode: this.mode,
       listenersCount: this.listeners.length,
       checkInterval: this.checkInterval,
       lastKnownUpdates: { ...this.lastKnownUpdates }
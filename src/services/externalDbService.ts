@@ -14,13 +14,79 @@ interface QueryRequest {
 
 interface QueryResponse {
   rows?: any[];
-  count?: number;
+  count?: number | null;
+  countMode?: 'exact' | 'estimated' | 'cached' | 'none';
+  countAge?: number | null;
   affected?: number;
   tables?: any[];
   totalTables?: number;
   totalRecords?: number;
 }
 
+type ListCondition = string | number | boolean | null | {
+  eq?: any;
+  ne?: any;
+  in?: any[];
+  gt?: any;
+  gte?: any;
+  lt?: any;
+  lte?: any;
+  between?: [any, any];
+  like?: string;
+  ilike?: string;
+  is_null?: boolean;
+};
+
+interface ListOptions {
+  limit?: number;
+  offset?: number;
+  schema?: string;
+  columns?: string[];
+  where?: Record<string, ListCondition>;
+  orderBy?: string | string[];
+}
+
+interface BatchOperation {
+  action: 'query' | 'create' | 'update' | 'delete';
+  table?: string;
+  schema?: string;
+  id?: number;
+  data?: Record<string, any>;
+  query?: string;
+  params?: any[];
+  permanent?: boolean;
+  cascade?: boolean;
+}
+
+interface BatchResponse {
+  ok: boolean;
+  transaction: boolean;
+  committed: boolean;
+  results: {
+    index: number;
+    action: BatchOperation['action'];
+    status: 'ok' | 'error' | 'rolled_back' | 'skipped';
+    data?: any;
+    error?: string;
+    code?: number;
+  }[];
+}
+
+interface SyncWatermark {
+  updated_at: string;
+  id: number;
+}
+
+interface SyncResponse {
+  tables: Record<string, {
+    rows: any[];
+    deactivated: number[];
+    watermark: SyncWatermark | null;
+    hasMore: boolean;
+  }>;
+  recommendedIndexes?: string[];
+}
+
 async function fetchWithRetry(url: string, options: RequestInit, retries = 2): Promise<Response> {
   for (let i = 0; i <= retries; i++) {
     try {
@@ -93,14 +159,18 @@ export const externalDb = {
   /**
    * List data from table
    */
-  async list(table: string, options: { limit?: number; offset?: number; schema?: string } = {}): Promise<any[]> {
+  async list(table: string, options: ListOptions = {}): Promise<any[]> {
     try {
       const schema = options.schema || 't_p47619579_knowledge_management';
       const limit = options.limit || 100;
       const offset = options.offset || 0;
+      const params = new URLSearchParams({ action: 'list', table, schema, limit: String(limit), offset: String(offset) });
+      if (options.columns?.length) params.set('columns', options.columns.join(','));
+      if (options.where && Object.keys(options.where).length) params.set('where', JSON.stringify(options.where));
+      if (options.orderBy) params.set('order_by', Array.isArray(options.orderBy) ? options.orderBy.join(',') : options.orderBy);
       console.log('Calling external DB list:', EXTERNAL_DB_URL, 'table:', table, 'schema:', schema);
       const response = await fetchWithRetry(
-        `${EXTERNAL_DB_URL}?action=list&table=${table}&schema=${schema}&limit=${limit}&offset=${offset}`, 
+        `${EXTERNAL_DB_URL}?${params.toString()}`, 
         {
           method: 'GET',
           headers: { 
@@ -131,6 +201,56 @@ export const externalDb = {
     }
   },
 
+  /**
+   * List one page of a table with keyset (cursor) pagination.
+   * Pass the returned `next` token as `after` to get the following page.
+   */
+  async listPage(
+    table: string,
+    options: { limit?: number; after?: string | null; sort?: string; direction?: 'asc' | 'desc'; schema?: string } = {}
+  ): Promise<{ rows: any[]; next: string | null; hasMore: boolean }> {
+    const params = new URLSearchParams({
+      action: 'list',
+      table,
+      schema: options.schema || 't_p47619579_knowledge_management',
+      limit: String(options.limit || 100),
+      paginate: 'cursor',
+    });
+    if (options.after) params.set('after', options.after);
+    if (options.sort) params.set('sort', options.sort);
+    if (options.direction) params.set('direction', options.direction);
+
+    const response = await fetchWithRetry(`${EXTERNAL_DB_URL}?${params.toString()}`, {
+      method: 'GET',
+      headers: { 'Accept': 'application/json' },
+      mode: 'cors',
+      credentials: 'omit'
+    });
+
+    if (!response.ok) {
+      throw new Error(`List failed: ${response.status}`);
+    }
+
+    const data: any = await response.json();
+    return { rows: data.rows || [], next: data.next ?? null, hasMore: Boolean(data.hasMore) };
+  },
+
+  /**
+   * Rows changed since the given per-table watermarks (null = from the beginning).
+   * Pass the returned watermarks back on the next call.
+   */
+  async sync(
+    tables: Record<string, SyncWatermark | null>,
+    options: { limit?: number; schema?: string } = {}
+  ): Promise<SyncResponse> {
+    return this.postAction({
+      action: 'sync',
+      tables,
+      limit: options.limit,
+      schema: options.schema || 't_p47619579_knowledge_management',
+    }, 'Sync');
+  },
+
   /**
    * Get database statistics
    */
@@ -240,6 +360,40 @@ export const externalDb = {
     }
   },
 
+  /**
+   * Insert many records in one request (chunked multi-row INSERT or COPY on the server)
+   */
+  async createMany(
+    table: string,
+    rows: Record<string, any>[],
+    options: { returning?: 'none' | 'id' | '*'; method?: 'auto' | 'values' | 'copy'; schema?: string } = {}
+  ): Promise<{ inserted: number; method: 'values' | 'copy'; data?: any[] }> {
+    const response = await fetchWithRetry(EXTERNAL_DB_URL, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        'Accept': 'application/json'
+      },
+      body: JSON.stringify({
+        action: 'create',
+        table,
+        schema: options.schema || 't_p47619579_knowledge_management',
+        data: rows,
+        returning: options.returning || 'none',
+        method: options.method || 'auto',
+      }),
+      mode: 'cors',
+      credentials: 'omit'
+    });
+
+    if (!response.ok) {
+      const errorText = await response.text();
+      throw new Error(`Bulk create failed: ${response.status} - ${errorText}`);
+    }
+
+    return response.json();
+  },
+
   /**
    * Update a record in table
    */
@@ -262,6 +416,58 @@ export const externalDb = {
     }
   },
 
+  /**
+   * Update many records in one statement: the same data for a list of ids,
+   * or per-row data where every row carries its id
+   */
+  async updateMany(
+    table: string,
+    update: { ids: number[]; data: Record<string, any> } | { rows: (Record<string, any> & { id: number })[] },
+    schema = 't_p47619579_knowledge_management'
+  ): Promise<{ affected: number; ids: number[] }> {
+    const payload = 'rows' in update ? { data: update.rows } : { ids: update.ids, data: update.data };
+    return this.postAction({ action: 'update', table, schema, ...payload }, 'Bulk update');
+  },
+
+  /**
+   * Delete many records by id (employees are deactivated unless permanent;
+   * permanent + cascade also removes their results, enrollments, sessions etc.)
+   */
+  async deleteMany(
+    table: string,
+    ids: number[],
+    options: { permanent?: boolean; cascade?: boolean; schema?: string } = {}
+  ): Promise<{ affected: number; deleted: boolean; permanent: boolean; counts?: Record<string, number> }> {
+    return this.postAction({
+      action: 'delete',
+      table,
+      ids,
+      permanent: Boolean(options.permanent),
+      cascade: Boolean(options.cascade),
+      schema: options.schema || 't_p47619579_knowledge_management',
+    }, 'Bulk delete');
+  },
+
+  async postAction(body: Record<string, any>, label: string): Promise<any> {
+    const response = await fetchWithRetry(EXTERNAL_DB_URL, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        'Accept': 'application/json'
+      },
+      body: JSON.stringify(body),
+      mode: 'cors',
+      credentials: 'omit'
+    });
+
+    if (!response.ok) {
+      const errorText = await response.text();
+      throw new Error(`${label} failed: ${response.status} - ${errorText}`);
+    }
+
+    return response.json();
+  },
+
   /**
    * Delete a record from table
    */
@@ -276,6 +482,39 @@ export const externalDb = {
     }
   },
 
+  /**
+   * Run several query/create/update/delete operations in one request.
+   * With transaction: true the batch is all-or-nothing.
+   */
+  async batch(
+    operations: BatchOperation[],
+    options: { transaction?: boolean; continueOnError?: boolean; schema?: string } = {}
+  ): Promise<BatchResponse> {
+    const response = await fetchWithRetry(EXTERNAL_DB_URL, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        'Accept': 'application/json'
+      },
+      body: JSON.stringify({
+        action: 'batch',
+        operations,
+        transaction: Boolean(options.transaction),
+        continue_on_error: Boolean(options.continueOnError),
+        schema: options.schema || 't_p47619579_knowledge_management',
+      }),
+      mode: 'cors',
+      credentials: 'omit'
+    });
+
+    if (!response.ok) {
+      const errorText = await response.text();
+      throw new Error(`Batch failed: ${response.status} - ${errorText}`);
+    }
+
+    return response.json();
+  },
+
   /**
    * Get subsection content
    */
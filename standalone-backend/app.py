@@ -25,6 +25,16 @@ import os
 app = Flask(__name__)
 CORS(app)  # Разрешаем CORS для всех доменов
 
+# Сжатие ответов (gzip/brotli): compression.py деплоится рядом с app.py
+# (копия backend/shared/compression.py, обновляется backend/vendor_shared.py)
+try:
+    import compression
+except ImportError:
+    compression = None
+    print("⚠️ [compression] compression.py не найден рядом с app.py - ответы отдаются без сжатия")
+if compression is not None:
+    compression.init_flask(app)
+
 # Настройки базы данных Timeweb Cloud
 DB_CONFIG = {
     'host': 'c6b7ae5ab8e72b5408272e27.twc1.net',